@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+admission.py
+
+Kiểm soát tải cho /search: giới hạn số request dùng đồng thời từng tài nguyên đắt (encode query bằng model,
+search ANN, BM25) và quyết định làm gì khi tài nguyên đang kín.
+
+- ResourceLimiter: semaphore có thống kê. acquire(wait) chờ tối đa `wait` giây; hết thời gian thì trả False
+  thay vì xếp hàng vô hạn (hàng đợi dài là nguyên nhân latency của mọi request cùng tăng vọt khi có spike).
+- Chính sách theo tài nguyên, dạng chuỗi "encode=keyword,ann=reduce,bm25=reject". Mặc định mọi tài nguyên "wait":
+  giảm cấp / từ chối phải bật rõ ràng, tải đồng thời bình thường không làm đổi kết quả.
+    wait    - chờ tới khi có chỗ (như khi không có admission control)
+    keyword - bỏ phần semantic, trả kết quả keyword-only (encode, ann)
+    reduce  - chờ chỗ rồi chạy bản rẻ hơn: ít ứng viên ANN hơn, không rerank (ann)
+    reject  - trả 503 kèm Retry-After (mọi tài nguyên)
+- Overloaded: exception mang tên tài nguyên và Retry-After, server đổi thành response 503.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+ACTIONS = {
+    "encode": ("wait", "keyword", "reject"),
+    "ann": ("wait", "keyword", "reduce", "reject"),
+    "bm25": ("wait", "reject"),
+}
+
+DEFAULT_POLICY = "encode=wait,ann=wait,bm25=wait"
+
+
+class Overloaded(Exception):
+    def __init__(self, resource: str, retry_after: int = 1):
+        super().__init__(f"{resource} đang quá tải")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+def parse_policy(spec: str) -> Dict[str, str]:
+    """"encode=keyword,ann=reduce" -> {resource: action}; tài nguyên không nêu giữ mặc định. ValueError nếu sai."""
+    policy = dict(item.split("=") for item in DEFAULT_POLICY.split(","))
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        resource, _, action = item.strip().partition("=")
+        if resource not in ACTIONS or action not in ACTIONS[resource]:
+            raise ValueError(f"Chính sách không hợp lệ: {item!r} (hợp lệ: {ACTIONS})")
+        policy[resource] = action
+    return policy
+
+
+class ResourceLimiter:
+    def __init__(self, name: str, limit: int, wait: float = 0.02):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self.wait = wait
+        self._sem = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.admitted = 0
+        self.busy = 0  # số lần hết thời gian chờ mà chưa có chỗ
+        self.wait_ms_max = 0.0
+
+    def acquire(self, wait: Optional[float] = None) -> bool:
+        """Lấy một chỗ, chờ tối đa `wait` giây (None = self.wait, âm = chờ vô hạn)."""
+        wait = self.wait if wait is None else wait
+        t = time.perf_counter()
+        ok = self._sem.acquire(timeout=None if wait < 0 else wait)
+        with self._lock:
+            if ok:
+                self.in_use += 1
+                self.admitted += 1
+                self.wait_ms_max = max(self.wait_ms_max, (time.perf_counter() - t) * 1000)
+            else:
+                self.busy += 1
+        return ok
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+        self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_use": self.in_use,
+                "admitted": self.admitted,
+                "busy": self.busy,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+            }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+article_dates.py
+
+Chuẩn hoá ngày đăng bài: parse chuỗi ngày (RSS, ISO, dd/mm/yyyy, epoch) một lần lúc crawl / merge thành
+epoch giây (int, UTC) lưu ở field `published_ts` của bài, và cột int64 `timestamps.npy` cạnh index.
+
+Chuỗi ngày không ghi múi giờ được hiểu theo SITE_TZ (giờ Việt Nam), không theo múi giờ của máy đang chạy: cùng một
+bài cho cùng epoch dù crawl ở đâu. Ngày hiển thị và biên date_from/date_to (day_start_ts) cũng theo SITE_TZ.
+
+Lúc load server chỉ cần đọc một mảng; sắp xếp "mới nhất" và lọc theo khoảng ngày là phép NumPy trên mảng đó.
+Bài không có / không parse được ngày: `published_ts` = None, trong cột là MISSING_TS (nhỏ hơn mọi ngày thật,
+nên luôn đứng cuối khi sắp mới nhất trước).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+MISSING_TS = np.iinfo(np.int64).min
+
+# Múi giờ cố định của dữ liệu: UTC+7, không đổi giờ mùa hè (Asia/Ho_Chi_Minh)
+SITE_TZ = timezone(timedelta(hours=7), "ICT")
+
+TIMESTAMPS_FILE = "timestamps.npy"
+
+DATE_KEYS = (
+    "published",
+    "pubDate",
+    "date",
+    "datetime",
+    "time",
+    "timestamp",
+    "created_at",
+    "updated_at",
+    "createdAt",
+    "updatedAt",
+)
+
+_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%a, %d %b %Y %H:%M:%S %z",  # RSS
+    "%a, %d %b %Y %H:%M:%S %Z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%dT%H:%M:%S.%f",
+)
+
+_EPOCH_RE = re.compile(r"\d{10,13}")
+
+
+def parse_datetime(val: str) -> Optional[datetime]:
+    """Parse một chuỗi ngày thành datetime có múi giờ (SITE_TZ); chuỗi không ghi múi giờ được hiểu theo SITE_TZ."""
+    v = (val or "").strip()
+    if not v:
+        return None
+
+    # numeric epoch seconds/ms
+    if _EPOCH_RE.fullmatch(v):
+        n = int(v)
+        if len(v) == 13:
+            n = n // 1000
+        try:
+            return datetime.fromtimestamp(n, SITE_TZ)
+        except (OverflowError, OSError, ValueError):
+            return None
+
+    for f in _DATE_FORMATS:
+        try:
+            dt = datetime.strptime(v, f)
+        except ValueError:
+            continue
+        if dt.tzinfo is None:
+            # %Z chỉ nhận tên múi giờ, không gắn tzinfo: "GMT"/"UTC" của RSS là UTC
+            utc = f.endswith("%Z") and v.upper().endswith(("GMT", "UTC"))
+            dt = dt.replace(tzinfo=timezone.utc if utc else SITE_TZ)
+        return dt.astimezone(SITE_TZ)
+
+    return None
+
+
+def extract_article_datetime(article: Dict[str, Any]) -> Optional[datetime]:
+    for k in DATE_KEYS:
+        if k in article and article[k]:
+            dt = parse_datetime(str(article[k]))
+            if dt:
+                return dt
+    return None
+
+
+def article_timestamp(article: Dict[str, Any]) -> Optional[int]:
+    """Epoch giây của ngày đăng; dùng `published_ts` đã tính sẵn nếu bài có field này."""
+    if "published_ts" in article:
+        ts = article["published_ts"]
+        return None if ts is None else int(ts)
+    dt = extract_article_datetime(article)
+    return int(dt.timestamp()) if dt else None
+
+
+def article_timestamps(articles: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Cột int64 theo doc_id (MISSING_TS cho bài không có ngày)."""
+    out = np.full(len(articles), MISSING_TS, dtype=np.int64)
+    for i, article in enumerate(articles):
+        ts = article_timestamp(article)
+        if ts is not None:
+            out[i] = ts
+    return out
+
+
+def to_datetime(ts: int) -> Optional[datetime]:
+    return None if ts == MISSING_TS else datetime.fromtimestamp(int(ts), SITE_TZ)
+
+
+def day_start_ts(day: date) -> int:
+    """Epoch giây của 00:00 ngày `day` theo SITE_TZ."""
+    return int(datetime.combine(day, time.min, tzinfo=SITE_TZ).timestamp())
+
+
+def save_timestamps(index_dir: str, articles: Sequence[Dict[str, Any]]) -> np.ndarray:
+    ts = article_timestamps(articles)
+    np.save(os.path.join(index_dir, TIMESTAMPS_FILE), ts)
+    return ts
+
+
+def load_timestamps(index_dir: str, articles: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Đọc timestamps.npy; index cũ (chưa có file hoặc lệch số bài) thì tính từ articles."""
+    path = os.path.join(index_dir, TIMESTAMPS_FILE)
+    if os.path.exists(path):
+        ts = np.load(path)
+        if len(ts) == len(articles):
+            return ts
+    return article_timestamps(articles)
+
+
+def newest_first(doc_ids: np.ndarray, scores: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+    """Thứ tự (chỉ số vào doc_ids) mới nhất trước, cùng ngày thì điểm cao trước; bài không có ngày đứng cuối."""
+    return np.lexsort((-scores, -timestamps[doc_ids].astype(np.float64)))
+
+
+class DateIndex:
+    """doc_id sắp theo ngày đăng (tính một lần lúc load): lọc khoảng ngày = 2 lần searchsorted + một lát cắt."""
+
+    def __init__(self, timestamps: np.ndarray):
+        self.n_docs = len(timestamps)
+        order = np.argsort(timestamps, kind="stable")
+        sorted_ts = timestamps[order]
+        first = int(np.searchsorted(sorted_ts, MISSING_TS, side="right"))  # bỏ bài không có ngày
+        self.order = order[first:]
+        self.sorted_ts = sorted_ts[first:]
+
+    def range_ids(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """doc_id (theo thứ tự ngày) có ngày đăng trong [start, end)."""
+        lo = 0 if start is None else int(np.searchsorted(self.sorted_ts, start, side="left"))
+        hi = len(self.sorted_ts) if end is None else int(np.searchsorted(self.sorted_ts, end, side="left"))
+        return self.order[lo:max(lo, hi)]
+
+    def range_mask(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        mask = np.zeros(self.n_docs, dtype=bool)
+        mask[self.range_ids(start, end)] = True
+        return mask
@@ -14,7 +14,7 @@ class ArticleSearchApp:
         print("=" * 50)
         
         try:
-            if not os.path.exists('article_index/article_index.bin'):
+            if not os.path.exists('article_index/metadata.json'):
                 print("CHƯA CÓ DATA ĐÃ BUILD!")
                 print("Cần chạy build index trước:")
                 print("   python hnsw_manager.py")
@@ -125,15 +125,15 @@ class ArticleSearchApp:
         
         try:
             query_vector = self.hnsw_mgr.embedder.embed_query(query)
-            labels, distances = self.hnsw_mgr.index.knn_query(query_vector, k=20)
+            labels, distances = self.hnsw_mgr.index.search(query_vector, k=20)
             
             search_time = time.time() - start_time
             
-            print(f"Tìm thấy {len(labels[0])} kết quả trong {search_time:.4f}s")
+            print(f"Tìm thấy {len(labels)} kết quả trong {search_time:.4f}s")
             print("\nTOP 5 KẾT QUẢ:")
             print("="*100)
             
-            for i, (label, distance) in enumerate(zip(labels[0][:5], distances[0][:5])):
+            for i, (label, distance) in enumerate(zip(labels[:5], distances[:5])):
                 article_idx = int(label)
                 similarity = 1 - distance
                 article = self.hnsw_mgr.articles[article_idx]
@@ -150,8 +150,8 @@ class ArticleSearchApp:
                 print("-" * 100)
             
             # Hiển thị thêm kết quả
-            if len(labels[0]) > 5:
-                print(f"\nVà {len(labels[0]) - 5} kết quả khác...")
+            if len(labels) > 5:
+                print(f"\nVà {len(labels) - 5} kết quả khác...")
                 
         except Exception as e:
             print(f"Lỗi tìm kiếm: {e}")
@@ -183,15 +183,15 @@ class ArticleSearchApp:
         
         try:
             query_vector = self.hnsw_mgr.embedder.embed_query(query)
-            labels, distances = self.hnsw_mgr.index.knn_query(query_vector, k=k)
+            labels, distances = self.hnsw_mgr.index.search(query_vector, k=k)
             
             search_time = time.time() - start_time
             
-            print(f"Tìm thấy {len(labels[0])} kết quả trong {search_time:.4f}s")
+            print(f"Tìm thấy {len(labels)} kết quả trong {search_time:.4f}s")
             print("\nKẾT QUẢ:")
             print("="*100)
             
-            for i, (label, distance) in enumerate(zip(labels[0], distances[0])):
+            for i, (label, distance) in enumerate(zip(labels, distances)):
                 article_idx = int(label)
                 similarity = 1 - distance
                 article = self.hnsw_mgr.articles[article_idx]
@@ -359,48 +359,46 @@ class ArticleSearchApp:
         print("="*50)
         
         articles = self.hnsw_mgr.articles
+        facets = self.hnsw_mgr.facets  # cột mã số nguyên tính sẵn lúc load, đếm bằng np.bincount
         
-        # Thống kê nguồn báo
-        sources = {}
-        categories = {}
-        languages = {}
-        
-        for article in articles:
-            src = article['source']
-            cat = article['category']
-            lang = article['language']
-            
-            sources[src] = sources.get(src, 0) + 1
-            categories[cat] = categories.get(cat, 0) + 1
-            languages[lang] = languages.get(lang, 0) + 1
+        sources = facets.top('source')
+        categories = facets.top('category')
+        languages = facets.top('language')
         
         print(f"TỔNG QUAN:")
         print(f"   • Tổng bài báo: {len(articles):,}")
         print(f"   • Số nguồn báo: {len(sources)}")
         print(f"   • Số chuyên mục: {len(categories)}")
+        if 'topic' in facets.columns:
+            print(f"   • Số topic (k-means): {len(self.hnsw_mgr.topics)}")
         
         print(f"\nTOP NGUỒN BÁO:")
         print("-" * 40)
-        top_sources = sorted(sources.items(), key=lambda x: x[1], reverse=True)[:10]
-        for src, count in top_sources:
+        for src, count in sources[:10]:
             percentage = (count / len(articles)) * 100
             print(f"   • {src:<20} {count:>4} bài ({percentage:5.1f}%)")
         
         print(f"\nTOP CHUYÊN MỤC:")
         print("-" * 40)
-        top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:8]
-        for cat, count in top_categories:
+        for cat, count in categories[:8]:
             percentage = (count / len(articles)) * 100
             print(f"   • {cat:<25} {count:>4} bài ({percentage:5.1f}%)")
         
         print(f"\nPHÂN BỐ NGÔN NGỮ:")
         print("-" * 40)
-        for lang, count in sorted(languages.items(), key=lambda x: x[1], reverse=True):
+        for lang, count in languages:
             percentage = (count / len(articles)) * 100
             print(f"   • {lang:<15} {count:>4} bài ({percentage:5.1f}%)")
         
+        if 'topic' in facets.columns:
+            print(f"\nTOP TOPIC:")
+            print("-" * 40)
+            for topic, count in facets.top('topic', limit=8):
+                percentage = (count / len(articles)) * 100
+                print(f"   • {topic:<40} {count:>4} bài ({percentage:5.1f}%)")
+        
         # Thông tin index
-        index_path = 'article_index/article_index.bin'
+        index_path = self.hnsw_mgr.index_path()
         if os.path.exists(index_path):
             size_mb = os.path.getsize(index_path) / (1024 * 1024)
             print(f"\nKích thước index: {size_mb:.2f} MB")
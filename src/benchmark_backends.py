@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_backends.py
+
+So sánh các vector backend (vector_backends.py) trên cùng bộ embeddings: exact vs HNSW vs IVF-PQ.
+Đo: bộ nhớ thường trú, thời gian build, latency mỗi query (mean/p50/p99), recall@k so với brute force.
+
+Không cần load model: dùng article_index/embeddings.npy, query = vector bài báo + nhiễu nhỏ.
+Nếu chưa có embeddings thì dùng --synthetic N để sinh dữ liệu giả lập có cụm.
+
+Ví dụ:
+  python benchmark_backends.py --index-dir article_index
+  python benchmark_backends.py --synthetic 200000 --nlist 2048 --m 48 --nprobe 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from vector_backends import BACKENDS, create_backend
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return (x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)).astype(np.float32)
+
+
+def make_synthetic(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 200), dim))
+    x = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.normal(size=(n, dim))
+    return _normalize(x)
+
+
+def exact_topk(data: np.ndarray, queries: np.ndarray, k: int, block: int = 65536) -> np.ndarray:
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    best_sims = np.zeros((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(data), block):
+        sims = queries @ np.asarray(data[start:start + block]).T
+        ids = np.broadcast_to(np.arange(start, start + sims.shape[1]), sims.shape)
+        all_sims = np.hstack([best_sims, sims])
+        all_ids = np.hstack([best_ids, ids])
+        top = np.argpartition(-all_sims, min(k, all_sims.shape[1] - 1), axis=1)[:, :k]
+        best_sims = np.take_along_axis(all_sims, top, axis=1)
+        best_ids = np.take_along_axis(all_ids, top, axis=1)
+    return best_ids
+
+
+def recall_at_k(gt: np.ndarray, labels: np.ndarray, k: int) -> float:
+    hits = sum(len(set(g[:k]) & set(l[:k].astype(np.int64))) for g, l in zip(gt, labels))
+    return hits / (len(gt) * k)
+
+
+def _time_queries(backend, queries: np.ndarray, k: int):
+    latencies = []
+    labels = []
+    for q in queries:
+        t0 = time.perf_counter()
+        l, _ = backend.search(q, k=k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        labels.append(l)
+    lat = np.array(latencies)
+    return np.array(labels), {
+        "mean_ms": round(float(lat.mean()), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def _resident_bytes(backend, data: np.ndarray) -> int:
+    if backend.name == "hnsw":
+        # hnswlib giữ vector bên trong index + ArticleHNSWManager giữ thêm all_embeddings
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        os.close(fd)
+        try:
+            backend.save(path)
+            return os.path.getsize(path) + data.nbytes
+        finally:
+            os.remove(path)
+    if backend.name == "exact":
+        return data.nbytes + backend.stats()["memory_bytes"]
+    # ivfpq: ma trận rerank là memmap -> nằm trên đĩa / page cache, không tính vào RAM thường trú
+    return backend.stats()["memory_bytes"]
+
+
+def bench_backend(name: str, params: Dict[str, Any], data, queries, gt, k, label=None, rerank_path=None) -> List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    backend = create_backend(name, data.shape[1], **params)
+    backend.build(data, np.arange(len(data)))
+    build_s = time.perf_counter() - t0
+
+    rows = []
+    variants = [None] if name != "ivfpq" else [None, rerank_path]
+    for rerank in variants:
+        if name == "ivfpq":
+            backend.attach_vectors(np.load(rerank, mmap_mode="r") if rerank else None)
+        labels, lat = _time_queries(backend, queries, k)
+        desc = label or name
+        if name == "ivfpq":
+            desc += f", rerank={params.get('rerank_k', 100) if rerank else 0})"
+        rows.append({
+            "backend": desc,
+            "build_s": round(build_s, 3),
+            "resident_mb": round(_resident_bytes(backend, data) / 2 ** 20, 2),
+            "recall": round(recall_at_k(gt, labels, k), 4),
+            **lat,
+        })
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]], k: int) -> None:
+    print(f"\n{'BACKEND':<52} {'BUILD(s)':>9} {'RAM(MB)':>9} {'MEAN(ms)':>9} {'P99(ms)':>9} {'RECALL@' + str(k):>10}")
+    print("-" * 104)
+    for r in rows:
+        print(
+            f"{r['backend']:<52} {r['build_s']:>9.2f} {r['resident_mb']:>9.2f} "
+            f"{r['mean_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['recall']:>10.1%}"
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index-dir", default="article_index")
+    ap.add_argument("--backends", nargs="+", default=["exact", "hnsw", "ivfpq"], choices=sorted(BACKENDS))
+    ap.add_argument("--synthetic", type=int, default=0, help="Sinh N vector giả lập thay vì đọc embeddings.npy")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--M", type=int, default=16)
+    ap.add_argument("--ef-construction", type=int, default=200)
+    ap.add_argument("--ef", type=int, default=100)
+    ap.add_argument("--nlist", type=int, default=None)
+    ap.add_argument("--m", type=int, default=48, help="Số sub-quantizer (byte mã / vector)")
+    ap.add_argument("--nbits", type=int, default=8)
+    ap.add_argument("--nprobe", type=int, default=16)
+    ap.add_argument("--rerank-k", type=int, default=100)
+    ap.add_argument("--json", dest="json_out", default=None)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        data = make_synthetic(args.synthetic, args.dim)
+    else:
+        data = np.load(os.path.join(args.index_dir, "embeddings.npy")).astype(np.float32)
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(data), min(args.queries, len(data)), replace=False)
+    queries = _normalize(data[picks] + 0.05 * rng.normal(size=(len(picks), data.shape[1])))
+
+    print(f"Dữ liệu: {len(data):,} vectors x {data.shape[1]} chiều ({data.nbytes / 2 ** 20:.1f} MB float32)")
+    print(f"Tính ground truth brute force cho {len(queries)} queries...")
+    gt = exact_topk(data, queries, args.k)
+
+    fd, rerank_path = tempfile.mkstemp(suffix=".npy")
+    os.close(fd)
+    np.save(rerank_path, data)
+    try:
+        rows: List[Dict[str, Any]] = []
+        for name in args.backends:
+            if name == "hnsw":
+                params = {"M": args.M, "ef_construction": args.ef_construction, "ef": args.ef, "max_elements": len(data)}
+                label = f"hnsw(M={args.M}, ef={args.ef})"
+            elif name == "ivfpq":
+                params = {"nlist": args.nlist, "m": args.m, "nbits": args.nbits, "nprobe": args.nprobe, "rerank_k": args.rerank_k}
+                label = f"ivfpq(m={args.m}, nprobe={args.nprobe}"
+            else:
+                params, label = {}, name
+            rows.extend(bench_backend(name, params, data, queries, gt, args.k, label=label, rerank_path=rerank_path))
+    finally:
+        os.remove(rerank_path)
+
+    print_table(rows, args.k)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"\nĐã lưu kết quả: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_json.py
+
+Đo thời gian serialize một response /search topk=50 theo từng cách:
+- legacy:  convert_numpy_types (duyệt đệ quy isinstance) + jsonable_encoder + JSONResponse - đường cũ
+- fastapi: trả dict cho FastAPI (jsonable_encoder + JSONResponse)
+- json:    fast_json.dumps khi không có orjson (json chuẩn, Response encode sẵn)
+- orjson:  fast_json.dumps với orjson (nếu đã cài)
+
+Kết quả lấy từ bài thật trong metadata.json (hoặc bài giả nếu không có index).
+
+Ví dụ:
+  python benchmark_json.py --index-dir article_index --topk 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+
+
+def convert_numpy_types(obj: Any) -> Any:
+    """Bản cũ trong server.py, giữ lại để so sánh."""
+    if isinstance(obj, (np.float32, np.float64)):
+        return float(obj)
+    if isinstance(obj, (np.int32, np.int64)):
+        return int(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, dict):
+        return {k: convert_numpy_types(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [convert_numpy_types(x) for x in obj]
+    return obj
+
+
+def load_articles(index_dir: str) -> List[Dict[str, Any]]:
+    path = os.path.join(index_dir, "metadata.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["articles"]
+    rng = random.Random(0)
+    words = ["giá", "vàng", "thị", "trường", "bóng", "đá", "kinh", "tế", "công", "nghệ", "sức", "khỏe"]
+    return [
+        {
+            "title": " ".join(rng.choices(words, k=10)).capitalize(),
+            "source": "VnExpress",
+            "category": "Kinh doanh",
+            "summary": " ".join(rng.choices(words, k=60)),
+            "link": f"https://example.com/{i}",
+        }
+        for i in range(1000)
+    ]
+
+
+def build_response(articles: List[Dict[str, Any]], topk: int, seed: int) -> Dict[str, Any]:
+    """Response như /search trả về: kiểu Python thuần (như format_result)."""
+    rng = random.Random(seed)
+    results = []
+    for doc_id in rng.sample(range(len(articles)), min(topk, len(articles))):
+        a = articles[doc_id]
+        results.append({
+            "doc_id": doc_id,
+            "title": str(a.get("title", "")),
+            "source": str(a.get("source", "")),
+            "category": str(a.get("category", "")),
+            "summary": str(a.get("summary", ""))[:300],
+            "link": str(a.get("link", "")),
+            "published": "01/01/2024 08:00",
+            "score": round(rng.random(), 4),
+        })
+    return {"results": results, "took_ms": 12}
+
+
+def numpy_scored(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Bản có score/doc_id kiểu NumPy, như response trước khi bỏ convert_numpy_types."""
+    results = [{**r, "doc_id": np.int64(r["doc_id"]), "score": np.float32(r["score"])} for r in response["results"]]
+    return {**response, "results": results}
+
+
+def bench(fn: Callable[[], bytes], repeat: int) -> Dict[str, float]:
+    fn()
+    lat = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        lat.append((time.perf_counter() - t0) * 1e6)
+    arr = np.array(lat)
+    return {"mean": float(arr.mean()), "p50": float(np.percentile(arr, 50)), "p99": float(np.percentile(arr, 99))}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index-dir", default="article_index")
+    ap.add_argument("--topk", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    articles = load_articles(args.index_dir)
+    response = build_response(articles, args.topk, seed=0)
+    legacy = numpy_scored(response)
+
+    cases: Dict[str, Callable[[], bytes]] = {
+        "legacy": lambda: JSONResponse(jsonable_encoder(convert_numpy_types(legacy))).body,
+        "fastapi": lambda: JSONResponse(jsonable_encoder(response)).body,
+        "json": lambda: json.dumps(response, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    }
+    if fast_json.orjson is not None:
+        cases["orjson"] = lambda: fast_json.dumps(response)
+
+    print(f"Response topk={args.topk}: {len(cases['json']())} byte, {args.repeat} lần mỗi cách")
+    print(f"{'cách':<10} {'mean(µs)':>10} {'p50(µs)':>10} {'p99(µs)':>10}")
+    for name, fn in cases.items():
+        r = bench(fn, args.repeat)
+        print(f"{name:<10} {r['mean']:>10.1f} {r['p50']:>10.1f} {r['p99']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
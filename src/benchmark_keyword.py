@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_keyword.py
+
+So sánh chấm điểm keyword BM25 toàn bộ (KeywordIndex.score) với top-k MaxScore (KeywordIndex.score_topk)
+trên cùng index: latency (mean/p50/p99), số postings phải đọc, và kiểm tra top-k giống nhau.
+
+Dữ liệu: title + summary trong article_index/metadata.json, hoặc --synthetic N văn bản giả lập có phân bố
+từ Zipf (vài âm tiết rất phổ biến như "của", "và", "người" + đuôi dài các từ hiếm) để xem độ trễ khi corpus lớn dần.
+
+Ví dụ:
+  python benchmark_keyword.py --index-dir article_index
+  python benchmark_keyword.py --synthetic 200000 --k 2000 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from keyword_index import KeywordIndex, tokenize
+
+
+COMMON_QUERIES = ["giá vàng của người dân", "người và việc", "bóng đá của việt nam", "các công ty và thị trường"]
+
+
+def synthetic_docs(n: int, vocab_size: int = 30000, seed: int = 0) -> List[List[str]]:
+    rng = np.random.default_rng(seed)
+    common = ["của", "và", "người", "các", "có", "được", "trong", "cho", "là", "với", "việt", "nam"]
+    words = common + [f"từ{i}" for i in range(vocab_size - len(common))]
+    p = 1.0 / np.arange(1, len(words) + 1) ** 1.05
+    p /= p.sum()
+    lens = rng.integers(20, 80, n)
+    flat = rng.choice(len(words), size=int(lens.sum()), p=p)
+    return [[words[j] for j in part] for part in np.split(flat, np.cumsum(lens)[:-1])]
+
+
+def sample_queries(docs: List[List[str]], n: int, seed: int = 1) -> List[List[str]]:
+    """Query = 2-4 token lấy từ một văn bản ngẫu nhiên (trộn cả âm tiết phổ biến lẫn từ hiếm) + vài query phổ biến."""
+    rng = np.random.default_rng(seed)
+    queries = [tokenize(q) for q in COMMON_QUERIES]
+    while len(queries) < n:
+        doc = docs[int(rng.integers(0, len(docs)))]
+        if len(doc) >= 4:
+            queries.append(list(rng.choice(doc, size=int(rng.integers(2, 5)), replace=False)))
+    return queries
+
+
+def _latency(fn, queries) -> Dict[str, float]:
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat = np.array(lat)
+    return {
+        "mean_ms": round(float(lat.mean()), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def bench(index: KeywordIndex, queries: List[List[str]], k: int) -> List[Dict[str, Any]]:
+    exhaustive = _latency(lambda q: index.score(q, max_docs=k), queries)
+    pruned = _latency(lambda q: index.score_topk(q, k=k), queries)
+
+    scanned, total, same = 0, 0, 0
+    for q in queries:
+        stats: Dict[str, Any] = {}
+        ids_p, sc_p = index.score_topk(q, k=k, stats=stats)
+        ids_e, sc_e = index.score(q, max_docs=k)
+        scanned += stats.get("postings_scanned", 0)
+        total += stats.get("postings_total", 0)
+        # So sánh theo điểm (thứ tự các doc bằng điểm ở biên top-k có thể khác nhau)
+        same += int(np.allclose(np.sort(sc_p)[::-1], np.sort(sc_e)[::-1], rtol=1e-4, atol=1e-5))
+
+    return [
+        {"mode": f"exhaustive (k={k})", **exhaustive, "postings_read": 1.0, "same_topk": 1.0},
+        {"mode": f"maxscore   (k={k})", **pruned,
+         "postings_read": round(scanned / max(1, total), 4), "same_topk": round(same / len(queries), 4)},
+    ]
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    print(f"\n{'MODE':<22} {'MEAN(ms)':>9} {'P50(ms)':>9} {'P99(ms)':>9} {'POSTINGS':>9} {'SAME TOP-K':>11}")
+    print("-" * 74)
+    for r in rows:
+        print(
+            f"{r['mode']:<22} {r['mean_ms']:>9.3f} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+            f"{r['postings_read']:>9.1%} {r['same_topk']:>11.1%}"
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index-dir", default="article_index")
+    ap.add_argument("--synthetic", type=int, default=0, help="Sinh N văn bản giả lập thay vì đọc metadata.json")
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--k", type=int, nargs="+", default=[2000, 100], help="Kích thước top-k (2000 = max_docs của /search)")
+    ap.add_argument("--json", dest="json_out", default=None)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        docs = synthetic_docs(args.synthetic)
+    else:
+        with open(os.path.join(args.index_dir, "metadata.json"), "r", encoding="utf-8") as f:
+            articles = json.load(f)["articles"]
+        docs = [tokenize(f"{a.get('title', '')} {a.get('summary', '')}") for a in articles]
+
+    t0 = time.perf_counter()
+    index = KeywordIndex()
+    index.build(docs)
+    print(
+        f"Keyword index: {index.n_docs:,} docs, {index.vocab_size():,} terms, {len(index.doc_ids):,} postings "
+        f"({index.memory_bytes() / 2 ** 20:.1f} MB), build {time.perf_counter() - t0:.2f}s"
+    )
+
+    queries = sample_queries(docs, args.queries)
+    rows: List[Dict[str, Any]] = []
+    for k in args.k:
+        rows.extend(bench(index, queries, k))
+    print_table(rows)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"\nĐã lưu kết quả: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
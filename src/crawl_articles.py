@@ -6,6 +6,8 @@ from datetime import datetime
 import os
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from article_dates import article_timestamp
+from facets import FacetIndex
 
 class ArticleCrawler:
     def __init__(self, data_dir='article_data'):
@@ -286,6 +288,7 @@ class ArticleCrawler:
                         'source': self._extract_source(feed_url),
                         'crawled_time': datetime.now().isoformat()
                     }
+                    article['published_ts'] = article_timestamp(article)
                     
                     all_articles.append(article)
                     articles_from_feed += 1
@@ -572,18 +575,7 @@ class ArticleCrawler:
         """Tạo file thống kê .txt với phân loại theo chủ đề và ngôn ngữ"""
         stats_file = os.path.join(self.data_dir, 'thong_ke_bai_bao.txt')
         
-        categories = {}
-        languages = {}
-        sources = {}
-        
-        for article in articles:
-            cat = article['category']
-            lang = article['language']
-            src = article['source']
-            
-            categories[cat] = categories.get(cat, 0) + 1
-            languages[lang] = languages.get(lang, 0) + 1
-            sources[src] = sources.get(src, 0) + 1
+        facets = FacetIndex.from_articles(articles)
         
         with open(stats_file, 'w', encoding='utf-8') as f:
             f.write("THỐNG KÊ BÀI BÁO - PHÂN LOẠI THEO CHỦ ĐỀ VÀ NGÔN NGỮ\n")
@@ -593,19 +585,19 @@ class ArticleCrawler:
             
             f.write("PHÂN BỐ THEO CHỦ ĐỀ:\n")
             f.write("-" * 40 + "\n")
-            for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
+            for cat, count in facets.top('category'):
                 percentage = (count / len(articles)) * 100
                 f.write(f"{cat:<25} {count:>4} bài ({percentage:5.1f}%)\n")
             
             f.write("\nPHÂN BỐ THEO NGÔN NGỮ:\n")
             f.write("-" * 40 + "\n")
-            for lang, count in sorted(languages.items(), key=lambda x: x[1], reverse=True):
+            for lang, count in facets.top('language'):
                 percentage = (count / len(articles)) * 100
                 f.write(f"{lang:<15} {count:>4} bài ({percentage:5.1f}%)\n")
             
             f.write("\nPHÂN BỐ THEO NGUỒN BÁO:\n")
             f.write("-" * 40 + "\n")
-            for src, count in sorted(sources.items(), key=lambda x: x[1], reverse=True)[:15]:
+            for src, count in facets.top('source', limit=15):
                 percentage = (count / len(articles)) * 100
                 f.write(f"{src:<20} {count:>4} bài ({percentage:5.1f}%)\n")
         
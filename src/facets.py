@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+facets.py
+
+Thống kê / facet theo source, category, language và topic bằng cột mã số nguyên + np.bincount,
+thay cho việc đếm lại bằng vòng lặp dict trên toàn bộ articles mỗi lần gọi.
+
+- Mỗi thuộc tính được mã hoá một lần thành cột int32 (codes) + danh sách giá trị (values).
+- Đếm cho toàn bộ dữ liệu, một tập kết quả (doc_ids) hay một bộ lọc đều là np.bincount trên cột đó.
+- Topic: mini-batch k-means (cosine) trên embeddings lúc build, mỗi bài có `topic_id`;
+  tên topic ghép từ các từ đặc trưng trong tiêu đề của cụm.
+- Bộ lọc của /search (sources, categories, languages): mỗi giá trị có sẵn một bitset (np.packbits, n_docs/8 byte)
+  tính lúc load. Nhiều giá trị cùng field -> OR, nhiều field -> AND trên các mảng uint8, rồi unpackbits ra mask
+  theo doc_id dùng làm allow-list cho BM25 và ANN.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+FACET_FIELDS = ("source", "category", "language")
+
+_WORD_RE = re.compile(r"[\w]+", flags=re.UNICODE)
+
+
+# -----------------------
+# Topic (mini-batch k-means)
+# -----------------------
+def default_n_topics(n: int) -> int:
+    return int(max(2, min(64, np.sqrt(n / 2))))
+
+
+def assign_topics(x: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    """Topic gần nhất theo cosine (vector và tâm cụm đều đã chuẩn hoá)."""
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), batch_size):
+        block = np.asarray(x[start:start + batch_size], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def minibatch_kmeans(x: np.ndarray, k: int, batch_size: int = 1024, n_iter: int = 100, seed: int = 0) -> np.ndarray:
+    """
+    Mini-batch k-means (Sculley 2010) với khoảng cách cosine: mỗi vòng lấy ngẫu nhiên `batch_size` vector,
+    kéo tâm cụm về trung bình batch với tốc độ học 1/số điểm đã gán. Trả về tâm cụm đã chuẩn hoá (k, d).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    k = min(k, n)
+    centroids = np.asarray(x[rng.choice(n, k, replace=False)], dtype=np.float32).copy()
+    seen = np.zeros(k, dtype=np.float64)
+
+    for _ in range(n_iter):
+        batch = np.asarray(x[rng.integers(0, n, min(batch_size, n))], dtype=np.float32)
+        assign = np.argmax(batch @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        hit = counts > 0
+        # Tổng theo cụm bằng nhân ma trận one-hot (k, b) x (b, d)
+        onehot = np.zeros((k, len(batch)), dtype=np.float32)
+        onehot[assign, np.arange(len(batch))] = 1.0
+        means = (onehot @ batch)[hit] / counts[hit, None]
+
+        seen[hit] += counts[hit]
+        eta = (counts[hit] / seen[hit]).astype(np.float32)[:, None]
+        centroids[hit] += eta * (means - centroids[hit])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+
+    return centroids
+
+
+def topic_labels(articles: Sequence[Dict[str, Any]], topic_ids: np.ndarray, n_topics: int, n_words: int = 3) -> List[str]:
+    """Tên topic: các từ trong tiêu đề xuất hiện nhiều trong cụm nhưng ít ở cụm khác."""
+    per_topic = [Counter() for _ in range(n_topics)]
+    for article, t in zip(articles, topic_ids):
+        per_topic[t].update(w for w in _WORD_RE.findall(str(article.get("title", "")).lower()) if len(w) > 1)
+
+    topic_df = Counter()
+    for c in per_topic:
+        topic_df.update(c.keys())
+
+    labels = []
+    for t, c in enumerate(per_topic):
+        scored = sorted(c.items(), key=lambda x: -x[1] * np.log(1.0 + n_topics / topic_df[x[0]]))
+        words = [w for w, _ in scored[:n_words]]
+        labels.append(f"Chủ đề {t}: {', '.join(words)}" if words else f"Chủ đề {t}")
+    return labels
+
+
+# -----------------------
+# Facet columns
+# -----------------------
+class FacetIndex:
+    def __init__(self, columns: Dict[str, np.ndarray], values: Dict[str, List[str]]):
+        self.columns = columns  # field -> mã int32 theo doc_id
+        self.values = values  # field -> giá trị của từng mã
+        self.n_docs = len(next(iter(columns.values()))) if columns else 0
+        # Đếm trên toàn bộ dữ liệu tính sẵn một lần
+        self._totals: Dict[str, np.ndarray] = {}
+        self._totals = {field: self.counts(field) for field in columns}
+        # field -> bitset (số giá trị, ceil(n_docs / 8)) uint8: hàng c = các doc có mã c
+        self.bitsets = {field: self._build_bitsets(field) for field in columns}
+        self._codes = {field: {v: c for c, v in enumerate(vals)} for field, vals in values.items()}
+
+    @classmethod
+    def from_articles(cls, articles: Sequence[Dict[str, Any]], fields: Sequence[str] = FACET_FIELDS,
+                      topics: Optional[List[str]] = None) -> "FacetIndex":
+        columns: Dict[str, np.ndarray] = {}
+        values: Dict[str, List[str]] = {}
+        for field in fields:
+            raw = [str(a.get(field) or "").strip() or "Unknown" for a in articles]
+            uniq, codes = np.unique(np.array(raw, dtype=str), return_inverse=True)
+            columns[field] = codes.astype(np.int32)
+            values[field] = uniq.tolist()
+
+        if topics and articles and all("topic_id" in a for a in articles):
+            columns["topic"] = np.fromiter((a["topic_id"] for a in articles), dtype=np.int32, count=len(articles))
+            values["topic"] = list(topics)
+        return cls(columns, values)
+
+    def counts(self, field: str, doc_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Số bài theo từng giá trị của field (toàn bộ hoặc chỉ trong doc_ids)."""
+        if doc_ids is None and field in self._totals:
+            return self._totals[field]
+        codes = self.columns[field] if doc_ids is None else self.columns[field][doc_ids]
+        return np.bincount(codes, minlength=len(self.values[field]))
+
+    def top(self, field: str, doc_ids: Optional[np.ndarray] = None, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """[(giá trị, số bài)] giảm dần theo số bài, bỏ giá trị có 0 bài."""
+        counts = self.counts(field, doc_ids)
+        order = np.flatnonzero(counts)
+        order = order[np.lexsort((order, -counts[order]))]
+        if limit is not None:
+            order = order[:limit]
+        names = self.values[field]
+        return [(names[i], int(counts[i])) for i in order]
+
+    def code_of(self, field: str, value: str) -> int:
+        return self._codes.get(field, {}).get(value, -1)
+
+    def _build_bitsets(self, field: str) -> np.ndarray:
+        codes = self.columns[field]
+        n_values = max(len(self.values[field]), int(codes.max()) + 1 if len(codes) else 0)
+        bits = np.zeros((n_values, (self.n_docs + 7) // 8), dtype=np.uint8)
+        for c in range(n_values):
+            bits[c] = np.packbits(codes == c)
+        return bits
+
+    def filter_bits(self, **filters: Optional[Sequence[Any]]) -> Optional[np.ndarray]:
+        """
+        Bitset (uint8 đã pack) các doc thoả mọi field (doc có một trong các giá trị của field đó); field None hoặc
+        không có cột bị bỏ qua, None nếu không có điều kiện nào. topic nhận id số. Giá trị không tồn tại không khớp doc nào.
+        """
+        bits: Optional[np.ndarray] = None
+        for field, values in filters.items():
+            if values is None or field not in self.columns:
+                continue
+            table = self.bitsets[field]
+            codes = [int(v) if field == "topic" else self.code_of(field, v) for v in values]
+            codes = [c for c in codes if 0 <= c < len(table)]
+            field_bits = np.bitwise_or.reduce(table[codes], axis=0) if codes else np.zeros(table.shape[1], dtype=np.uint8)
+            bits = field_bits if bits is None else bits & field_bits
+        return bits
+
+    def filter_mask(self, **filters: Optional[Sequence[Any]]) -> Optional[np.ndarray]:
+        """filter_bits dạng mask bool theo doc_id (None = không lọc)."""
+        bits = self.filter_bits(**filters)
+        return None if bits is None else np.unpackbits(bits, count=self.n_docs).view(bool)
+
+    def filter_ids(self, **filters: Optional[str]) -> np.ndarray:
+        """doc_ids thoả mọi điều kiện field == value (bỏ qua điều kiện None). topic nhận id số."""
+        mask = self.filter_mask(**{field: None if value is None else [value] for field, value in filters.items()})
+        return np.arange(self.n_docs) if mask is None else np.flatnonzero(mask)
+
+    def facets(self, doc_ids: Optional[np.ndarray] = None, limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            field: [{"value": v, "count": c} for v, c in self.top(field, doc_ids, limit)]
+            for field in self.columns
+        }
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fast_json.py
+
+Encode JSON cho response của server: dùng orjson nếu đã cài (pip install orjson), không thì json chuẩn
+(ensure_ascii=False, không khoảng trắng thừa).
+
+Server trả Response với body đã encode sẵn bằng dumps() nên FastAPI bỏ qua bước jsonable_encoder (duyệt đệ quy
+từng giá trị) trước khi serialize. Dict kết quả vốn đã là kiểu Python thuần (doc_payload / format_result),
+hàm default chỉ là lưới an toàn cho giá trị NumPy / datetime lọt vào.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson không bắt buộc
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Không encode được kiểu {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON UTF-8 dạng bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
@@ -1,26 +1,38 @@
 import matplotlib.pyplot as plt
+import numpy as np
+import json
 import os
+from collections import Counter
+
+INDEX_DIR = 'article_index'
+
+# Đọc số liệu thật từ index đã build (thay cho số liệu nhập tay)
+with open(os.path.join(INDEX_DIR, 'metadata.json'), 'r', encoding='utf-8') as f:
+    articles = json.load(f)['articles']
+
+topic_counter = Counter(a.get('category', 'Unknown') for a in articles)
+language_counter = Counter(a.get('language', 'Unknown') for a in articles)
+source_counter = Counter(a.get('source', 'Unknown') for a in articles)
 
 # Biểu đồ chủ đề (top 10)
-topics = ['Thế giới', 'Thể thao', 'Thời sự', 'Giải trí', 'Giáo dục', 
-          'Sức khỏe', 'Tin quốc tế', 'Kinh doanh', 'Bóng đá', 'Khoa học']
-counts = [685, 548, 517, 414, 363, 360, 260, 255, 227, 198]
+topics, counts = zip(*topic_counter.most_common(10))
+topics, counts = list(topics), list(counts)
 
 plt.figure(figsize=(12, 6))
 bars = plt.barh(topics[::-1], counts[::-1], color='skyblue')
 plt.xlabel('Số lượng bài báo')
 plt.title('Top 10 chủ đề bài báo')
 for i, (bar, count) in enumerate(zip(bars, counts[::-1])):
-    plt.text(bar.get_width() + 5, bar.get_y() + bar.get_height()/2, 
+    plt.text(bar.get_width() + 5, bar.get_y() + bar.get_height()/2,
              f'{count} bài', va='center')
 plt.tight_layout()
 plt.savefig('topic_distribution.png', dpi=300)
 plt.show()
 
 # Biểu đồ ngôn ngữ
-languages = ['Tiếng Việt', 'Tiếng Anh']
-sizes = [3488, 971]
-colors = ['#ff9999', '#66b3ff']
+languages = list(language_counter.keys())
+sizes = list(language_counter.values())
+colors = ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99'][:len(languages)]
 
 plt.figure(figsize=(8, 6))
 plt.pie(sizes, labels=languages, colors=colors, autopct='%1.1f%%', startangle=90)
@@ -30,17 +42,48 @@ plt.savefig('language_distribution.png', dpi=300)
 plt.show()
 
 # Biểu đồ nguồn báo (top 10)
-sources = ['Thanh Niên', 'Dân Trí', 'VnExpress', 'VietnamNet', 'Tuổi Trẻ',
-           'VTV', 'ZingNews', 'Daily Mail', 'The Guardian', 'New Scientist']
-source_counts = [800, 778, 729, 420, 324, 250, 187, 137, 100, 100]
+sources, source_counts = zip(*source_counter.most_common(10))
+sources, source_counts = list(sources), list(source_counts)
 
 plt.figure(figsize=(12, 6))
 bars = plt.barh(sources[::-1], source_counts[::-1], color='lightgreen')
 plt.xlabel('Số lượng bài báo')
 plt.title('Top 10 nguồn báo')
 for i, (bar, count) in enumerate(zip(bars, source_counts[::-1])):
-    plt.text(bar.get_width() + 5, bar.get_y() + bar.get_height()/2, 
+    plt.text(bar.get_width() + 5, bar.get_y() + bar.get_height()/2,
              f'{count} bài', va='center')
 plt.tight_layout()
 plt.savefig('source_distribution.png', dpi=300)
-plt.show()
\ No newline at end of file
+plt.show()
+
+# Cấu trúc đồ thị HNSW thật (graph_stats.json do hnsw_inspect.py sinh ra sau mỗi lần build)
+stats_path = os.path.join(INDEX_DIR, 'graph_stats.json')
+if os.path.exists(stats_path):
+    with open(stats_path, 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+
+    plt.figure(figsize=(14, 5))
+
+    plt.subplot(1, 2, 1)
+    level_nodes = [lv['nodes'] for lv in stats['levels']]
+    expected = [lv['expected_nodes'] for lv in stats['levels']]
+    x = np.arange(len(level_nodes))
+    plt.bar(x, level_nodes, color='orange', label='Thực tế')
+    plt.plot(x, expected, 'k--o', label='Lý thuyết (N·M^-l)')
+    plt.yscale('log')
+    plt.xlabel('Level')
+    plt.ylabel('Số node')
+    plt.title(f"Phân bố level (entry point label={stats['entry_point']['label']})")
+    plt.legend()
+
+    plt.subplot(1, 2, 2)
+    hist = stats['levels'][0]['degree_histogram']
+    plt.bar(np.arange(len(hist)), hist, width=1.0, color='purple', alpha=0.7, edgecolor='black')
+    plt.xlabel('Out-degree (level 0)')
+    plt.ylabel('Số node')
+    plt.title(f"Bậc level 0 (fill {stats['levels'][0]['fill_ratio']:.0%}, "
+              f"không tới được: {stats['unreachable_count']})")
+
+    plt.tight_layout()
+    plt.savefig('hnsw_graph_structure.png', dpi=300)
+    plt.show()
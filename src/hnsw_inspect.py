@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+hnsw_inspect.py
+
+Đọc trực tiếp file index hnswlib (article_index.bin) và thống kê cấu trúc đồ thị THẬT
+(thay cho các số liệu mô phỏng trong visualization.py / graph.py).
+
+Báo cáo gồm:
+- Tham số lúc build: M, maxM0, ef_construction, mult
+- Entry point (internal id + label) và max level
+- Phân bố level của các node (so với lý thuyết P(level >= l) = M^-l)
+- Histogram out-degree theo từng level, tỉ lệ lấp đầy (số cạnh heuristic giữ lại / số cạnh tối đa)
+- Số node bị đánh dấu xoá, số node không có cạnh vào, số node không tới được từ entry point
+
+Layout file (hnswlib >= 0.7, HierarchicalNSW::saveIndex):
+  header: offsetLevel0, max_elements, cur_element_count, size_data_per_element,
+          label_offset, offsetData (size_t), maxlevel (int), enterpoint_node (uint32),
+          maxM, maxM0, M (size_t), mult (double), ef_construction (size_t)
+  level0: cur_element_count * size_data_per_element bytes
+          [linklist header uint32 (count: 2 byte thấp, byte thứ 3 = cờ xoá) | maxM0 * uint32 | vector | label]
+  upper : với mỗi element: uint32 size, rồi `size` bytes = level * (uint32 header + maxM * uint32)
+
+Ví dụ:
+  python hnsw_inspect.py --index-dir article_index
+  python hnsw_inspect.py --index-dir article_index --json article_index/graph_stats.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+_HEADER_FMT = "<QQQQQQiIQQQdQ"
+_HEADER_SIZE = struct.calcsize(_HEADER_FMT)
+_DELETE_MARK = 0x01
+
+
+@dataclass
+class HNSWGraph:
+    max_elements: int
+    element_count: int
+    max_level: int
+    entry_point: int
+    max_m: int
+    max_m0: int
+    m: int
+    mult: float
+    ef_construction: int
+    labels: np.ndarray  # (n,) uint64 - internal id -> label
+    levels: np.ndarray  # (n,) int32 - level cao nhất của mỗi node
+    deleted: np.ndarray  # (n,) bool
+    # CSR cho từng level: level -> (indptr, neighbors), chỉ chứa các node có mặt ở level đó
+    level_nodes: List[np.ndarray]
+    level_indptr: List[np.ndarray]
+    level_neighbors: List[np.ndarray]
+
+
+def read_deleted_labels(path: str) -> np.ndarray:
+    """
+    Label các node đã mark_deleted, không parse đồ thị: đọc header rồi memmap level 0, chỉ chạm byte cờ xoá
+    (và label của node bị xoá) của từng node - không đọc vector.
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE:
+        raise ValueError(f"File index quá nhỏ / không hợp lệ: {path}")
+    offset_level0, _, cur_count, size_per_element, label_offset = struct.unpack_from(_HEADER_FMT, header, 0)[:5]
+    if offset_level0 != 0:
+        raise ValueError("Layout index không đúng định dạng hnswlib mong đợi")
+    if cur_count == 0:
+        return np.zeros(0, dtype=np.uint64)
+    level0 = np.memmap(path, dtype=np.uint8, mode="r", offset=_HEADER_SIZE, shape=(cur_count, size_per_element))
+    deleted = np.flatnonzero(level0[:, 2] & _DELETE_MARK)
+    return np.ascontiguousarray(level0[deleted, label_offset:label_offset + 8]).view(np.uint64).ravel()
+
+
+def read_hnsw_index(path: str) -> HNSWGraph:
+    """Parse file index hnswlib thành các mảng numpy (không cần biết dim)."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Không tìm thấy file index: {path}")
+
+    with open(path, "rb") as f:
+        buf = f.read()
+
+    if len(buf) < _HEADER_SIZE:
+        raise ValueError(f"File index quá nhỏ / không hợp lệ: {path}")
+
+    (
+        offset_level0,
+        max_elements,
+        cur_count,
+        size_per_element,
+        label_offset,
+        offset_data,
+        max_level,
+        entry_point,
+        max_m,
+        max_m0,
+        m,
+        mult,
+        ef_construction,
+    ) = struct.unpack_from(_HEADER_FMT, buf, 0)
+
+    if offset_level0 != 0 or offset_data != 4 + max_m0 * 4:
+        raise ValueError("Layout index không đúng định dạng hnswlib mong đợi")
+
+    pos = _HEADER_SIZE
+    level0_bytes = cur_count * size_per_element
+    level0 = np.frombuffer(buf, dtype=np.uint8, count=level0_bytes, offset=pos).reshape(cur_count, size_per_element)
+    pos += level0_bytes
+
+    counts0 = level0[:, 0:2].copy().view(np.uint16).ravel().astype(np.int64)
+    deleted = (level0[:, 2] & _DELETE_MARK).astype(bool)
+    links0 = level0[:, 4:offset_data].copy().view(np.uint32)
+    labels = level0[:, label_offset:label_offset + 8].copy().view(np.uint64).ravel()
+
+    # Level 0: mọi node đều có mặt
+    mask0 = np.arange(max_m0)[None, :] < counts0[:, None]
+    indptr0 = np.zeros(cur_count + 1, dtype=np.int64)
+    np.cumsum(counts0, out=indptr0[1:])
+
+    level_nodes = [np.arange(cur_count, dtype=np.int64)]
+    level_indptr = [indptr0]
+    level_neighbors = [links0[mask0].astype(np.int64)]
+
+    # Các level trên
+    size_links = max_m * 4 + 4
+    levels = np.zeros(cur_count, dtype=np.int32)
+    upper: Dict[int, List[tuple]] = {}
+    for i in range(cur_count):
+        (size,) = struct.unpack_from("<I", buf, pos)
+        pos += 4
+        if size == 0:
+            continue
+        node_levels = size // size_links
+        levels[i] = node_levels
+        block = np.frombuffer(buf, dtype=np.uint32, count=size // 4, offset=pos).reshape(node_levels, max_m + 1)
+        pos += size
+        for lv in range(node_levels):
+            cnt = int(block[lv, 0] & 0xFFFF)
+            upper.setdefault(lv + 1, []).append((i, block[lv, 1:1 + cnt]))
+
+    for lv in range(1, int(max_level) + 1):
+        rows = upper.get(lv, [])
+        nodes = np.array([r[0] for r in rows], dtype=np.int64)
+        counts = np.array([len(r[1]) for r in rows], dtype=np.int64)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        nbrs = np.concatenate([r[1] for r in rows]).astype(np.int64) if rows else np.zeros(0, dtype=np.int64)
+        level_nodes.append(nodes)
+        level_indptr.append(indptr)
+        level_neighbors.append(nbrs)
+
+    return HNSWGraph(
+        max_elements=int(max_elements),
+        element_count=int(cur_count),
+        max_level=int(max_level),
+        entry_point=int(entry_point),
+        max_m=int(max_m),
+        max_m0=int(max_m0),
+        m=int(m),
+        mult=float(mult),
+        ef_construction=int(ef_construction),
+        labels=labels,
+        levels=levels,
+        deleted=deleted,
+        level_nodes=level_nodes,
+        level_indptr=level_indptr,
+        level_neighbors=level_neighbors,
+    )
+
+
+def _reachable_level0(graph: HNSWGraph) -> np.ndarray:
+    """BFS trên level 0 xuất phát từ entry point (bỏ qua node đã xoá)."""
+    n = graph.element_count
+    seen = np.zeros(n, dtype=bool)
+    if n == 0:
+        return seen
+
+    indptr = graph.level_indptr[0]
+    nbrs = graph.level_neighbors[0]
+    frontier = np.array([graph.entry_point], dtype=np.int64)
+    seen[frontier] = True
+
+    while frontier.size:
+        starts = indptr[frontier]
+        ends = indptr[frontier + 1]
+        lens = ends - starts
+        if lens.sum() == 0:
+            break
+        # gather toàn bộ neighbor của frontier một lần
+        idx = np.repeat(starts - np.cumsum(np.r_[0, lens[:-1]]), lens) + np.arange(lens.sum())
+        cand = np.unique(nbrs[idx])
+        cand = cand[~seen[cand]]
+        seen[cand] = True
+        frontier = cand[~graph.deleted[cand]]
+
+    return seen
+
+
+def analyze_graph(graph: HNSWGraph) -> Dict[str, Any]:
+    """Thống kê cấu trúc đồ thị từ HNSWGraph."""
+    n = graph.element_count
+    alive = ~graph.deleted
+
+    level_counts = np.bincount(graph.levels, minlength=graph.max_level + 1) if n else np.zeros(1, dtype=np.int64)
+    at_least = np.cumsum(level_counts[::-1])[::-1]
+
+    per_level: List[Dict[str, Any]] = []
+    total_edges = 0
+    for lv in range(len(graph.level_nodes)):
+        indptr = graph.level_indptr[lv]
+        degrees = np.diff(indptr)
+        cap = graph.max_m0 if lv == 0 else graph.max_m
+        hist = np.bincount(degrees, minlength=cap + 1) if degrees.size else np.zeros(cap + 1, dtype=np.int64)
+        avg = float(degrees.mean()) if degrees.size else 0.0
+        total_edges += int(degrees.sum())
+        per_level.append({
+            "level": lv,
+            "nodes": int(degrees.size),
+            "expected_nodes": float(n * graph.m ** (-lv)) if graph.m > 1 else float(n),
+            "max_degree": cap,
+            "avg_out_degree": round(avg, 3),
+            "fill_ratio": round(avg / cap, 4) if cap else 0.0,
+            "saturated_nodes": int((degrees >= cap).sum()),
+            "isolated_nodes": int((degrees == 0).sum()),
+            "degree_histogram": hist.tolist(),
+        })
+
+    in_degree0 = np.bincount(graph.level_neighbors[0], minlength=n) if n else np.zeros(0, dtype=np.int64)
+    no_in = (in_degree0 == 0) & alive
+    if n:
+        no_in[graph.entry_point] = False
+
+    reachable = _reachable_level0(graph)
+    unreachable_ids = np.flatnonzero(~reachable & alive)
+
+    return {
+        "element_count": n,
+        "max_elements": graph.max_elements,
+        "deleted_count": int(graph.deleted.sum()),
+        "M": graph.m,
+        "maxM0": graph.max_m0,
+        "ef_construction": graph.ef_construction,
+        "mult": graph.mult,
+        "max_level": graph.max_level,
+        "entry_point": {
+            "internal_id": graph.entry_point,
+            "label": int(graph.labels[graph.entry_point]) if n else None,
+            "level": int(graph.levels[graph.entry_point]) if n else None,
+        },
+        "level_distribution": {
+            "exact_level": level_counts.tolist(),
+            "at_least_level": at_least.tolist(),
+        },
+        "levels": per_level,
+        "total_edges": total_edges,
+        "no_in_edges_level0": int(no_in.sum()),
+        "unreachable_count": int(unreachable_ids.size),
+        "unreachable_labels": [int(x) for x in graph.labels[unreachable_ids[:100]]],
+    }
+
+
+def inspect_index_file(path: str) -> Dict[str, Any]:
+    report = analyze_graph(read_hnsw_index(path))
+    report["index_path"] = path
+    report["file_size_mb"] = round(os.path.getsize(path) / (1024 * 1024), 3)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("THỐNG KÊ CẤU TRÚC ĐỒ THỊ HNSW")
+    print("=" * 60)
+    print(f"Số node: {report['element_count']:,} / max {report['max_elements']:,} (xoá: {report['deleted_count']})")
+    print(f"M={report['M']} | maxM0={report['maxM0']} | ef_construction={report['ef_construction']}")
+    ep = report["entry_point"]
+    print(f"Entry point: internal={ep['internal_id']} label={ep['label']} level={ep['level']}")
+    print(f"Max level: {report['max_level']}")
+    print("-" * 60)
+    print(f"{'LEVEL':<6} {'NODES':>9} {'LÝ THUYẾT':>11} {'AVG DEG':>8} {'FILL':>7} {'BÃO HOÀ':>8}")
+    for lv in report["levels"]:
+        print(
+            f"{lv['level']:<6} {lv['nodes']:>9,} {lv['expected_nodes']:>11,.0f} "
+            f"{lv['avg_out_degree']:>8.2f} {lv['fill_ratio']:>7.1%} {lv['saturated_nodes']:>8,}"
+        )
+    print("-" * 60)
+    print(f"Node không có cạnh vào (level 0): {report['no_in_edges_level0']}")
+    print(f"Node không tới được từ entry point: {report['unreachable_count']}")
+    if report["unreachable_count"]:
+        print(f"  [WARN] Ví dụ label: {report['unreachable_labels'][:10]}")
+
+
+def save_report(report: Dict[str, Any], path: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index-dir", default="article_index", help="Thư mục chứa article_index.bin")
+    ap.add_argument("--index-file", default=None, help="Đường dẫn trực tiếp tới file .bin (ưu tiên hơn --index-dir)")
+    ap.add_argument("--json", dest="json_out", default=None, help="Ghi báo cáo ra file JSON")
+    args = ap.parse_args()
+
+    path = args.index_file or os.path.join(args.index_dir, "article_index.bin")
+    report = inspect_index_file(path)
+    print_report(report)
+
+    if args.json_out:
+        save_report(report, args.json_out)
+        print(f"Đã lưu báo cáo: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
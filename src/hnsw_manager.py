@@ -1,22 +1,61 @@
 import numpy as np
 import os
 import time
-import hnswlib
 import json
 import pickle
+from article_dates import article_timestamps, load_timestamps, save_timestamps
 from article_embedder import ArticleEmbedder
+from hnsw_inspect import inspect_index_file, print_report, save_report
+from facets import FacetIndex, assign_topics, default_n_topics, minibatch_kmeans, topic_labels
+from near_duplicates import DEFAULT_K, DEFAULT_THRESHOLD, cluster_stats, find_duplicate_clusters, save_build_report
+from vector_backends import BACKENDS, backend_file, create_backend
+
+# Bộ lọc (allow-list) còn ít hơn ngưỡng này bài: chấm chính xác các bài đó thay vì search ANN có lọc
+FILTER_EXACT_MAX = int(os.environ.get('ARTICLE_FILTER_EXACT_MAX', '2048'))
 
 class ArticleHNSWManager:
-    def __init__(self, index_dir='article_index'):
+    def __init__(self, index_dir='article_index', backend=None, backend_params=None, build_missing=None):
+        # Backend vector: 'hnsw' (mặc định), 'exact', 'ivfpq' - xem vector_backends.py
+        # Có thể chọn qua biến môi trường ARTICLE_INDEX_BACKEND / ARTICLE_INDEX_BACKEND_PARAMS (JSON)
+        backend = backend or os.environ.get('ARTICLE_INDEX_BACKEND') or None
+        if backend_params is None and os.environ.get('ARTICLE_INDEX_BACKEND_PARAMS'):
+            backend_params = json.loads(os.environ['ARTICLE_INDEX_BACKEND_PARAMS'])
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"Backend không hỗ trợ: {backend} (chọn một trong {sorted(BACKENDS)})")
+        # Backend được chọn khác backend đã build và chưa có file index: chỉ build (và ghi file vào index_dir) khi bật
+        # rõ ràng (tham số hoặc ARTICLE_INDEX_BUILD_MISSING=1), không thì load_index báo lỗi
+        if build_missing is None:
+            build_missing = os.environ.get('ARTICLE_INDEX_BUILD_MISSING', '0') == '1'
+        self.build_missing = build_missing
+        
         self.index_dir = index_dir
         self.dim = 768
         self.index = None
         self.articles = []
         self.embedder = ArticleEmbedder()
         self.all_embeddings = None
+        # None = lúc build dùng 'hnsw', lúc load dùng backend đã ghi trong metadata.json
+        self.backend = backend
+        self.backend_params = dict(backend_params or {})
+        # Cấu hình lọc bài gần trùng lúc build (ghi vào metadata.json để merge incremental dùng lại)
+        self.dedup = {}
+        # Top-N bài liên quan tính sẵn cho mọi bài: label int32 (-1 = trống) và similarity float16
+        self.related_labels = None
+        self.related_sims = None
+        # Topic (mini-batch k-means lúc build) + cột facet mã số nguyên cho source/category/language/topic
+        self.topics = []
+        self.facets = None
+        # Ngày đăng epoch giây (int64, MISSING_TS = không có ngày) theo doc_id, xem article_dates.py
+        self.timestamps = np.zeros(0, dtype=np.int64)
+        # Thế hệ index: đổi mỗi lần ghi metadata (build / merge), dùng để vô hiệu hoá cache kết quả tìm kiếm
+        self.generation = 0
+        self._indexed_mask = None
         
         os.makedirs(index_dir, exist_ok=True)
     
+    def index_path(self):
+        return backend_file(self.backend or 'hnsw', self.index_dir)
+    
     def get_index_info(self):
         if self.index is None:
             return {
@@ -29,7 +68,8 @@ class ArticleHNSWManager:
         return {
             'dim': self.dim,
             'article_count': len(self.articles),
-            'vector_count': self.index.get_current_count(),
+            'vector_count': self.index.count(),
+            'backend': self.index.name,
             'index_dir': self.index_dir
         }
     
@@ -44,7 +84,27 @@ class ArticleHNSWManager:
         
         return sorted(list(sources))
     
-    def build_index(self, articles, max_elements=10000, ef_construction=200, M=16):
+    def canonical_ids(self):
+        """canonical_id của mọi bài (bài chưa qua lọc gần trùng là đại diện của chính nó)."""
+        return np.array([a.get('canonical_id', i) for i, a in enumerate(self.articles)], dtype=np.int64)
+    
+    def indexed_labels(self):
+        """Label các bài được đưa vào vector index (chỉ bài đại diện nếu build với canonical_only)."""
+        labels = np.arange(len(self.articles))
+        if not self.dedup.get('canonical_only'):
+            return labels
+        return labels[self.canonical_ids() == labels]
+    
+    def indexed_mask(self):
+        """indexed_labels() dạng mask bool theo doc_id, tính lại khi đổi thế hệ index."""
+        if self._indexed_mask is None or self._indexed_mask[0] != (self.generation, len(self.articles)):
+            mask = np.zeros(len(self.articles), dtype=bool)
+            mask[self.indexed_labels()] = True
+            self._indexed_mask = ((self.generation, len(self.articles)), mask)
+        return self._indexed_mask[1]
+    
+    def build_index(self, articles, max_elements=10000, ef_construction=200, M=16,
+                    dedup_threshold=DEFAULT_THRESHOLD, canonical_only=False, n_related=20, n_topics=None):
         print("ĐANG XÂY DỰNG INDEX TÌM KIẾM BÀI BÁO")
         print("=" * 50)
         
@@ -64,6 +124,7 @@ class ArticleHNSWManager:
         valid_articles, embeddings = self.embedder.embed_articles(unique_articles)
         self.articles = valid_articles
         self.all_embeddings = embeddings
+        self.timestamps = article_timestamps(self.articles)
         
         if len(embeddings) == 0:
             print("Không có embeddings để xây dựng index!")
@@ -71,28 +132,163 @@ class ArticleHNSWManager:
         
         print(f"Dữ liệu embedding: {len(embeddings)} bài báo, {embeddings.shape[1]} chiều")
         
-        # Xây dựng HNSW index
-        print("Đang xây dựng HNSW index...")
-        start_time = time.time()
+        self.backend = self.backend or 'hnsw'
+        if self.backend == 'hnsw':
+            self.backend_params = {'max_elements': max_elements, 'ef_construction': ef_construction,
+                                   'M': M, **self.backend_params}
         
-        self.index = hnswlib.Index(space='cosine', dim=embeddings.shape[1])
-        self.index.init_index(max_elements=max_elements, 
-                            ef_construction=ef_construction, 
-                            M=M)
+        print(f"Đang xây dựng index ({self.backend})...")
+        start_time = time.time()
         
-        self.index.add_items(embeddings, np.arange(len(embeddings)))
+        self.index = create_backend(self.backend, embeddings.shape[1], **self.backend_params)
+        self.index.build(embeddings, np.arange(len(embeddings)))
+        self.index.attach_vectors(embeddings)
         build_time = time.time() - start_time
         
-        print(f"Thời gian xây dựng HNSW: {build_time:.4f}s")
+        print(f"Thời gian xây dựng {self.backend}: {build_time:.4f}s")
+        
+        report = {'backend': self.backend, 'build_time_s': round(build_time, 4), 'dedup': None}
+        self.dedup = {}
+        if dedup_threshold:
+            report['dedup'] = self._detect_near_duplicates(embeddings, dedup_threshold, canonical_only)
+        if n_topics != 0:
+            report['topics'] = self.build_topics(n_topics)
+        self.facets = FacetIndex.from_articles(self.articles, topics=self.topics)
         
         # Lưu metadata và index
         self._save_metadata()
-        index_path = os.path.join(self.index_dir, 'article_index.bin')
-        self.index.save_index(index_path)
+        self.index.save(self.index_path())
+        if self.backend == 'hnsw':
+            self.save_graph_stats()
+        if n_related:
+            report['related'] = self.precompute_related(n_related)
+        
+        report['index_file_bytes'] = os.path.getsize(self.index_path())
+        save_build_report(report, os.path.join(self.index_dir, 'build_report.json'))
         
         print("XÂY DỰNG INDEX HOÀN TẤT!")
         return True
     
+    def _detect_near_duplicates(self, embeddings, threshold, canonical_only, k=DEFAULT_K):
+        """Self-join k-NN trên index vừa build, gán canonical_id cho từng bài; tuỳ chọn chỉ index bài đại diện."""
+        print(f"Đang tìm bài gần trùng (cosine >= {threshold}, k={k})...")
+        found = find_duplicate_clusters(self.index, embeddings, threshold=threshold, k=k)
+        canonical = found['canonical']
+        for article, canonical_id in zip(self.articles, canonical):
+            article['canonical_id'] = int(canonical_id)
+        self.dedup = {'threshold': threshold, 'k': k, 'canonical_only': bool(canonical_only)}
+        
+        if canonical_only:
+            keep = self.indexed_labels()
+            if len(keep) < len(embeddings):
+                print(f"Build lại index chỉ với {len(keep)} bài đại diện...")
+                self.index = create_backend(self.backend, embeddings.shape[1], **self.backend_params)
+                self.index.build(embeddings[keep], keep)
+                self.index.attach_vectors(embeddings)
+        
+        stats = cluster_stats(canonical, indexed=self.index.count())
+        print(f"Cụm trùng: {stats['duplicate_clusters']} cụm, {stats['duplicate_articles']} bài trùng "
+              f"(cụm lớn nhất {stats['largest_cluster']} bài), self-join {found['selfjoin_s']:.2f}s")
+        if canonical_only:
+            print(f"Index giảm {stats['index_size_reduction']:.1%}: {stats['articles']} -> {stats['indexed_vectors']} vectors")
+        return {**self.dedup, 'pairs': found['pairs'], 'selfjoin_s': found['selfjoin_s'], **stats}
+    
+    def build_topics(self, n_topics=None):
+        """Mini-batch k-means trên embeddings -> topic_id cho từng bài, tên topic, topic_centroids.npy"""
+        start_time = time.time()
+        n_topics = n_topics or default_n_topics(len(self.all_embeddings))
+        centroids = minibatch_kmeans(self.all_embeddings, n_topics)
+        topic_ids = assign_topics(self.all_embeddings, centroids)
+        for article, topic_id in zip(self.articles, topic_ids):
+            article['topic_id'] = int(topic_id)
+        self.topics = topic_labels(self.articles, topic_ids, len(centroids))
+        np.save(os.path.join(self.index_dir, 'topic_centroids.npy'), centroids)
+        
+        took = time.time() - start_time
+        sizes = np.bincount(topic_ids, minlength=len(centroids))
+        print(f"Đã gom {len(self.articles)} bài thành {len(centroids)} topic trong {took:.2f}s "
+              f"(nhỏ nhất {sizes.min()}, lớn nhất {sizes.max()} bài)")
+        return {'n_topics': len(centroids), 'time_s': round(took, 4),
+                'min_size': int(sizes.min()), 'max_size': int(sizes.max())}
+    
+    def assign_new_topics(self, labels, vectors):
+        """Gán topic cho bài thêm sau (merge incremental) theo tâm cụm đã lưu lúc build."""
+        centroids_path = os.path.join(self.index_dir, 'topic_centroids.npy')
+        if not self.topics or not os.path.exists(centroids_path):
+            return
+        topic_ids = assign_topics(vectors, np.load(centroids_path))
+        for label, topic_id in zip(labels, topic_ids):
+            self.articles[int(label)]['topic_id'] = int(topic_id)
+    
+    @staticmethod
+    def _related_from_candidates(row_canonical, labels, label_canonical, distances, n_related):
+        """Bỏ chính bài đó và bản gần trùng của nó (cùng canonical_id), giữ n_related ứng viên đầu mỗi dòng."""
+        labels = labels.astype(np.int64)
+        valid = label_canonical != row_canonical[:, None]
+        order = np.argsort(~valid, axis=1, kind='stable')[:, :n_related]
+        keep = np.take_along_axis(valid, order, axis=1)
+        out_labels = np.where(keep, np.take_along_axis(labels, order, axis=1), -1)
+        out_sims = np.where(keep, 1.0 - np.take_along_axis(distances, order, axis=1), 0.0)
+        return out_labels, out_sims
+    
+    def precompute_related(self, n_related=20, batch_size=1024):
+        """Tính sẵn top-n_related bài liên quan cho mọi bài (self-join trên index) -> related_*.npy"""
+        start_time = time.time()
+        n = len(self.articles)
+        canonical = self.canonical_ids()
+        fetch = min(2 * n_related + 1, self.index.count())
+        self.related_labels = np.full((n, n_related), -1, dtype=np.int32)
+        self.related_sims = np.zeros((n, n_related), dtype=np.float16)
+        for start in range(0, n, batch_size):
+            rows = np.arange(start, min(start + batch_size, n))
+            labels, distances = self.index.batch_search(self.all_embeddings[rows], k=fetch)
+            out_labels, out_sims = self._related_from_candidates(
+                canonical[rows], labels, canonical[labels.astype(np.int64)], distances, n_related)
+            self.related_labels[rows, :out_labels.shape[1]] = out_labels
+            self.related_sims[rows, :out_sims.shape[1]] = out_sims
+        
+        np.save(os.path.join(self.index_dir, 'related_labels.npy'), self.related_labels)
+        np.save(os.path.join(self.index_dir, 'related_sims.npy'), self.related_sims)
+        took = time.time() - start_time
+        size = self.related_labels.nbytes + self.related_sims.nbytes
+        print(f"Đã tính sẵn {n_related} bài liên quan cho {n} bài ({size / 2 ** 20:.1f} MB) trong {took:.2f}s")
+        return {'n_related': n_related, 'bytes': int(size), 'time_s': round(took, 4)}
+    
+    def related(self, doc_id, k=10):
+        """
+        Bài liên quan tới bài doc_id từ vector đã lưu (không gọi model): trả về (labels, similarities).
+        Dùng bảng tính sẵn nếu có (bài thêm sau bằng merge incremental chưa có dòng -> search trực tiếp).
+        """
+        if not 0 <= doc_id < len(self.articles):
+            raise IndexError(f"doc_id ngoài phạm vi: {doc_id}")
+        
+        if self.related_labels is not None and doc_id < len(self.related_labels) and k <= self.related_labels.shape[1]:
+            labels = self.related_labels[doc_id, :k]
+            keep = labels >= 0
+            return labels[keep].astype(np.int64), self.related_sims[doc_id, :k][keep].astype(np.float32)
+        
+        fetch = min(2 * k + 1, self.index.count())
+        labels, distances = self.index.search(np.asarray(self.all_embeddings[doc_id], dtype=np.float32), k=fetch)
+        label_canonical = np.array([self.articles[int(l)].get('canonical_id', int(l)) for l in labels], dtype=np.int64)
+        row_canonical = np.array([self.articles[doc_id].get('canonical_id', doc_id)], dtype=np.int64)
+        out_labels, out_sims = self._related_from_candidates(
+            row_canonical, labels[None, :], label_canonical[None, :], distances[None, :], k)
+        keep = out_labels[0] >= 0
+        return out_labels[0][keep], out_sims[0][keep].astype(np.float32)
+    
+    def save_graph_stats(self):
+        """Thống kê cấu trúc đồ thị thật từ file index đã lưu -> graph_stats.json"""
+        index_path = backend_file('hnsw', self.index_dir)
+        try:
+            report = inspect_index_file(index_path)
+        except Exception as e:
+            print(f"Không thống kê được đồ thị HNSW: {e}")
+            return None
+        
+        print_report(report)
+        save_report(report, os.path.join(self.index_dir, 'graph_stats.json'))
+        return report
+    
     def _cosine_similarity(self, vec1, vec2):
         dot_product = np.dot(vec1, vec2)
         norm1 = np.linalg.norm(vec1)
@@ -104,16 +300,23 @@ class ArticleHNSWManager:
         return dot_product / (norm1 * norm2)
     
     def _save_metadata(self):
+        self.generation = time.time_ns()
         metadata = {
             'dim': self.dim,
             'total_articles': len(self.articles),
+            'backend': self.backend,
+            'backend_params': self.backend_params,
+            'dedup': self.dedup,
+            'topics': self.topics,
             'articles': self.articles,
             'build_time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'generation': self.generation,
         }
         
         metadata_path = os.path.join(self.index_dir, 'metadata.json')
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
+        self.timestamps = save_timestamps(self.index_dir, self.articles)
         
         # Lưu embeddings riêng để tránh file quá lớn
         if self.all_embeddings is not None:
@@ -133,25 +336,55 @@ class ArticleHNSWManager:
         
         self.dim = metadata['dim']
         self.articles = metadata['articles']
+        self.dedup = metadata.get('dedup', {})
+        self.topics = metadata.get('topics', [])
+        self.generation = metadata.get('generation', metadata.get('build_time', 0))
+        self.timestamps = load_timestamps(self.index_dir, self.articles)
+        self.facets = FacetIndex.from_articles(self.articles, topics=self.topics)
+        built_backend = metadata.get('backend', 'hnsw')
+        if self.backend is None or self.backend == built_backend:
+            self.backend = built_backend
+            self.backend_params = {**metadata.get('backend_params', {}), **self.backend_params}
+        backend_cls = BACKENDS[self.backend]
         
         # Tải embeddings từ file .npy
+        # Backend không cần đọc embeddings thường xuyên (ivfpq) -> chỉ memory-map, không giữ thêm bản trong RAM
         embeddings_path = os.path.join(self.index_dir, 'embeddings.npy')
         if os.path.exists(embeddings_path):
             print("Đang tải embeddings từ file...")
-            self.all_embeddings = np.load(embeddings_path)
+            mmap_mode = 'r' if backend_cls.mmap_embeddings else None
+            self.all_embeddings = np.load(embeddings_path, mmap_mode=mmap_mode)
             print(f"Đã tải {len(self.all_embeddings)} embeddings")
         else:
             print("Không tìm thấy embeddings cache, cần embed lại...")
             valid_articles, embeddings = self.embedder.embed_articles(self.articles)
             self.all_embeddings = embeddings
         
-        index_path = os.path.join(self.index_dir, 'article_index.bin')
-        if not os.path.exists(index_path):
+        self.index = create_backend(self.backend, self.dim, **self.backend_params)
+        index_path = self.index_path()
+        if os.path.exists(index_path):
+            self.index.load(index_path)
+        elif self.backend != built_backend:
+            if not self.build_missing:
+                raise FileNotFoundError(
+                    f"Index được build bằng backend '{built_backend}', chưa có file cho backend '{self.backend}' "
+                    f"({index_path}). Bỏ ARTICLE_INDEX_BACKEND để dùng '{built_backend}', hoặc đặt "
+                    f"ARTICLE_INDEX_BUILD_MISSING=1 (build_missing=True) để build từ embeddings đã lưu."
+                )
+            # Thử nghiệm backend khác trên cùng dữ liệu: build từ embeddings đã lưu, không cần embed lại
+            print(f"Chưa có index '{self.backend}' (index đã build bằng '{built_backend}'), "
+                  f"ARTICLE_INDEX_BUILD_MISSING=1: đang build từ embeddings đã lưu và ghi {index_path}...")
+            labels = self.indexed_labels()
+            self.index.build(np.asarray(self.all_embeddings[labels], dtype=np.float32), labels)
+            self.index.save(index_path)
+        else:
             raise FileNotFoundError(f"Không tìm thấy file index: {index_path}")
+        self.index.attach_vectors(self.all_embeddings)
         
-        self.index = hnswlib.Index(space='cosine', dim=self.dim)
-        self.index.load_index(index_path)
-        self.index.set_ef(100)
+        related_path = os.path.join(self.index_dir, 'related_labels.npy')
+        if os.path.exists(related_path):
+            self.related_labels = np.load(related_path)
+            self.related_sims = np.load(os.path.join(self.index_dir, 'related_sims.npy'))
         
         print(f"Tải thành công: {len(self.articles)} bài báo")
         return True
@@ -180,7 +413,7 @@ class ArticleHNSWManager:
             }
         
         # Sắp xếp theo thời gian (nếu có)
-        source_articles.sort(key=lambda x: x[1].get('published', ''), reverse=True)
+        source_articles.sort(key=lambda x: self.timestamps[x[0]], reverse=True)
         
         results = []
         for idx, (article_idx, article) in enumerate(source_articles[:k]):
@@ -196,8 +429,52 @@ class ArticleHNSWManager:
             'count': len(source_articles)
         }
     
-    def search_with_comparison(self, query, k=10, filter_source=None):
-        """Tìm kiếm với khả năng lọc theo nguồn báo"""
+    def rerank_exact(self, query_vector, labels, k):
+        """Chấm lại điểm ứng viên ANN bằng dot product chính xác trên embeddings đã chuẩn hoá, trả về top-k thật.
+        
+        Trả về (labels, distances, info) với distance = 1 - cosine similarity như backend.search().
+        """
+        start_time = time.perf_counter()
+        
+        cand = np.asarray(labels, dtype=np.int64)
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        rows = np.sort(cand)  # đọc embeddings theo thứ tự tăng dần (thân thiện với memmap)
+        sims = np.asarray(self.all_embeddings[rows], dtype=np.float32) @ q
+        
+        k = min(k, len(rows))
+        top = np.argpartition(-sims, k - 1)[:k] if k > 0 else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-sims[top])]
+        out_labels = rows[top]
+        
+        info = {
+            'candidates': int(len(cand)),
+            'rerank_ms': round((time.perf_counter() - start_time) * 1000, 3),
+            # số kết quả trong top-k sau rerank mà thứ tự ANN ban đầu không đưa vào top-k
+            'promoted': int(len(set(out_labels.tolist()) - set(cand[:k].tolist()))),
+        }
+        return out_labels, (1.0 - sims[top]).astype(np.float32), info
+    
+    def search_vectors(self, query_vector, k, rerank=0, allowed=None):
+        """Search ANN; nếu rerank > k thì lấy `rerank` ứng viên rồi chấm lại chính xác để ra top-k.
+        
+        allowed: mask bool theo doc_id (allow-list của bộ lọc). Ít bài được phép (<= FILTER_EXACT_MAX) thì chấm
+        chính xác đúng các bài đó (rẻ hơn duyệt đồ thị tìm k bài thoả lọc), không thì backend lọc trong lúc search.
+        """
+        if allowed is not None and self.all_embeddings is not None:
+            rows = np.flatnonzero(allowed & self.indexed_mask())
+            if len(rows) <= FILTER_EXACT_MAX:
+                if not len(rows):
+                    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), None
+                labels, distances, _ = self.rerank_exact(query_vector, rows, k)
+                return labels, distances, None
+        if rerank and rerank > k and self.all_embeddings is not None:
+            labels, _ = self.index.search(query_vector, k=rerank, allowed=allowed)
+            return self.rerank_exact(query_vector, labels, k)
+        labels, distances = self.index.search(query_vector, k=k, allowed=allowed)
+        return labels, distances, None
+    
+    def search_with_comparison(self, query, k=10, filter_source=None, rerank=0):
+        """Tìm kiếm với khả năng lọc theo nguồn báo (rerank > 0: thêm bước chấm lại chính xác `rerank` ứng viên)"""
         if self.index is None or self.all_embeddings is None:
             raise RuntimeError("Hệ thống chưa được khởi tạo!")
         
@@ -213,13 +490,13 @@ class ArticleHNSWManager:
         start_time = time.time()
         
         similarities = []
-        for i in range(len(self.all_embeddings)):
+        for i in self.indexed_labels():  # cùng tập bài với index (bỏ bài trùng nếu build canonical_only)
             # Lọc theo nguồn nếu có
             if filter_source and filter_source.lower() not in self.articles[i]['source'].lower():
                 continue
                 
             similarity = self._cosine_similarity(query_vector[0], self.all_embeddings[i])
-            similarities.append((i, similarity))
+            similarities.append((int(i), similarity))
         
         similarities.sort(key=lambda x: x[1], reverse=True)
         brute_results = similarities[:k]
@@ -229,22 +506,31 @@ class ArticleHNSWManager:
         print("HNSW SEARCH...")
         start_time = time.time()
         
-        labels, distances = self.index.knn_query(query_vector, k=min(k*3, len(self.articles)))  # Lấy nhiều hơn để lọc
+        n_fetch = min(max(k*3, rerank), len(self.articles))  # Lấy nhiều hơn để lọc
+        labels, distances = self.index.search(query_vector, k=n_fetch)
         
-        # Lọc kết quả theo nguồn nếu có
-        hnsw_results = []
-        for i, (label, distance) in enumerate(zip(labels[0], distances[0])):
-            article_idx = int(label)
-            
-            # Lọc theo nguồn
-            if filter_source and filter_source.lower() not in self.articles[article_idx]['source'].lower():
-                continue
+        def filter_results(labels, distances):
+            # Lọc kết quả theo nguồn nếu có
+            results = []
+            for i, (label, distance) in enumerate(zip(labels, distances)):
+                article_idx = int(label)
                 
-            similarity = 1 - distance
-            hnsw_results.append((article_idx, similarity))
-            
-            if len(hnsw_results) >= k:
-                break
+                # Lọc theo nguồn
+                if filter_source and filter_source.lower() not in self.articles[article_idx]['source'].lower():
+                    continue
+                    
+                similarity = 1 - distance
+                results.append((article_idx, similarity))
+                
+                if len(results) >= k:
+                    break
+            return results
+        
+        ann_results = filter_results(labels, distances)
+        rerank_info = None
+        if rerank:
+            labels, distances, rerank_info = self.rerank_exact(query_vector, labels, n_fetch)
+        hnsw_results = filter_results(labels, distances)
         
         hnsw_time = time.time() - start_time
         
@@ -264,6 +550,15 @@ class ArticleHNSWManager:
         print(f"  Độ chính xác Top-{k}: {accuracy:.1%}")
         print(f"  Kết quả trùng: {len(common_results)}/{min(len(brute_results), len(hnsw_results))}")
         
+        if rerank_info is not None:
+            ann_common = brute_indices & {idx for idx, _ in ann_results}
+            ann_accuracy = len(ann_common) / min(len(brute_results), len(ann_results)) if min(len(brute_results), len(ann_results)) > 0 else 0
+            rerank_info['recall_before'] = ann_accuracy
+            rerank_info['recall_after'] = accuracy
+            rerank_info['recall_gained'] = accuracy - ann_accuracy
+            print(f"  Rerank chính xác {rerank_info['candidates']} ứng viên: {rerank_info['rerank_ms']:.3f}ms, "
+                  f"độ chính xác {ann_accuracy:.1%} -> {accuracy:.1%}")
+        
         return {
             'query': query,
             'filter_source': filter_source,
@@ -281,7 +576,8 @@ class ArticleHNSWManager:
                 'speedup': brute_time / hnsw_time if hnsw_time > 0 else 0,
                 'accuracy': accuracy,
                 'common_results': len(common_results)
-            }
+            },
+            'rerank': rerank_info
         }
     
     def display_search_results(self, search_result, show_details=True):
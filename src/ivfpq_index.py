@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ivfpq_index.py
+
+Index ANN tiết kiệm bộ nhớ: Inverted File (IVF) + Product Quantization (PQ), viết bằng NumPy.
+
+- Coarse quantizer: k-means với `nlist` tâm cụm, mỗi vector được gán vào 1 danh sách (inverted list).
+- Residual (vector - tâm cụm) được nén bằng PQ: chia `dim` thành `m` đoạn con, mỗi đoạn lưu 1 mã `nbits` bit.
+  Với dim=768, m=48, nbits=8: 48 byte/vector thay vì 3072 byte float32.
+- Khi search: chỉ duyệt `nprobe` danh sách gần nhất, chấm điểm bằng bảng tra (ADC, inner product),
+  sau đó rerank chính xác `rerank_k` ứng viên tốt nhất bằng ma trận full-precision memory-mapped
+  (embeddings.npy mở bằng mmap_mode='r', không nằm trong RAM).
+
+Giao diện giống hnswlib.Index (knn_query / add_items / save_index / load_index / get_current_count),
+được bọc bởi IVFPQBackend trong vector_backends.py.
+Khoảng cách trả về là cosine distance = 1 - inner product (vector đã chuẩn hoá), như space='cosine' của hnswlib.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Tuple
+
+import numpy as np
+
+
+def kmeans(x: np.ndarray, k: int, n_iter: int = 20, seed: int = 0, batch_size: int = 65536) -> np.ndarray:
+    """Lloyd k-means (L2). Trả về tâm cụm (k, d) float32."""
+    rng = np.random.default_rng(seed)
+    n = x.shape[0]
+    k = min(k, n)
+    centroids = x[rng.choice(n, k, replace=False)].astype(np.float32, copy=True)
+
+    for _ in range(n_iter):
+        assign = assign_nearest(x, centroids, batch_size=batch_size)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+        empty = counts == 0
+        sums = np.add.reduceat(x[order], starts[~empty], axis=0)
+        centroids = np.empty_like(centroids)
+        centroids[~empty] = sums / counts[~empty, None]
+        # Cụm rỗng: gán lại ngẫu nhiên một điểm dữ liệu
+        if empty.any():
+            centroids[empty] = x[rng.choice(n, int(empty.sum()), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+def assign_nearest(x: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    """Gán mỗi vector vào tâm gần nhất theo L2 (tính theo block để giới hạn bộ nhớ)."""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(x.shape[0], dtype=np.int64)
+    for start in range(0, x.shape[0], batch_size):
+        block = np.asarray(x[start:start + batch_size], dtype=np.float32)
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 ; ||x||^2 không ảnh hưởng argmin
+        d = c_sq[None, :] - 2.0 * block @ centroids.T
+        out[start:start + block.shape[0]] = np.argmin(d, axis=1)
+    return out
+
+
+class IVFPQIndex:
+    def __init__(self, dim, nlist=None, m=48, nbits=8, nprobe=16, rerank_k=100, train_size=50000):
+        if dim % m != 0:
+            raise ValueError(f"dim={dim} phải chia hết cho m={m}")
+        if nbits > 8:
+            raise ValueError("nbits tối đa là 8 (mã lưu dạng uint8)")
+
+        self.dim = dim
+        self.nlist = nlist
+        self.m = m
+        self.nbits = nbits
+        self.dsub = dim // m
+        self.nprobe = nprobe
+        self.rerank_k = rerank_k
+        self.train_size = train_size
+
+        self.coarse = None  # (nlist, dim)
+        self.codebooks = None  # (m, ksub, dsub)
+        self.list_offsets = None  # (nlist + 1,)
+        self.codes = np.zeros((0, m), dtype=np.uint8)  # sắp theo list
+        self.ids = np.zeros(0, dtype=np.int64)  # label tương ứng với codes
+        self.vectors = None  # ma trận full-precision (thường là memmap) để rerank, index theo label
+
+    # -----------------------
+    # Build
+    # -----------------------
+    def train(self, vectors, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if self.nlist is None:
+            self.nlist = max(1, int(4 * np.sqrt(n)))
+        self.nlist = min(self.nlist, n)
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, min(n, self.train_size), replace=False)]
+
+        print(f"  IVF-PQ: train coarse k-means (nlist={self.nlist}) trên {len(sample)} vectors...")
+        self.coarse = kmeans(sample, self.nlist, seed=seed)
+
+        residuals = sample - self.coarse[assign_nearest(sample, self.coarse)]
+        ksub = min(2 ** self.nbits, len(sample))
+        print(f"  IVF-PQ: train PQ (m={self.m}, ksub={ksub}, dsub={self.dsub})...")
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * self.dsub:(j + 1) * self.dsub], ksub, n_iter=15, seed=seed + j)
+            for j in range(self.m)
+        ])
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+
+    def _encode(self, vectors, assign):
+        residuals = vectors - self.coarse[assign]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = residuals[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = assign_nearest(sub, self.codebooks[j])
+        return codes
+
+    def add_items(self, vectors, ids=None):
+        if self.coarse is None:
+            raise RuntimeError("IVF-PQ index chưa được train!")
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if ids is None:
+            ids = np.arange(self.get_current_count(), self.get_current_count() + len(vectors))
+        ids = np.asarray(ids, dtype=np.int64)
+
+        assign = assign_nearest(vectors, self.coarse)
+        codes = self._encode(vectors, assign)
+
+        # Gộp với dữ liệu cũ rồi sắp lại theo list (ổn định -> giữ thứ tự chèn trong list)
+        old_assign = np.repeat(np.arange(self.nlist), np.diff(self.list_offsets))
+        all_assign = np.concatenate([old_assign, assign])
+        order = np.argsort(all_assign, kind="stable")
+
+        self.codes = np.concatenate([self.codes, codes])[order]
+        self.ids = np.concatenate([self.ids, ids])[order]
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(all_assign, minlength=self.nlist), out=self.list_offsets[1:])
+
+    def remove_ids(self, ids):
+        """Xoá vĩnh viễn các label khỏi inverted lists."""
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        if keep.all():
+            return 0
+        list_of_row = np.repeat(np.arange(self.nlist), np.diff(self.list_offsets))
+        self.codes = self.codes[keep]
+        self.ids = self.ids[keep]
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(list_of_row[keep], minlength=self.nlist), out=self.list_offsets[1:])
+        return int((~keep).sum())
+
+    def attach_vectors(self, vectors):
+        """Gắn ma trận full-precision (np.memmap hoặc ndarray) dùng để rerank chính xác."""
+        self.vectors = vectors
+
+    # -----------------------
+    # Search
+    # -----------------------
+    def set_nprobe(self, nprobe):
+        self.nprobe = int(nprobe)
+
+    def _search_one(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        coarse_ip = self.coarse @ q
+        nprobe = min(self.nprobe, self.nlist)
+        while True:
+            probe = np.argpartition(-coarse_ip, nprobe - 1)[:nprobe]
+            starts = self.list_offsets[probe]
+            lens = self.list_offsets[probe + 1] - starts
+            total = int(lens.sum())
+            # Các list được probe quá ít phần tử -> mở rộng nprobe để đủ k ứng viên
+            if total >= k or nprobe >= self.nlist:
+                break
+            nprobe = min(nprobe * 2, self.nlist)
+
+        if total == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = np.repeat(starts - np.cumsum(np.r_[0, lens[:-1]]), lens) + np.arange(total)
+
+        # Bảng tra ADC: lut[j, c] = q_j . codebook_j[c]
+        lut = np.einsum("jd,jcd->jc", q.reshape(self.m, self.dsub), self.codebooks)
+        approx = np.repeat(coarse_ip[probe], lens) + lut[np.arange(self.m), self.codes[rows]].sum(axis=1)
+        cand_ids = self.ids[rows]
+
+        n_keep = min(max(k, self.rerank_k if self.vectors is not None else k), total)
+        top = np.argpartition(-approx, n_keep - 1)[:n_keep]
+        cand_ids, scores = cand_ids[top], approx[top]
+
+        # Rerank chính xác từ ma trận full-precision (memmap) nếu có
+        if self.vectors is not None:
+            order_ids = np.sort(cand_ids)  # đọc memmap theo thứ tự tăng dần -> truy cập đĩa tuần tự hơn
+            exact = np.asarray(self.vectors[order_ids], dtype=np.float32) @ q
+            cand_ids, scores = order_ids, exact
+
+        kk = min(k, len(cand_ids))
+        best = np.argpartition(-scores, kk - 1)[:kk]
+        best = best[np.argsort(-scores[best])]
+        return cand_ids[best], scores[best].astype(np.float32)
+
+    def knn_query(self, queries, k=1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        labels = np.zeros((len(queries), k), dtype=np.uint64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for i, q in enumerate(queries):
+            ids, sims = self._search_one(q, k)
+            if len(ids) < k:
+                raise RuntimeError(f"Không đủ {k} vector trong index (chỉ có {len(ids)})")
+            labels[i] = ids
+            distances[i] = 1.0 - sims
+        return labels, distances
+
+    # -----------------------
+    # Persist / info
+    # -----------------------
+    def get_current_count(self):
+        return int(len(self.ids))
+
+    def memory_bytes(self):
+        """Bộ nhớ thường trú của index (không tính ma trận rerank memory-mapped)."""
+        parts = [self.coarse, self.codebooks, self.list_offsets, self.codes, self.ids]
+        return int(sum(p.nbytes for p in parts if p is not None))
+
+    def save_index(self, path):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                params=np.array([self.dim, self.nlist, self.m, self.nbits, self.nprobe, self.rerank_k], dtype=np.int64),
+                coarse=self.coarse,
+                codebooks=self.codebooks,
+                list_offsets=self.list_offsets,
+                codes=self.codes,
+                ids=self.ids,
+            )
+
+    def load_index(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Không tìm thấy file index: {path}")
+        with np.load(path) as data:
+            dim, nlist, m, nbits, nprobe, rerank_k = (int(v) for v in data["params"])
+            if dim != self.dim:
+                raise ValueError(f"dim không khớp: file={dim}, index={self.dim}")
+            self.nlist, self.m, self.nbits, self.dsub = nlist, m, nbits, dim // m
+            self.nprobe, self.rerank_k = nprobe, rerank_k
+            self.coarse = data["coarse"]
+            self.codebooks = data["codebooks"]
+            self.list_offsets = data["list_offsets"]
+            self.codes = data["codes"]
+            self.ids = data["ids"]
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+keyword_index.py
+
+Keyword index BM25 dạng CSR (compressed sparse row) theo term, thay cho dict token -> list[(doc_id, tf)].
+
+- Token được đổi sang term id (vocab dict), postings của term t nằm ở [indptr[t], indptr[t+1]) trong
+  các mảng phẳng doc_ids (int32), tfs (uint16) và weights (float32).
+- Trọng số BM25 của từng posting (idf * tf*(k1+1) / (tf + k1*(1-b+b*dl/avgdl))) tính sẵn lúc build,
+  nên chấm điểm một query chỉ là gather các đoạn postings + cộng dồn bằng np.bincount.
+- Top-k dùng np.argpartition thay vì sort toàn bộ.
+- score_topk: MaxScore (dynamic pruning) với cận trên điểm của từng term (max weight trong postings).
+  Term có cận trên nhỏ (âm tiết rất phổ biến như "của", "và", "người") không sinh ứng viên mới khi
+  tổng cận trên còn lại không vượt được ngưỡng top-k; chỉ tra điểm của chúng cho các ứng viên đã có
+  (searchsorted trên postings đã sắp theo doc_id) thay vì duyệt hết postings.
+
+Bộ nhớ ~10 byte/posting (so với ~100+ byte cho tuple Python trong list).
+
+Vị trí (positional index) cho truy vấn cụm từ - từ tiếng Việt gồm nhiều âm tiết ("trí tuệ nhân tạo", "Đà Nẵng"):
+- Vị trí các lần xuất hiện của term trong doc (thứ tự trong danh sách token) lưu thành một mảng phẳng positions
+  (uint16) theo đúng thứ tự postings: posting thứ i của term t có tfs đúng bằng số vị trí của nó, nên chỉ cần
+  pos_start[t] (đầu vùng của term) + cumsum tfs trong term là ra đoạn của từng posting, không tốn thêm mảng con trỏ
+  theo posting. Trong mỗi đoạn lưu khoảng cách tới vị trí trước (delta) thay vì vị trí tuyệt đối: 2 byte/vị trí,
+  giải mã bằng cumsum (doc dài hơn 65535 token: vị trí phần sau bị chặn, không chính xác).
+- phrase_docs: doc chứa các âm tiết theo đúng thứ tự, cách nhau tổng cộng thêm tối đa `slop` vị trí. Giao postings
+  (bắt đầu từ term hiếm nhất), giải mã vị trí của các doc còn lại thành khoá doc << 32 | vị trí (đã sắp), rồi với
+  mỗi lần xuất hiện của âm tiết đầu tìm lần xuất hiện kế tiếp của âm tiết sau bằng searchsorted.
+- Cụm trong ngoặc kép ("đà nẵng", "trí tuệ nhân tạo"~2) là điều kiện bắt buộc; ngoài ra hai âm tiết liền nhau của
+  query xuất hiện liền nhau trong doc được cộng thêm điểm (pair_bonus).
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Dưới ngưỡng này chi phí gọi NumPy của MaxScore lớn hơn phần postings tiết kiệm được
+MIN_PRUNE_POSTINGS = 20000
+
+_TOKEN_RE = re.compile(r"[\w]+", flags=re.UNICODE)
+_PHRASE_RE = re.compile(r'"([^"]*)"(?:~(\d+))?')
+
+# Cụm trong ngoặc kép: (token, slop)
+Phrase = Tuple[List[str], int]
+
+
+def tokenize(text: str) -> List[str]:
+    toks = [t.lower() for t in _TOKEN_RE.findall(text or "")]
+    return [t for t in toks if len(t) >= 2]
+
+
+def query_tokens(text: str) -> List[str]:
+    """Token của query: âm tiết trong cụm ngoặc kép vẫn được tính, hậu tố ~N của cụm thì không (không có term "10")."""
+    return tokenize(_PHRASE_RE.sub(lambda m: f" {m.group(1)} ", text or ""))
+
+
+def parse_phrases(text: str) -> List[Phrase]:
+    """
+    Các cụm trong ngoặc kép của query: '"đà nẵng" du lịch' -> [(["đà", "nẵng"], 0)].
+    "..."~N cho phép các âm tiết cách nhau thêm tổng cộng tối đa N vị trí (vẫn đúng thứ tự). Cụm 1 âm tiết bị bỏ qua.
+    """
+    phrases = []
+    for body, slop in _PHRASE_RE.findall(text or ""):
+        toks = tokenize(body)
+        if len(toks) >= 2:
+            phrases.append((toks, int(slop or 0)))
+    return phrases
+
+
+class KeywordIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.max_weight = np.zeros(0, dtype=np.float32)  # cận trên điểm của từng term (MaxScore)
+        self.min_weight = np.zeros(0, dtype=np.float32)  # trọng số nhỏ nhất trong postings của từng term
+        self.df = np.zeros(0, dtype=np.int32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.pos_start = np.zeros(1, dtype=np.int64)  # term t -> đầu vùng vị trí của t trong positions
+        self.positions = np.zeros(0, dtype=np.uint16)  # delta vị trí trong từng đoạn
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.avg_dl = 0.0
+        self.n_docs = 0
+
+    # -----------------------
+    # Build
+    # -----------------------
+    def build(self, docs_tokens: Iterable[List[str]]) -> None:
+        """docs_tokens[i] là danh sách token của doc i."""
+        vocab: Dict[str, int] = {}
+        term_col: List[int] = []
+        doc_col: List[int] = []
+        tf_col: List[int] = []
+        doc_len: List[int] = []
+        pos_col: List[int] = []  # delta vị trí, các đoạn nối theo thứ tự posting trước khi sắp
+
+        max_tf = np.iinfo(np.uint16).max
+        for doc_id, toks in enumerate(docs_tokens):
+            doc_len.append(len(toks))
+            occurrences: Dict[str, List[int]] = {}
+            for i, tok in enumerate(toks):
+                occurrences.setdefault(tok, []).append(i)
+            for tok, positions in occurrences.items():
+                term_col.append(vocab.setdefault(tok, len(vocab)))
+                doc_col.append(doc_id)
+                tf_col.append(len(positions))
+                prev = 0
+                for p in positions[:max_tf]:
+                    pos_col.append(p - prev)
+                    prev = p
+
+        terms = np.asarray(term_col, dtype=np.int64)
+        # Sắp postings theo term (stable -> doc_id tăng dần trong từng term)
+        order = np.argsort(terms, kind="stable")
+        self.vocab = vocab
+        self.df = np.bincount(terms, minlength=len(vocab)).astype(np.int32)
+        self.indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(self.df, out=self.indptr[1:])
+        self.doc_ids = np.asarray(doc_col, dtype=np.int32)[order]
+        counts = np.minimum(np.asarray(tf_col, dtype=np.int64), max_tf)
+        self.tfs = counts[order].astype(np.uint16)
+        self._build_positions(counts, np.asarray(pos_col, dtype=np.int64), order)
+        self.doc_len = np.asarray(doc_len, dtype=np.int32)
+        self.n_docs = len(doc_len)
+        self.avg_dl = float(self.doc_len.mean()) if self.n_docs else 0.0
+        self._compute_weights()
+
+    def _build_positions(self, counts: np.ndarray, deltas: np.ndarray, order: np.ndarray) -> None:
+        """counts/deltas theo thứ tự posting lúc build; sắp lại các đoạn theo `order` (thứ tự postings CSR)."""
+        starts = np.cumsum(counts) - counts  # đầu đoạn của từng posting trong deltas
+        counts, starts = counts[order], starts[order]
+        ptr = np.r_[0, np.cumsum(counts)]
+        src = np.repeat(starts - ptr[:-1], counts) + np.arange(ptr[-1])
+        self.positions = np.minimum(deltas[src], np.iinfo(np.uint16).max).astype(np.uint16)
+        self.pos_start = ptr[self.indptr]
+
+    def _compute_weights(self) -> None:
+        idf = np.log((self.n_docs - self.df + 0.5) / (self.df + 0.5) + 1.0).astype(np.float32)
+        self.idf = idf
+        posting_idf = np.repeat(idf, self.df)
+        tf = self.tfs.astype(np.float32)
+        dl = self.doc_len[self.doc_ids].astype(np.float32)
+        denom = tf + self.k1 * (1 - self.b + self.b * (dl / (self.avg_dl + 1e-9)))
+        self.weights = (posting_idf * (tf * (self.k1 + 1) / (denom + 1e-9))).astype(np.float32)
+        self.max_weight = (
+            np.maximum.reduceat(self.weights, self.indptr[:-1]) if len(self.weights) else np.zeros(0, dtype=np.float32)
+        )
+        self.min_weight = (
+            np.minimum.reduceat(self.weights, self.indptr[:-1]) if len(self.weights) else np.zeros(0, dtype=np.float32)
+        )
+
+    def set_params(self, k1: float, b: float) -> None:
+        """
+        Đổi k1/b: tính lại trọng số từ tf đã lưu (không cần tokenize lại). Thay mảng trọng số tại chỗ -
+        chỉ gọi khi không có search chạy song song (thử tham số offline), server đặt k1/b một lần lúc build.
+        """
+        if (k1, b) != (self.k1, self.b):
+            self.k1, self.b = k1, b
+            self._compute_weights()
+
+    # -----------------------
+    # Query
+    # -----------------------
+    def vocab_size(self) -> int:
+        return len(self.vocab)
+
+    def postings(self, tok: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc_ids, weights) của một token (rỗng nếu không có trong vocab)."""
+        t = self.vocab.get(tok)
+        if t is None:
+            return self.doc_ids[:0], self.weights[:0]
+        start, end = self.indptr[t], self.indptr[t + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def _query_terms(self, q_toks: List[str]) -> List[Tuple[int, float]]:
+        """[(term id, hệ số)] của các token query có trong vocab; token lặp tăng trọng số 1 + 0.1 * (số lần - 1)."""
+        terms = []
+        for tok, qcnt in Counter(q_toks).items():
+            t = self.vocab.get(tok)
+            if t is not None:
+                terms.append((t, 1.0 + 0.1 * (qcnt - 1)))
+        return terms
+
+    def _accumulate(self, terms: List[Tuple[int, float]],
+                    allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cộng điểm mọi postings của các term: (doc_ids, scores float64) của tất cả doc khớp.
+        allowed: mask bool theo doc_id (bộ lọc), doc không được phép bị loại ngay sau khi gom theo doc.
+        """
+        ids_parts, w_parts = [], []
+        for t, mult in terms:
+            start, end = self.indptr[t], self.indptr[t + 1]
+            ids_parts.append(self.doc_ids[start:end])
+            w_parts.append(self.weights[start:end] * mult if mult != 1.0 else self.weights[start:end])
+
+        if not ids_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        all_ids = np.concatenate(ids_parts)
+        all_w = np.concatenate(w_parts)
+        if len(all_ids) * 16 < self.n_docs:
+            # Ít postings: gom theo doc bằng unique, tránh quét mảng dày kích thước n_docs
+            doc_ids, inverse = np.unique(all_ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=all_w)
+            if allowed is not None:
+                keep = allowed[doc_ids]
+                doc_ids, scores = doc_ids[keep], scores[keep]
+        else:
+            dense = np.bincount(all_ids, weights=all_w, minlength=self.n_docs)
+            if allowed is not None:
+                dense[~allowed[:len(dense)]] = 0.0
+            doc_ids = np.flatnonzero(dense)
+            scores = dense[doc_ids]
+        return doc_ids.astype(np.int64), scores
+
+    def score(self, q_toks: List[str], max_docs: int = 2000,
+              allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Điểm BM25 của các doc chứa ít nhất một token query: (doc_ids, scores), giữ tối đa max_docs doc điểm cao nhất.
+        Token lặp trong query được tăng trọng số nhẹ (1 + 0.1 * (số lần - 1)), như bản dict cũ.
+        """
+        doc_ids, scores = self._accumulate(self._query_terms(q_toks), allowed)
+        if len(doc_ids) > max_docs:
+            top = np.argpartition(-scores, max_docs - 1)[:max_docs]
+            doc_ids, scores = doc_ids[top], scores[top]
+        return doc_ids, scores.astype(np.float32)
+
+    def score_topk(self, q_toks: List[str], k: int = 2000, stats: Optional[Dict[str, Any]] = None,
+                   allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k BM25 chính xác như score(q_toks, max_docs=k) nhưng dùng MaxScore để bỏ qua postings không thể vào top-k.
+
+        Term sắp theo cận trên giảm dần. Ngưỡng ban đầu theta = trọng số thứ k của term đầu tiên (điểm thứ k cuối
+        cùng chắc chắn >= theta). Các term cuối có tổng cận trên <= theta là "không thiết yếu": doc chỉ xuất hiện ở
+        chúng không thể vào top-k. Chỉ postings của term thiết yếu được cộng toàn bộ; với term không thiết yếu,
+        loại ứng viên không thể vượt theta rồi tra điểm cho ứng viên còn lại bằng searchsorted.
+        """
+        terms = self._query_terms(q_toks)
+        if not terms or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        total = int(sum(self.df[t] for t, _ in terms))
+        n_ess = len(terms)
+        scanned = total
+        if len(terms) > 1 and total > max(8 * k, MIN_PRUNE_POSTINGS) and self.n_docs > 4 * k:
+            terms.sort(key=lambda x: -self.max_weight[x[0]] * x[1])
+            ubs = np.array([self.max_weight[t] * m for t, m in terms], dtype=np.float64)
+            rest_ub = np.r_[np.cumsum(ubs[::-1])[::-1], 0.0]  # rest_ub[i] = tổng cận trên của term i..cuối
+
+            t0, m0 = terms[0]
+            w0 = self.weights[self.indptr[t0]:self.indptr[t0 + 1]]
+            if allowed is not None:
+                # theta phải là cận dưới của điểm thứ k trong các doc được phép
+                w0 = w0[allowed[self.doc_ids[self.indptr[t0]:self.indptr[t0 + 1]]]]
+            theta = float(np.partition(w0, len(w0) - k)[len(w0) - k]) * m0 if len(w0) >= k else 0.0
+            n_ess = int(np.argmax(rest_ub[1:] <= theta)) + 1 if theta > 0 else len(terms)
+
+        cand_ids, cand_scores = self._accumulate(terms[:n_ess], allowed)
+        if n_ess < len(terms):
+            theta = max(theta, self._kth_largest(cand_scores, k))
+            keep = cand_scores + rest_ub[n_ess] >= theta
+            rest_df = int(sum(self.df[t] for t, _ in terms[n_ess:]))
+            if int(keep.sum()) * 8 > rest_df:
+                # Còn quá nhiều ứng viên: searchsorted đắt hơn cộng thẳng postings còn lại
+                cand_ids, cand_scores = self._accumulate(terms, allowed)
+                n_ess = len(terms)
+            else:
+                cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+                scanned = total - rest_df
+                for j in range(n_ess, len(terms)):
+                    if j > n_ess:
+                        # Điểm chỉ tăng thêm -> theta chỉ tăng; loại ứng viên không còn cơ hội vào top-k
+                        theta = max(theta, self._kth_largest(cand_scores, k))
+                        keep = cand_scores + rest_ub[j] >= theta
+                        cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+
+                    t, mult = terms[j]
+                    start, end = self.indptr[t], self.indptr[t + 1]
+                    postings = self.doc_ids[start:end]
+                    pos = np.minimum(np.searchsorted(postings, cand_ids), len(postings) - 1)
+                    hit = postings[pos] == cand_ids
+                    cand_scores[hit] += self.weights[start + pos[hit]] * mult
+                    scanned += len(cand_ids)
+
+        if stats is not None:
+            stats.update(postings_total=total, postings_scanned=scanned, terms_pruned=len(terms) - n_ess)
+
+        if len(cand_ids) > k:
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+            cand_ids, cand_scores = cand_ids[top], cand_scores[top]
+        return cand_ids, cand_scores.astype(np.float32)
+
+    def score_floor(self, q_toks: List[str]) -> float:
+        """
+        Cận dưới điểm của doc khớp query (min trọng số của từng term); bằng đúng điểm nhỏ nhất khi doc có trọng số đó
+        chỉ khớp một term - gần như luôn vậy. Dùng để chuẩn hoá điểm keyword mà không cần chấm mọi doc khớp.
+        """
+        terms = self._query_terms(q_toks)
+        return min((float(self.min_weight[t]) * mult for t, mult in terms), default=0.0)
+
+    def score_docs(self, q_toks: List[str], doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Điểm BM25 (float32, 0 = không khớp) của đúng các doc trong doc_ids, thứ tự giữ nguyên. Dùng cho tập ứng viên
+        nhỏ (vd. ứng viên ANN): mỗi term một searchsorted trên postings thay vì cộng dồn toàn bộ postings.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        for t, mult in self._query_terms(q_toks):
+            start, end = self.indptr[t], self.indptr[t + 1]
+            postings = self.doc_ids[start:end]
+            pos = np.minimum(np.searchsorted(postings, doc_ids), len(postings) - 1)
+            hit = postings[pos] == doc_ids
+            scores[hit] += self.weights[start + pos[hit]] * mult
+        return scores
+
+    # -----------------------
+    # Cụm từ / vị trí
+    # -----------------------
+    def _term_keys(self, t: int, docs: np.ndarray) -> np.ndarray:
+        """Khoá doc << 32 | vị trí (đã sắp) của mọi lần xuất hiện của term t trong docs (sắp tăng, đều chứa t)."""
+        start, end = self.indptr[t], self.indptr[t + 1]
+        p = np.searchsorted(self.doc_ids[start:end], docs.astype(self.doc_ids.dtype))
+        tfs = self.tfs[start:end].astype(np.int64)
+        counts = tfs[p]
+        lo = self.pos_start[t] + (np.cumsum(tfs) - tfs)[p]
+        seg = np.cumsum(counts) - counts  # đầu đoạn của từng doc trong kết quả
+        deltas = self.positions[np.repeat(lo - seg, counts) + np.arange(int(counts.sum()))].astype(np.int64)
+        csum = np.cumsum(deltas)
+        # vị trí = cumsum trong từng đoạn = cumsum toàn bộ - tổng các đoạn trước
+        before = np.repeat(np.r_[0, csum][seg], counts)
+        return (np.repeat(np.asarray(docs, dtype=np.int64), counts) << 32) | (csum - before)
+
+    def phrase_docs(self, toks: List[str], slop: int = 0, doc_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Doc (int64, đã sắp) chứa toks theo đúng thứ tự, tổng khoảng cách thừa giữa các âm tiết <= slop
+        (slop=0: liền nhau). doc_ids (đã sắp, không trùng): chỉ xét các doc này.
+        """
+        terms = [self.vocab.get(tok) for tok in toks]
+        if not terms or any(t is None for t in terms):
+            return np.zeros(0, dtype=np.int64)
+        docs = None if doc_ids is None else np.asarray(doc_ids, dtype=np.int64)
+        for t in sorted(set(terms), key=lambda t: self.df[t]):
+            postings = self.doc_ids[self.indptr[t]:self.indptr[t + 1]]
+            if docs is None:
+                docs = postings.astype(np.int64)
+            else:
+                # Giao bằng searchsorted: docs thường ngắn hơn nhiều so với postings (cùng dtype để không phải
+                # đổi kiểu cả mảng postings)
+                pos = np.minimum(np.searchsorted(postings, docs.astype(postings.dtype)), len(postings) - 1)
+                docs = docs[postings[pos] == docs]
+            if not len(docs):
+                return docs
+        if len(terms) == 1:
+            return docs
+
+        first = self._term_keys(terms[0], docs)
+        cur = first
+        for i, t in enumerate(terms[1:], 1):
+            keys = self._term_keys(t, docs)
+            nxt = keys[np.minimum(np.searchsorted(keys, cur, side="right"), len(keys) - 1)]
+            # Khác doc -> hiệu khoá >= 2^32 - vị trí, luôn bị loại
+            ok = (nxt > cur) & (nxt - first <= i + slop)
+            first, cur = first[ok], nxt[ok]
+        return np.unique(first >> 32)
+
+    def match_phrases(self, phrases: List[Phrase], doc_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Doc (đã sắp) thoả mọi cụm."""
+        docs = doc_ids
+        for toks, slop in phrases:
+            docs = self.phrase_docs(toks, slop, docs)
+            if not len(docs):
+                break
+        return np.zeros(0, dtype=np.int64) if docs is None else docs
+
+    def pair_bonus(self, q_toks: List[str], doc_ids: Optional[np.ndarray] = None, weight: float = 0.5,
+                   scan_df: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Điểm cộng cho doc có hai âm tiết liền nhau của query cũng đứng liền nhau: weight * (idf a + idf b) mỗi cặp
+        (vd. "đà nẵng" được cộng, doc có "đà" và "nẵng" ở hai chỗ khác nhau thì không). Trả (doc_ids đã sắp, điểm cộng).
+        doc_ids (đã sắp): chỉ xét các doc này, trừ cặp có âm tiết hiếm hơn xuất hiện trong <= scan_df doc - cặp đó
+        được tìm trên toàn index (rẻ, và là nơi điểm cộng đáng kể vì idf cao).
+        """
+        ids_parts, bonus_parts = [], []
+        for a, b in dict.fromkeys(zip(q_toks, q_toks[1:])):
+            ta, tb = self.vocab.get(a), self.vocab.get(b)
+            if ta is None or tb is None:
+                continue
+            full = doc_ids is None or min(self.df[ta], self.df[tb]) <= scan_df
+            docs = self.phrase_docs([a, b], 0, None if full else doc_ids)
+            ids_parts.append(docs)
+            bonus_parts.append(np.full(len(docs), weight * (self.idf[ta] + self.idf[tb]), dtype=np.float64))
+        if not ids_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids, inverse = np.unique(np.concatenate(ids_parts), return_inverse=True)
+        return ids, np.bincount(inverse, weights=np.concatenate(bonus_parts)).astype(np.float32)
+
+    def search(self, q_toks: List[str], phrases: List[Phrase] = (), k: int = 2000, prune: bool = True,
+               pair_weight: float = 0.0, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k doc theo BM25 + pair_bonus, chỉ trong các doc có allowed[doc_id] (mask bool của bộ lọc, None = mọi
+        doc). Có cụm trong ngoặc kép: chỉ chấm doc thoả mọi cụm (score_docs trên tập nhỏ này). Không có:
+        score_topk / score, điểm cộng tính trên top-k đó và thêm các doc ngoài top-k có cặp âm tiết liền nhau với
+        âm tiết hiếm (df <= 4k). Cặp toàn âm tiết phổ biến chỉ được xét trong top-k: tìm trên toàn index phải giải
+        mã vị trí của phần lớn các doc mà điểm cộng (idf thấp) lại nhỏ.
+        """
+        if phrases:
+            ids = self.match_phrases(phrases)
+            if allowed is not None:
+                ids = ids[allowed[ids]]
+            scores = self.score_docs(q_toks, ids)
+        elif prune:
+            ids, scores = self.score_topk(q_toks, k=k, allowed=allowed)
+        else:
+            ids, scores = self.score(q_toks, max_docs=k, allowed=allowed)
+        ids = ids.astype(np.int64)
+        if pair_weight > 0 and len(q_toks) > 1:
+            bonus_ids, bonus = self.pair_bonus(q_toks, np.sort(ids), pair_weight, scan_df=0 if phrases else 4 * k)
+            if allowed is not None:
+                bonus_ids, bonus = bonus_ids[allowed[bonus_ids]], bonus[allowed[bonus_ids]]
+            missing = bonus_ids[~np.isin(bonus_ids, ids)]
+            if len(missing):
+                ids = np.concatenate([ids, missing])
+                scores = np.concatenate([scores, self.score_docs(q_toks, missing)])
+            scores = scores + self._lookup(ids, bonus_ids, bonus)
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        return ids, scores.astype(np.float32)
+
+    def score_candidates(self, q_toks: List[str], doc_ids: np.ndarray, phrases: List[Phrase] = (),
+                         pair_weight: float = 0.0, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """score_docs + điều kiện cụm + pair_bonus cho đúng các doc trong doc_ids (0 = không khớp / bị lọc)."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = self.score_docs(q_toks, doc_ids)
+        if allowed is not None:
+            scores[~allowed[doc_ids]] = 0.0
+        if phrases:
+            scores[~np.isin(doc_ids, self.match_phrases(phrases, np.unique(doc_ids)))] = 0.0
+        if pair_weight > 0 and len(q_toks) > 1:
+            bonus_ids, bonus = self.pair_bonus(q_toks, np.unique(doc_ids[scores > 0]), pair_weight)
+            scores += self._lookup(doc_ids, bonus_ids, bonus)
+        return scores
+
+    @staticmethod
+    def _lookup(doc_ids: np.ndarray, keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """values của từng doc trong doc_ids theo bảng (keys đã sắp, values); doc không có trong bảng -> 0."""
+        out = np.zeros(len(doc_ids), dtype=np.float32)
+        if len(keys):
+            pos = np.minimum(np.searchsorted(keys, doc_ids), len(keys) - 1)
+            hit = keys[pos] == doc_ids
+            out[hit] = values[pos[hit]]
+        return out
+
+    @staticmethod
+    def _kth_largest(scores: np.ndarray, k: int) -> float:
+        if len(scores) < k:
+            return 0.0
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+    def memory_bytes(self) -> int:
+        arrays = [self.indptr, self.doc_ids, self.tfs, self.weights, self.max_weight, self.min_weight, self.df, self.idf,
+                  self.pos_start, self.positions, self.doc_len]
+        return int(sum(a.nbytes for a in arrays))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+load_test.py
+
+Tải thử /search: C client đồng thời (mỗi client một kết nối keep-alive) gửi query liên tục trong D giây,
+in QPS tổng và latency (mean/p50/p95/p99). Query lấy ngẫu nhiên từ tiêu đề bài trong metadata.json
+(hoặc danh sách mặc định) để không chỉ đo một query lặp lại.
+
+Ví dụ:
+  python load_test.py --url http://localhost:8000 --concurrency 16 --duration 20 --mode hybrid
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+DEFAULT_QUERIES = ["giá vàng hôm nay", "bóng đá việt nam", "trí tuệ nhân tạo", "thị trường chứng khoán", "sức khỏe"]
+
+
+def load_queries(index_dir: str, n: int = 500, seed: int = 0) -> List[str]:
+    path = os.path.join(index_dir, "metadata.json")
+    if not os.path.exists(path):
+        return DEFAULT_QUERIES
+    with open(path, "r", encoding="utf-8") as f:
+        articles = json.load(f)["articles"]
+    rng = random.Random(seed)
+    queries = []
+    for a in rng.sample(articles, min(n, len(articles))):
+        words = str(a.get("title", "")).split()
+        if len(words) >= 2:
+            start = rng.randrange(0, max(1, len(words) - 2))
+            queries.append(" ".join(words[start:start + rng.randint(2, 4)]))
+    return queries or DEFAULT_QUERIES
+
+
+def client(url: str, queries: List[str], body: Dict[str, Any], deadline: float, lat: List[float], errors: List[int], seed: int) -> None:
+    u = urlparse(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        payload = json.dumps({**body, "query": rng.choice(queries)}).encode("utf-8")
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", "/search", body=payload, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors.append(resp.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            conn.close()
+            conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+            continue
+        lat.append((time.perf_counter() - t0) * 1000)
+    conn.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--mode", default="hybrid", choices=["semantic", "keyword", "hybrid"])
+    ap.add_argument("--topk", type=int, default=10)
+    ap.add_argument("--index-dir", default="article_index")
+    args = ap.parse_args()
+
+    queries = load_queries(args.index_dir)
+    body = {"mode": args.mode, "topk": args.topk}
+    lat: List[float] = []  # list.append an toàn giữa các thread (GIL)
+    errors: List[int] = []
+
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    threads = [
+        threading.Thread(target=client, args=(args.url, queries, body, deadline, lat, errors, i))
+        for i in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    arr = np.array(lat) if lat else np.zeros(1)
+    print(f"{len(lat)} request trong {elapsed:.1f}s với {args.concurrency} client ({args.mode}), lỗi: {len(errors)}")
+    print(f"QPS: {len(lat) / elapsed:.1f}")
+    print(
+        f"Latency (ms): mean {arr.mean():.1f} | p50 {np.percentile(arr, 50):.1f} | "
+        f"p95 {np.percentile(arr, 95):.1f} | p99 {np.percentile(arr, 99):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,9 @@ Cơ chế gộp:
 - Nếu mới: gán id tăng dần (max_id + 1).
 
 Cập nhật index:
-- Mặc định chạy incremental: load index hiện tại, embed bài mới, add_items vào HNSW, vstack embeddings
+- Mặc định chạy incremental: load index hiện tại, embed bài mới, add vào vector backend (HNSW/exact/IVF-PQ), vstack embeddings
+- Bài mới được self-join với index để gán canonical_id (lọc bài gần trùng, xem near_duplicates.py);
+  index build với --canonical-only thì bài trùng không được thêm vào vector index.
 - Nếu bạn muốn chính xác tuyệt đối (khi bạn update title/summary của bài cũ và muốn re-embed), dùng --rebuild để build lại toàn bộ.
 
 Ví dụ:
@@ -38,6 +40,7 @@ import argparse
 import json
 import os
 import sys
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
@@ -45,7 +48,10 @@ from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 
 # Import project modules
+from article_dates import article_timestamp, save_timestamps  # type: ignore
 from hnsw_manager import ArticleHNSWManager  # type: ignore
+from near_duplicates import DEFAULT_K, DEFAULT_THRESHOLD, connected_components, self_join_pairs  # type: ignore
+from vector_backends import BACKENDS, backend_file  # type: ignore
 
 
 REQUIRED_KEYS = ["title", "link", "category", "language", "source"]
@@ -77,6 +83,10 @@ def _normalize_article(a: Dict[str, Any]) -> Dict[str, Any]:
     a.setdefault("source", "Unknown")
     a.setdefault("crawled_time", _now_iso())
 
+    # Ngày đăng chuẩn hoá (epoch giây) - parse một lần ở đây thay vì mỗi lần server khởi động
+    if "published_ts" not in a:
+        a["published_ts"] = article_timestamp(a)
+
     # id: có thể thiếu nếu là dữ liệu mới
     if "id" in a:
         # ép kiểu nếu có thể
@@ -154,6 +164,9 @@ def merge_two_articles(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, An
             if nv is not None and (not isinstance(nv, str) or nv.strip() != ""):
                 merged[k] = nv
 
+    if merged.get("published") != old.get("published"):
+        merged["published_ts"] = article_timestamp({k: v for k, v in merged.items() if k != "published_ts"})
+
     # Nếu summary mới dài hơn nhiều, có thể ưu tiên new (giúp data "hoàn thiện")
     try:
         if isinstance(old.get("summary", ""), str) and isinstance(new.get("summary", ""), str):
@@ -254,44 +267,34 @@ def merge_articles(existing: List[Dict[str, Any]], incoming: List[Dict[str, Any]
     return MergeResult(merged_articles=merged, added_new=added, merged_duplicates=dups)
 
 
-def save_metadata(index_dir: str, dim: int, articles: List[Dict[str, Any]]) -> str:
+def save_metadata(
+    index_dir: str,
+    dim: int,
+    articles: List[Dict[str, Any]],
+    backend: str = "hnsw",
+    backend_params: Optional[Dict[str, Any]] = None,
+    dedup: Optional[Dict[str, Any]] = None,
+    topics: Optional[List[str]] = None,
+) -> str:
     metadata = {
         "dim": dim,
         "total_articles": len(articles),
+        "backend": backend,
+        "backend_params": backend_params or {},
+        "dedup": dedup or {},
+        "topics": topics or [],
         "articles": articles,
         "build_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "generation": time.time_ns(),
     }
     os.makedirs(index_dir, exist_ok=True)
     metadata_path = os.path.join(index_dir, "metadata.json")
     with open(metadata_path, "w", encoding="utf-8") as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
+    save_timestamps(index_dir, articles)
     return metadata_path
 
 
-def _try_resize(index, new_max: int) -> bool:
-    """
-    HNSWlib python binding thường có resize_index().
-    Có bản có get_max_elements().
-    """
-    try:
-        # if have get_max_elements
-        current_max = None
-        try:
-            current_max = index.get_max_elements()
-        except Exception:
-            current_max = None
-
-        if current_max is not None and new_max <= current_max:
-            return True
-
-        if hasattr(index, "resize_index"):
-            index.resize_index(new_max)
-            return True
-    except Exception:
-        return False
-    return False
-
-
 def incremental_update_index(
     index_dir: str,
     merged_articles: List[Dict[str, Any]],
@@ -300,14 +303,14 @@ def incremental_update_index(
     ef: int = 100,
 ) -> None:
     """
-    Load index hiện có, embed new_articles, add_items, vstack embeddings, save.
+    Load index hiện có, embed new_articles, thêm vào vector backend, vstack embeddings, save.
     Lưu ý: chỉ incremental đối với bài "mới" (không re-embed bài cũ).
     """
     mgr = ArticleHNSWManager(index_dir=index_dir)
     mgr.load_index()  # loads mgr.articles + mgr.all_embeddings + mgr.index
 
     if mgr.index is None or mgr.all_embeddings is None:
-        raise RuntimeError("Index/embeddings chưa được load đúng. Kiểm tra article_index/embeddings.npy và article_index.bin")
+        raise RuntimeError(f"Index/embeddings chưa được load đúng. Kiểm tra article_index/embeddings.npy và {mgr.index_path()}")
 
     if len(mgr.articles) != existing_count:
         # người dùng merge metadata có thể đổi thứ tự; vẫn cho chạy nhưng cảnh báo.
@@ -323,52 +326,107 @@ def incremental_update_index(
     if not filtered_new:
         print("Không có bài mới để add vào index (toàn bộ bị trùng link). Chỉ cập nhật metadata.")
         mgr.articles = merged_articles
-        save_metadata(index_dir, mgr.dim, mgr.articles)
+        save_metadata(index_dir, mgr.dim, mgr.articles, mgr.backend, mgr.backend_params, mgr.dedup, mgr.topics)
         return
 
     valid_new, new_emb = mgr.embedder.embed_articles(filtered_new)
     if len(valid_new) == 0 or new_emb is None or len(new_emb) == 0:
         print("Không embed được bài mới. Chỉ cập nhật metadata.")
         mgr.articles = merged_articles
-        save_metadata(index_dir, mgr.dim, mgr.articles)
+        save_metadata(index_dir, mgr.dim, mgr.articles, mgr.backend, mgr.backend_params, mgr.dedup, mgr.topics)
         return
 
-    # Capacity
-    total_needed = existing_count + len(new_emb)
-    _try_resize(mgr.index, total_needed + 256)  # buffer
-
-    # Add to index
+    # Add to index (backend tự mở rộng sức chứa nếu cần)
     new_labels = np.arange(existing_count, existing_count + len(new_emb))
-    mgr.index.add_items(new_emb, new_labels)
+    mgr.index.add(new_emb, new_labels)
 
     # Update in-memory
     mgr.all_embeddings = np.vstack([mgr.all_embeddings, new_emb])
     mgr.articles = merged_articles
 
+    if mgr.dedup.get("threshold"):
+        mark_near_duplicates(mgr, new_emb, new_labels)
+    mgr.assign_new_topics(new_labels, new_emb)
+
     # Save artifacts
-    save_metadata(index_dir, mgr.dim, mgr.articles)
+    save_metadata(index_dir, mgr.dim, mgr.articles, mgr.backend, mgr.backend_params, mgr.dedup, mgr.topics)
 
     emb_path = os.path.join(index_dir, "embeddings.npy")
     np.save(emb_path, mgr.all_embeddings)
 
-    idx_path = os.path.join(index_dir, "article_index.bin")
-    mgr.index.save_index(idx_path)
+    mgr.index.save(mgr.index_path())
+
+    # Thống kê lại đồ thị để phát hiện suy giảm sau nhiều lần add_items
+    if mgr.backend == "hnsw":
+        mgr.save_graph_stats()
+
+    # Bảng bài liên quan tính sẵn: tính lại để bài mới vừa có dòng riêng vừa xuất hiện trong danh sách của bài cũ
+    if mgr.related_labels is not None:
+        mgr.precompute_related(mgr.related_labels.shape[1])
 
     # set ef
-    try:
-        mgr.index.set_ef(ef)
-    except Exception:
-        pass
+    mgr.index.set_search_params(ef=ef)
 
-    print(f"✅ Incremental update OK: +{len(new_emb)} vectors. Total vectors: {mgr.index.get_current_count()}")
+    print(f"✅ Incremental update OK: +{len(new_emb)} vectors. Total vectors: {mgr.index.count()}")
 
 
-def rebuild_index(index_dir: str, articles: List[Dict[str, Any]], max_elements: Optional[int] = None) -> None:
-    mgr = ArticleHNSWManager(index_dir=index_dir)
+def mark_near_duplicates(mgr: ArticleHNSWManager, new_emb: np.ndarray, new_labels: np.ndarray) -> None:
+    """
+    Self-join vector mới trên index (đã chứa cả bài cũ lẫn bài mới), cập nhật canonical_id cho mgr.articles.
+    Index canonical_only: gỡ khỏi index các bài không còn là đại diện (bài mới trùng, hoặc cụm cũ bị gộp).
+    """
+    threshold, k = mgr.dedup["threshold"], mgr.dedup.get("k", DEFAULT_K)
+    pairs = self_join_pairs(mgr.index, new_emb, new_labels, threshold=threshold, k=k)
+    # canonical_id cũ chỉ tin cho bài đã có trong index (bài mới có thể mang canonical_id của index khác)
+    n_old = int(new_labels.min())
+    before = np.arange(len(mgr.articles), dtype=np.int64)
+    before[:n_old] = [a.get("canonical_id", i) for i, a in enumerate(mgr.articles[:n_old])]
+    canonical = connected_components(len(mgr.articles), pairs, init=before)
+    for article, canonical_id in zip(mgr.articles, canonical):
+        article["canonical_id"] = int(canonical_id)
+
+    labels = np.arange(len(canonical))
+    n_dup = int((canonical[new_labels] != new_labels).sum())
+    print(f"Bài gần trùng (cosine >= {threshold}): {n_dup}/{len(new_labels)} bài mới trùng với bài đã có")
+    if mgr.dedup.get("canonical_only"):
+        dropped = labels[(canonical != labels) & (before == labels)]
+        removed = mgr.index.delete(dropped)
+        print(f"Gỡ {removed} bài không phải đại diện khỏi index (canonical_only)")
+
+
+def existing_backend(index_dir: str) -> Tuple[str, Dict[str, Any]]:
+    """Đọc vector backend (hnsw/exact/ivfpq) đã dùng để build index hiện có."""
+    metadata_path = os.path.join(index_dir, "metadata.json")
+    if not os.path.exists(metadata_path):
+        return "hnsw", {}
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    return metadata.get("backend", "hnsw"), metadata.get("backend_params", {})
+
+
+def existing_dedup(index_dir: str) -> Dict[str, Any]:
+    """Cấu hình lọc gần trùng (threshold, canonical_only) của index hiện có."""
+    metadata_path = os.path.join(index_dir, "metadata.json")
+    if not os.path.exists(metadata_path):
+        return {}
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("dedup", {})
+
+
+def rebuild_index(
+    index_dir: str,
+    articles: List[Dict[str, Any]],
+    max_elements: Optional[int] = None,
+    backend: str = "hnsw",
+    backend_params: Optional[Dict[str, Any]] = None,
+    dedup_threshold: Optional[float] = DEFAULT_THRESHOLD,
+    canonical_only: bool = False,
+) -> None:
+    mgr = ArticleHNSWManager(index_dir=index_dir, backend=backend, backend_params=backend_params)
     if max_elements is None:
         # max_elements ít nhất bằng số bài hiện có, cộng buffer
         max_elements = max(len(articles) + 256, 1024)
-    ok = mgr.build_index(articles, max_elements=max_elements)
+    ok = mgr.build_index(articles, max_elements=max_elements, dedup_threshold=dedup_threshold, canonical_only=canonical_only)
     if not ok:
         raise RuntimeError("Rebuild index thất bại. Xem log ở build_index().")
     print(f"✅ Rebuild OK. Total articles: {len(mgr.articles)}")
@@ -381,6 +439,9 @@ def main():
     ap.add_argument("--out-dir", default=None, help="Nếu muốn output sang thư mục khác (copy index mới). Mặc định ghi đè vào --index-dir")
     ap.add_argument("--rebuild", action="store_true", help="Build lại toàn bộ index (chậm hơn nhưng chính xác nhất)")
     ap.add_argument("--max-elements", type=int, default=None, help="Chỉ dùng khi --rebuild. max_elements cho HNSW")
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default=None, help="Chỉ dùng khi --rebuild. Mặc định giữ backend của index hiện có")
+    ap.add_argument("--dedup-threshold", type=float, default=None, help=f"Chỉ dùng khi --rebuild. Ngưỡng cosine gom bài gần trùng (0 để tắt, mặc định giữ cấu hình cũ hoặc {DEFAULT_THRESHOLD})")
+    ap.add_argument("--canonical-only", action="store_true", help="Chỉ dùng khi --rebuild. Chỉ đưa bài đại diện của mỗi cụm trùng vào vector index")
     args = ap.parse_args()
 
     index_dir = args.index_dir
@@ -416,14 +477,22 @@ def main():
         print(f"[INFO] out-dir khác index-dir: {out_dir}. Khuyến nghị dùng --rebuild để tạo index đồng bộ trong out-dir.")
 
     # Update index
+    backend, backend_params = existing_backend(index_dir)
     if args.rebuild:
-        rebuild_index(out_dir, merged_articles, max_elements=args.max_elements)
+        if args.backend and args.backend != backend:
+            backend, backend_params = args.backend, {}
+        dedup = existing_dedup(index_dir)
+        threshold = args.dedup_threshold if args.dedup_threshold is not None else dedup.get("threshold", DEFAULT_THRESHOLD)
+        rebuild_index(
+            out_dir, merged_articles, max_elements=args.max_elements, backend=backend, backend_params=backend_params,
+            dedup_threshold=threshold, canonical_only=args.canonical_only or bool(dedup.get("canonical_only")),
+        )
     else:
         # incremental: cần index artifacts tồn tại
-        idx_path = os.path.join(index_dir, "article_index.bin")
+        idx_path = backend_file(backend, index_dir)
         emb_path = os.path.join(index_dir, "embeddings.npy")
         if not (os.path.exists(idx_path) and os.path.exists(emb_path) and os.path.exists(existing_metadata_path)):
-            print("[ERROR] Thiếu file index để incremental update. Bạn cần --rebuild (hoặc đảm bảo article_index đủ 3 file: metadata.json, embeddings.npy, article_index.bin).")
+            print(f"[ERROR] Thiếu file index để incremental update. Bạn cần --rebuild (hoặc đảm bảo article_index đủ 3 file: metadata.json, embeddings.npy, {os.path.basename(idx_path)}).")
             sys.exit(2)
 
         # new articles chính là phần "added" (không trùng). Để lấy chính xác, lọc theo link so với existing_articles.
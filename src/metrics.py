@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py
+
+Metrics nhẹ cho server, xuất theo định dạng text của Prometheus (GET /metrics), không cần prometheus_client.
+
+- Counter / Histogram / Summary: nhãn truyền dạng tuple giá trị theo thứ tự labelnames, mỗi lần ghi chỉ là
+  một lần tra dict (+ bisect với histogram) trong lock (< 1 µs), đủ rẻ để bật thường trực.
+- CallbackMetric: giá trị đọc lúc scrape từ hàm (kích thước index, thế hệ index, hàng đợi, cache...),
+  không tốn gì trên đường xử lý request.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+# Bucket (giây) cho latency: 0.5ms .. 10s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: LabelValues = (), value: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels_text(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Theo nhãn: số mẫu của từng bucket (không cộng dồn), bucket +Inf, rồi tổng giá trị ở phần tử cuối
+        self._counts: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, c[:-1], c[-1]) for k, c in self._counts.items()]
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le_label = 'le="%s"' % _fmt(le)
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, labels)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Summary:
+    """Chỉ tổng và số mẫu (không quantile) - rẻ hơn histogram, dùng cho thời gian từng bước."""
+
+    type = "summary"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, List[float]] = {}  # nhãn -> [tổng, số mẫu]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        self.observe_many(((labels, value),))
+
+    def observe_many(self, items) -> None:
+        """Ghi nhiều (nhãn, giá trị) trong một lần lấy lock."""
+        values = self._values
+        with self._lock:
+            for labels, value in items:
+                v = values.get(labels)
+                if v is None:
+                    v = values[labels] = [0.0, 0]
+                v[0] += value
+                v[1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, v[0], v[1]) for k, v in self._values.items()]
+        lines = []
+        for labels, total, count in items:
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, labels)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge/counter đọc lúc scrape: fn() trả về một số, hoặc dict {tuple nhãn: số}."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Union[float, Dict[LabelValues, float]]],
+                 labelnames: Sequence[str] = (), type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        return [f"{self.name}{_labels_text(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Union[Counter, Histogram, Summary, CallbackMetric]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def summary(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Summary:
+        return self.register(Summary(name, help, labelnames))
+
+    def callback(self, name: str, help: str, fn: Callable, labelnames: Sequence[str] = (), type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, fn, labelnames, type))
+
+    def render(self) -> str:
+        out = []
+        for m in self._metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.type}")
+            out.extend(m.samples())
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+near_duplicates.py
+
+Phát hiện bài báo gần trùng (tin đăng lại / syndication giữa VnExpress, Dân Trí, Tuổi Trẻ...) lúc build index.
+
+build_index chỉ lọc trùng theo `link`, nên cùng một bài đăng ở nhiều báo vẫn nằm trong index và chiếm chỗ
+trong kết quả. Ở đây:
+- Self-join k-NN theo batch trên chính vector backend vừa build (batch_search), lấy các cặp có
+  cosine similarity >= threshold.
+- Gom cặp thành cụm trùng (connected components) bằng lan truyền nhãn nhỏ nhất với NumPy.
+- Bài đại diện (canonical) của mỗi cụm là bài có label nhỏ nhất (bài vào index sớm nhất).
+
+canonical_id của một bài = label (vị trí trong metadata['articles']) của bài đại diện cụm chứa nó;
+bài không trùng với ai có canonical_id = label của chính nó.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_K = 10
+
+
+def self_join_pairs(backend, vectors: np.ndarray, ids: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                    k: int = DEFAULT_K, batch_size: int = 1024) -> np.ndarray:
+    """
+    Truy vấn k láng giềng của từng vector (theo batch) trên backend, trả về các cặp (id, neighbour_id)
+    có cosine similarity >= threshold, dạng mảng (n_pairs, 2) int64. Bỏ qua cặp với chính nó.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    k = min(k + 1, backend.count())  # +1 vì kết quả luôn chứa chính nó
+    pairs = []
+    for start in range(0, len(vectors), batch_size):
+        labels, distances = backend.batch_search(vectors[start:start + batch_size], k=k)
+        labels = labels.astype(np.int64)
+        rows = np.broadcast_to(ids[start:start + len(labels), None], labels.shape)
+        hit = (1.0 - distances >= threshold) & (labels != rows)
+        pairs.append(np.stack([rows[hit], labels[hit]], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.concatenate(pairs)
+
+
+def connected_components(n: int, pairs: np.ndarray, init: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Nhãn cụm cho n phần tử theo các cạnh `pairs`: mỗi phần tử nhận label nhỏ nhất trong cụm.
+    `init` (tuỳ chọn) là canonical_id đã có từ lần build trước, được coi như thêm cạnh i -- init[i].
+    """
+    comp = np.arange(n, dtype=np.int64)
+    if init is not None:
+        comp[:len(init)] = np.minimum(comp[:len(init)], init)
+    if len(pairs) == 0 and init is None:
+        return comp
+    a, b = pairs[:, 0], pairs[:, 1]
+    while True:
+        prev = comp.copy()
+        np.minimum.at(comp, a, comp[b])
+        np.minimum.at(comp, b, comp[a])
+        comp = comp[comp]  # nén đường đi
+        if np.array_equal(comp, prev):
+            return comp
+
+
+def cluster_stats(canonical: np.ndarray, indexed: Optional[int] = None) -> Dict[str, Any]:
+    """Thống kê cụm trùng cho build report."""
+    n = len(canonical)
+    sizes = np.bincount(canonical, minlength=n)
+    dup_sizes = sizes[sizes > 1]
+    n_canonical = int((sizes > 0).sum())
+    indexed = n if indexed is None else indexed
+    return {
+        "articles": n,
+        "canonical_articles": n_canonical,
+        "duplicate_clusters": int(len(dup_sizes)),
+        "duplicate_articles": int(dup_sizes.sum() - len(dup_sizes)),
+        "largest_cluster": int(dup_sizes.max()) if len(dup_sizes) else 1,
+        "cluster_size_histogram": {int(s): int(c) for s, c in zip(*np.unique(dup_sizes, return_counts=True))},
+        "indexed_vectors": int(indexed),
+        "index_size_reduction": round(1.0 - indexed / n, 4) if n else 0.0,
+    }
+
+
+def find_duplicate_clusters(backend, vectors: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                            k: int = DEFAULT_K, batch_size: int = 1024) -> Dict[str, Any]:
+    """Self-join toàn bộ `vectors` (label = vị trí dòng) trên backend đã build. Trả về canonical + thời gian."""
+    t0 = time.perf_counter()
+    pairs = self_join_pairs(backend, vectors, np.arange(len(vectors)), threshold=threshold, k=k, batch_size=batch_size)
+    canonical = connected_components(len(vectors), pairs)
+    return {
+        "canonical": canonical,
+        "pairs": int(len(pairs)),
+        "selfjoin_s": round(time.perf_counter() - t0, 4),
+    }
+
+
+def save_build_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Đã lưu build report: {path}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pagination.py
+
+Phân trang /search theo cursor: danh sách (doc_id, score) đã xếp hạng của một request được giữ trong session
+ngắn hạn (ResultCache, theo thế hệ index); trang sau chỉ cắt lát danh sách đó, không embed / ANN / BM25 lại.
+
+- Trang đầu lấy ứng viên như request thường (ANN nông, không tốn thêm gì cho request không bao giờ dùng cursor),
+  xếp hạng tới độ sâu phân trang trên tập ứng viên đó và lưu session "nông" nếu còn trang sau.
+- Cursor đi tới cuối danh sách nông: caller lấy sâu một lần rồi extend_served - giữ nguyên phần đã trả, nối phần
+  còn lại của danh sách sâu - và lưu đè cùng session (deep). Các trang không trùng, không sót bài đã trả.
+- Session hết hạn / bị đẩy ra / index đổi thế hệ / cursor của request khác: get trả None, caller tính lại từ đầu
+  với offset trong cursor.
+
+Cursor = base64 của "<session_id>:<offset>".
+"""
+
+from __future__ import annotations
+
+import base64
+import secrets
+from typing import Any, Dict, List, Optional, Tuple
+
+from result_cache import ResultCache
+
+# (doc_id, score)
+Item = Tuple[int, float]
+
+
+def encode_cursor(session_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{session_id}:{offset}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(session_id, offset); ValueError nếu cursor không hợp lệ."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        session_id, offset = raw.rsplit(":", 1)
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("cursor không hợp lệ") from e
+    if offset < 0 or not session_id:
+        raise ValueError("cursor không hợp lệ")
+    return session_id, offset
+
+
+def extend_served(served: List[Item], items: List[Item], depth: int) -> List[Item]:
+    """Phần đã trả giữ nguyên thứ tự, nối các bài còn lại của danh sách sâu (bỏ bài đã trả); tối đa depth bài."""
+    seen = {doc_id for doc_id, _ in served}
+    rest = [item for item in items if item[0] not in seen]
+    return served + rest[:max(0, depth - len(served))]
+
+
+class PageSessions:
+    def __init__(self, store: ResultCache):
+        self.store = store
+
+    def save(self, key: str, items: List[Item], deep: bool, generation: Any, session_id: Optional[str] = None) -> str:
+        """
+        Lưu danh sách đã xếp hạng; trả session_id (session_id có sẵn = lưu đè khi lấy sâu).
+        deep=False: danh sách chỉ xếp hạng từ ứng viên của trang đầu, hết danh sách chưa chắc đã hết kết quả.
+        """
+        session_id = session_id or secrets.token_urlsafe(9)
+        self.store.put(session_id, {"key": key, "items": items, "deep": deep}, generation)
+        return session_id
+
+    def get(self, session_id: str, key: str, generation: Any) -> Optional[Dict[str, Any]]:
+        """Session của đúng request này (key), None nếu không còn."""
+        session = self.store.get(session_id, generation)
+        if session is None or session["key"] != key:
+            return None
+        return session
+
+    @staticmethod
+    def can_serve(session: Dict[str, Any], offset: int, topk: int) -> bool:
+        """Cắt được trang [offset, offset + topk) mà không cần lấy sâu: session sâu, hoặc còn bài sau trang này."""
+        return session["deep"] or len(session["items"]) > offset + topk
+
+    @staticmethod
+    def page(session_id: str, items: List[Item], offset: int, topk: int) -> Tuple[List[Item], Optional[str]]:
+        """Trang [offset, offset + topk) và next_cursor (None nếu là trang cuối)."""
+        next_cursor = encode_cursor(session_id, offset + topk) if len(items) > offset + topk else None
+        return items[offset:offset + topk], next_cursor
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ranking.py
+
+Các bước xếp hạng lại (re-ranking) chạy trên tập ứng viên nhỏ sau khi đã tìm kiếm, viết bằng NumPy.
+
+- mmr_select: Maximal Marginal Relevance - chọn k kết quả vừa liên quan tới query vừa khác nhau,
+  tránh top-k toàn các bản tin gần giống nhau từ nhiều báo.
+- fuse_linear / fuse_rrf: gộp điểm semantic và keyword của hybrid trên mảng ứng viên (doc_ids, scores)
+  thay vì dict: hợp hai tập ứng viên bằng np.union1d, gắn điểm bằng searchsorted.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lam: float = 0.7) -> np.ndarray:
+    """
+    Chọn tham lam k ứng viên, mỗi bước lấy argmax của
+        lam * relevance - (1 - lam) * max(cosine similarity với các ứng viên đã chọn)
+
+    relevance: điểm liên quan (n,), được min-max về [0, 1] để lam có cùng ý nghĩa ở mọi mode.
+    vectors:   embeddings đã chuẩn hoá của ứng viên (n, d).
+    lam=1 giữ nguyên thứ tự theo relevance, lam=0 chỉ quan tâm độ đa dạng.
+    Trả về chỉ số ứng viên (theo thứ tự được chọn). Chi phí: 1 phép nhân ma trận (n, d) x (d, n) + k bước O(n).
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    k = min(k, n)
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    span = float(relevance.max() - relevance.min())
+    rel = (relevance - relevance.min()) / span if span > 1e-12 else np.ones(n, dtype=np.float32)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    sim = vectors @ vectors.T
+
+    selected = np.empty(k, dtype=np.int64)
+    selected[0] = int(np.argmax(rel))
+    max_sim = sim[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    for i in range(1, k):
+        score = lam * rel - (1.0 - lam) * max_sim
+        score[~available] = -np.inf
+        pick = int(np.argmax(score))
+        selected[i] = pick
+        available[pick] = False
+        np.maximum(max_sim, sim[pick], out=max_sim)
+
+    return selected
+
+
+def minmax(scores: np.ndarray, lo: Optional[float] = None) -> np.ndarray:
+    """Min-max về [0, 1] (lo: giá trị ứng với 0, mặc định min của scores); mọi điểm bằng nhau -> toàn 0."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    lo = scores.min() if lo is None else lo
+    span = scores.max() - lo
+    if span < 1e-9:
+        return np.zeros(len(scores), dtype=np.float64)
+    return (scores - lo) / span
+
+
+def _union(sem_ids: np.ndarray, kw_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids hợp đã sắp, vị trí của sem_ids trong đó, vị trí của kw_ids trong đó)."""
+    ids = np.union1d(sem_ids, kw_ids)
+    return ids, np.searchsorted(ids, sem_ids), np.searchsorted(ids, kw_ids)
+
+
+def fuse_linear(
+    sem_ids: np.ndarray, sem_scores: np.ndarray, kw_ids: np.ndarray, kw_scores: np.ndarray,
+    w_sem: float = 0.55, w_kw: float = 0.45, kw_floor: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    w_sem * minmax(semantic) + w_kw * minmax(keyword) trên hợp hai tập ứng viên (doc thiếu một phía được 0 phía đó).
+    Mỗi phía được chuẩn hoá trên chính tập ứng viên của nó; kw_floor thay min của keyword khi tập ứng viên keyword
+    chỉ là một phần các doc khớp (KeywordIndex.score_floor). ids trong từng phía không trùng nhau.
+    """
+    ids, sem_pos, kw_pos = _union(sem_ids, kw_ids)
+    fused = np.zeros(len(ids), dtype=np.float64)
+    fused[sem_pos] += w_sem * minmax(sem_scores)
+    fused[kw_pos] += w_kw * minmax(kw_scores, lo=kw_floor)
+    return ids, fused
+
+
+def fuse_rrf(
+    sem_ids: np.ndarray, sem_scores: np.ndarray, kw_ids: np.ndarray, kw_scores: np.ndarray, k: int = 60,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reciprocal Rank Fusion: sum 1 / (k + hạng) theo hạng ở từng phía (hạng 1 = điểm cao nhất), chỉ dùng thứ tự
+    nên không phụ thuộc thang điểm. Chia cho 2 / (k + 1) để doc đứng đầu cả hai phía có điểm 1.
+    """
+    ids, sem_pos, kw_pos = _union(sem_ids, kw_ids)
+    fused = np.zeros(len(ids), dtype=np.float64)
+    for pos, scores in ((sem_pos, sem_scores), (kw_pos, kw_scores)):
+        ranks = np.empty(len(scores), dtype=np.float64)
+        ranks[np.argsort(-np.asarray(scores), kind="stable")] = np.arange(1, len(scores) + 1)
+        fused[pos] += 1.0 / (k + ranks)
+    return ids, fused * ((k + 1) / 2.0)
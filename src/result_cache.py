@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+result_cache.py
+
+Cache kết quả /search trong bộ nhớ: LRU giới hạn theo số mục và số byte, mỗi mục có TTL.
+
+- Khoá = request đã chuẩn hoá (query viết thường, gộp khoảng trắng + các tham số khác) và thế hệ index
+  (ArticleHNSWManager.generation, đổi mỗi lần build / merge ghi lại metadata). Khi thế hệ index đổi,
+  toàn bộ cache bị xoá ở lần tra cứu kế tiếp.
+- Kích thước một mục ước lượng bằng số byte JSON của response.
+- Dùng được từ nhiều thread (lock).
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import fast_json
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACE_RE.sub(" ", (query or "").strip().lower())
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 2 ** 20, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()  # key -> (hết hạn, bytes, value)
+        self._lock = threading.Lock()
+        self.generation: Any = None
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    def _check_generation(self, generation: Any) -> None:
+        if generation != self.generation:
+            if self._items:
+                self.invalidations += 1
+            self._items.clear()
+            self.bytes_used = 0
+            self.generation = generation
+
+    def get(self, key: Hashable, generation: Any) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._check_generation(generation)
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[2]
+
+    def put(self, key: Hashable, value: Any, generation: Any) -> None:
+        if not self.enabled:
+            return
+        size = len(fast_json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (time.monotonic() + self.ttl, size, value)
+            self.bytes_used += size
+            while len(self._items) > self.max_entries or self.bytes_used > self.max_bytes:
+                self._remove(next(iter(self._items)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._items.pop(key)
+        self.bytes_used -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes_used = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._items),
+                "bytes_used": self.bytes_used,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
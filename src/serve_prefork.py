@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+serve_prefork.py
+
+Chạy server nhiều worker theo kiểu prefork: process chính import server.py một lần (model, index ANN,
+metadata.json, keyword index), rồi fork N worker dùng chung socket đang listen. Các trang bộ nhớ đã nạp
+được chia sẻ copy-on-write giữa các worker thay vì mỗi worker tự nạp lại (N lần thời gian khởi động và RAM).
+
+Để trang chia sẻ không bị "bẩn":
+- gc.freeze() trước khi fork: các object đã nạp (list articles, dict vocab, ...) được chuyển sang thế hệ
+  vĩnh viễn, GC của worker không còn duyệt/ghi header của chúng.
+- Dữ liệu lớn nằm trong mảng NumPy / index C++ (embeddings, postings BM25, đồ thị HNSW): refcount chỉ nằm ở
+  header của object, không nằm trên vùng dữ liệu, nên đọc không làm copy trang.
+- Chỉ các bài thực sự được trả về mới bị ghi refcount (dict article + chuỗi), phần còn lại vẫn dùng chung.
+
+Process chính giữ vai trò giám sát: fork lại worker bị chết, dừng tất cả khi nhận SIGINT/SIGTERM,
+và định kỳ in bộ nhớ từng worker (USS = trang riêng, PSS = chia tỉ lệ trang dùng chung, đọc từ /proc).
+
+Những gì KHÔNG dùng chung giữa các worker (trạng thái trong bộ nhớ của từng process):
+- Model được nạp trong process chính trước khi fork; process chính không chạy inference nào (warm-up chạy trong
+  lifespan của từng worker sau fork), nên thread pool của PyTorch chỉ được tạo trong worker (--torch-threads).
+- RESULT_CACHE và SESSION_STORE riêng từng worker: tỉ lệ cache hit giảm khi tăng số worker, cursor phân trang
+  rơi vào worker khác thì trang đó được tính lại (kết quả vẫn đúng, chỉ chậm hơn).
+- Bộ đếm /metrics và /stats riêng từng worker: mỗi lần scrape chỉ thấy worker nhận request đó, không phải tổng
+  của cả server - cần cộng theo từng worker (hoặc scrape từng worker) nếu muốn số liệu toàn cục.
+- Warm-up và /readyz chạy riêng trong từng worker.
+
+Nạp lại index (SEARCH_RELOAD_INTERVAL / --reload-interval) chỉ chạy ở process chính, thread theo dõi của server.py
+bị tắt trong worker: nếu mỗi worker tự nạp, bản index mới nằm trong trang riêng của từng worker và bộ nhớ tăng
+lên N lần. Khi build/merge ghi xong index, process chính nạp bản mới, gc.freeze() lại rồi fork bộ worker mới và gửi
+SIGTERM cho worker cũ (uvicorn trả nốt request đang xử lý rồi thoát) - trong lúc chuyển, bản cũ và bản mới cùng
+nằm trong RAM.
+
+Ví dụ:
+  python serve_prefork.py --workers 4 --port 8000
+  python load_test.py --url http://localhost:8000 --concurrency 16 --duration 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """RSS/PSS/USS (kB) của một process, từ /proc/<pid>/smaps_rollup (Linux)."""
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def print_memory(master_pid: int, workers: List[int]) -> None:
+    print(f"\n{'PID':>8} {'ROLE':<8} {'RSS(MB)':>9} {'PSS(MB)':>9} {'USS(MB)':>9}")
+    total_pss = 0
+    for role, pid in [("master", master_pid)] + [("worker", p) for p in workers]:
+        mem = memory_kb(pid)
+        if not mem:
+            continue
+        total_pss += mem["pss"]
+        print(f"{pid:>8} {role:<8} {mem['rss'] / 1024:>9.1f} {mem['pss'] / 1024:>9.1f} {mem['uss'] / 1024:>9.1f}")
+    print(f"Tổng PSS (RAM thực tế của cả nhóm): {total_pss / 1024:.1f} MB", flush=True)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, torch_threads: int) -> None:
+    import uvicorn
+
+    if torch_threads > 0:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+    config = uvicorn.Config(app, log_level="warning", access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--torch-threads", type=int, default=1,
+                    help="Số thread PyTorch mỗi worker (0 = mặc định); tránh N worker x N thread tranh CPU")
+    ap.add_argument("--mem-interval", type=float, default=60.0, help="Chu kỳ in bộ nhớ (giây, 0 = chỉ in lúc khởi động)")
+    ap.add_argument("--reload-interval", type=float, default=None,
+                    help="Chu kỳ kiểm tra index để nạp lại ở process chính (giây, 0 = tắt; mặc định SEARCH_RELOAD_INTERVAL)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    import server  # nạp model + index + keyword index một lần trong process chính
+
+    if server.search_app is None:
+        print("Không load được hệ thống tìm kiếm, dừng.")
+        sys.exit(1)
+    print(f"Đã nạp hệ thống trong {time.perf_counter() - t0:.1f}s, fork {args.workers} worker...")
+
+    reload_interval = server.RELOAD_INTERVAL if args.reload_interval is None else args.reload_interval
+    server.RELOAD_INTERVAL = 0  # worker không tự nạp lại index (lifespan không chạy thread index-watch)
+
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    master_pid = os.getpid()
+    workers: Dict[int, int] = {}  # pid -> slot
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(server.app, sock, args.torch_threads)
+            finally:
+                os._exit(0)
+        workers[pid] = slot
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(args.workers):
+        spawn(slot)
+    print(f"Server: http://{args.host}:{args.port} ({args.workers} worker, master pid {master_pid})", flush=True)
+
+    def reload_and_refork(signature) -> None:
+        """Nạp index mới ở process chính rồi thay toàn bộ worker (worker mới dùng chung trang của bản mới)."""
+        gc.unfreeze()  # bản cũ không nằm mãi trong thế hệ vĩnh viễn sau khi được thay
+        if not server.reload_search_app(signature):
+            gc.freeze()
+            return
+        gc.collect()
+        gc.freeze()
+        old = list(workers)
+        for pid in old:
+            spawn(workers.pop(pid))
+        for pid in old:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        print(f"Đã fork lại {len(workers)} worker với index mới", flush=True)
+
+    time.sleep(2.0)
+    print_memory(master_pid, list(workers))
+    next_report = time.monotonic() + args.mem_interval
+    next_poll = time.monotonic() + reload_interval
+    pending = None
+
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            slot = workers.pop(pid, None)
+            if not stopping and slot is not None:
+                print(f"Worker {pid} đã dừng (status {status}), fork lại...", flush=True)
+                spawn(slot)
+            continue
+
+        if reload_interval > 0 and not stopping and time.monotonic() >= next_poll:
+            signature, pending = server.poll_index(pending)
+            if signature is not None:
+                reload_and_refork(signature)
+            next_poll = time.monotonic() + reload_interval
+
+        if args.mem_interval > 0 and not stopping and time.monotonic() >= next_report:
+            print_memory(master_pid, list(workers))
+            next_report = time.monotonic() + args.mem_interval
+        time.sleep(0.5)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
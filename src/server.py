@@ -1,24 +1,48 @@
 from __future__ import annotations
 
+import json
 import os
 import re
+import threading
 import time
+import traceback
 import html as html_lib
-from collections import Counter, defaultdict
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
 
+from article_dates import DateIndex, day_start_ts, newest_first, to_datetime
+from admission import DEFAULT_POLICY, Overloaded, ResourceLimiter, parse_policy
 from article_search_system import ArticleSearchApp
-
-app = FastAPI()
+import fast_json
+from keyword_index import KeywordIndex, parse_phrases, query_tokens, tokenize
+from metrics import REGISTRY
+from pagination import Item, PageSessions, decode_cursor, encode_cursor, extend_served
+from ranking import fuse_linear, fuse_rrf, mmr_select
+from result_cache import ResultCache, normalize_query
+from suggest import SuggestIndex
+from worker_pool import BoundedExecutor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_warm_up()
+    stop_watch = threading.Event()
+    if RELOAD_INTERVAL > 0:
+        threading.Thread(target=watch_index, args=(stop_watch,), name="index-watch", daemon=True).start()
+    yield
+    stop_watch.set()
+    SEARCH_POOL.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Cho phép CORS
 app.add_middleware(
@@ -42,6 +66,136 @@ class SearchRequest(BaseModel):
     topk: int = Field(default=10, ge=1, le=50)
     mode: str = Field(default="hybrid", description="semantic|keyword|hybrid")
     sort: str = Field(default="relevance", description="relevance|newest")
+    rerank: Optional[bool] = Field(default=None, description="Chấm lại chính xác ứng viên ANN (mặc định theo SEARCH_RERANK_CANDIDATES)")
+    diversify: bool = Field(default=False, description="Đa dạng hoá kết quả bằng MMR")
+    mmr_lambda: float = Field(default=0.7, ge=0.0, le=1.0, description="1 = chỉ theo độ liên quan, 0 = chỉ theo độ đa dạng")
+    facets: bool = Field(default=False, description="Trả thêm phân bố source/category/language/topic của tập kết quả")
+    sources: Optional[List[str]] = Field(default=None, description="Chỉ lấy bài của các nguồn này")
+    categories: Optional[List[str]] = Field(default=None, description="Chỉ lấy bài thuộc các chuyên mục này")
+    languages: Optional[List[str]] = Field(default=None, description="Chỉ lấy bài viết bằng các ngôn ngữ này")
+    date_from: Optional[date] = Field(default=None, description="Chỉ lấy bài đăng từ ngày này (YYYY-MM-DD)")
+    date_to: Optional[date] = Field(default=None, description="Chỉ lấy bài đăng đến hết ngày này (YYYY-MM-DD)")
+    cursor: Optional[str] = Field(default=None, description="next_cursor của trang trước (cùng các tham số khác)")
+    fusion: Optional[str] = Field(default=None, description="Cách gộp điểm hybrid: linear|rrf (mặc định theo SEARCH_FUSION)")
+    dedup: Optional[bool] = Field(default=None, description="Chỉ giữ một bài mỗi cụm gần trùng (mặc định theo SEARCH_DEDUP)")
+
+
+# Số ứng viên ANN được chấm lại bằng dot product chính xác (0 = tắt).
+# Cho phép chạy HNSW với ef/M nhỏ hơn (ARTICLE_INDEX_BACKEND_PARAMS='{"ef": 32}') mà vẫn giữ độ chính xác top-k.
+RERANK_CANDIDATES = int(os.environ.get("SEARCH_RERANK_CANDIDATES", "0"))
+
+# Hybrid: gộp điểm trên ứng viên ANN + top SEARCH_HYBRID_KEYWORD_CANDIDATES của BM25 (điểm BM25 của ứng viên ANN
+# được tra riêng, không chấm toàn bộ doc khớp). SEARCH_FUSION: linear (0.55 semantic + 0.45 keyword sau min-max)
+# hoặc rrf (Reciprocal Rank Fusion, chỉ dùng thứ hạng).
+FUSION = os.environ.get("SEARCH_FUSION", "linear").lower()
+
+# Gộp bài gần trùng trong kết quả (cùng canonical_id, gán lúc build - xem near_duplicates.py): tắt mặc định để
+# /search trả đúng như trước; SEARCH_DEDUP=1 hoặc trường "dedup" của request để bật.
+SEARCH_DEDUP = os.environ.get("SEARCH_DEDUP", "0") == "1"
+HYBRID_KEYWORD_CANDIDATES = int(os.environ.get("SEARCH_HYBRID_KEYWORD_CANDIDATES", "200"))
+RRF_K = 60
+
+# Số ứng viên tối đa đưa vào MMR: chi phí ~ MMR_MAX_CANDIDATES^2 * dim (100 ứng viên x 768 chiều < 1ms)
+MMR_MAX_CANDIDATES = int(os.environ.get("SEARCH_MMR_MAX_CANDIDATES", "100"))
+
+# Số request tìm kiếm được tính đồng thời (embed + k-NN + BM25 chạy trên thread pool, không chặn event loop);
+# request vượt quá sẽ xếp hàng, xem /stats
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+SEARCH_POOL = BoundedExecutor(SEARCH_WORKERS)
+
+# Admission control (xem admission.py): số request dùng đồng thời model encode / ANN / BM25 (mặc định SEARCH_WORKERS)
+# và chính sách khi kín chỗ sau SEARCH_ADMISSION_WAIT_MS. Mặc định chờ; giảm cấp / 503 phải bật rõ ràng, ví dụ
+# SEARCH_ADMISSION_POLICY="encode=keyword,ann=reduce,bm25=reject".
+# SEARCH_MAX_QUEUE: số request chờ thread pool tối đa, vượt quá trả 503 ngay (0 = không giới hạn).
+ADMISSION_POLICY = parse_policy(os.environ.get("SEARCH_ADMISSION_POLICY", DEFAULT_POLICY))
+ADMISSION_WAIT = float(os.environ.get("SEARCH_ADMISSION_WAIT_MS", "20")) / 1000
+LIMITERS = {
+    "encode": ResourceLimiter("encode", int(os.environ.get("SEARCH_LIMIT_ENCODE", str(SEARCH_WORKERS))), ADMISSION_WAIT),
+    "ann": ResourceLimiter("ann", int(os.environ.get("SEARCH_LIMIT_ANN", str(SEARCH_WORKERS))), ADMISSION_WAIT),
+    "bm25": ResourceLimiter("bm25", int(os.environ.get("SEARCH_LIMIT_BM25", str(SEARCH_WORKERS))), ADMISSION_WAIT),
+}
+MAX_QUEUE = int(os.environ.get("SEARCH_MAX_QUEUE", "64"))
+RETRY_AFTER_S = int(os.environ.get("SEARCH_RETRY_AFTER", "1"))
+
+# Cache kết quả /search theo request đã chuẩn hoá + thế hệ index (SEARCH_CACHE_ENTRIES=0 để tắt)
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.environ.get("SEARCH_CACHE_ENTRIES", "1000")),
+    max_bytes=int(float(os.environ.get("SEARCH_CACHE_MAX_MB", "64")) * 2 ** 20),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", "300")),
+)
+
+# Warm-up lúc khởi động (mỗi worker): SEARCH_WARMUP_ROUNDS lượt chạy các query mẫu qua mọi mode (0 = tắt);
+# /readyz trả 503 cho tới khi xong
+WARMUP_ROUNDS = int(os.environ.get("SEARCH_WARMUP_ROUNDS", "2"))
+WARMUP_QUERIES = [
+    q.strip()
+    for q in os.environ.get("SEARCH_WARMUP_QUERIES", "giá vàng hôm nay,bóng đá việt nam,trí tuệ nhân tạo").split(",")
+    if q.strip()
+]
+
+# Phân trang (xem pagination.py): trang đầu lấy ứng viên như request thường, xếp hạng tới SEARCH_PAGE_DEPTH và giữ
+# danh sách trong session store ngắn hạn; trang sau chỉ cắt lát. Hết danh sách nông thì lấy sâu (ANN tới
+# SEARCH_PAGE_DEPTH) một lần. Session hết hạn / bị đẩy ra -> tính lại.
+PAGE_DEPTH = int(os.environ.get("SEARCH_PAGE_DEPTH", "200"))
+SESSION_STORE = ResultCache(
+    max_entries=int(os.environ.get("SEARCH_SESSION_ENTRIES", "500")),
+    max_bytes=int(float(os.environ.get("SEARCH_SESSION_MAX_MB", "32")) * 2 ** 20),
+    ttl=float(os.environ.get("SEARCH_SESSION_TTL", "600")),
+)
+PAGE_SESSIONS = PageSessions(SESSION_STORE)
+
+
+# -----------------------
+# Metrics (GET /metrics, định dạng Prometheus; mỗi worker prefork có bộ đếm riêng)
+# -----------------------
+SEARCH_MODES = ("semantic", "keyword", "hybrid")
+
+SEARCH_REQUESTS = REGISTRY.counter("search_requests_total", "Số request /search theo mode và kết quả", ("mode", "status"))
+SEARCH_SECONDS = REGISTRY.histogram(
+    "search_request_seconds", "Thời gian /search từ lúc nhận request (gồm chờ thread pool, chưa gồm serialize)", ("mode",)
+)
+SEARCH_STAGE_SECONDS = REGISTRY.summary(
+    "search_stage_seconds", "Thời gian từng bước: embed, ann, bm25, fusion, rank (lọc/sắp xếp/gộp trùng/MMR), format",
+    ("mode", "stage"),
+)
+CANDIDATES_SCORED = REGISTRY.counter("search_candidates_scored_total", "Số ứng viên được chấm điểm", ("source",))
+ADMISSION_EVENTS = REGISTRY.counter(
+    "search_admission_total", "Số lần tài nguyên kín chỗ, theo tài nguyên (encode/ann/bm25/queue) và cách xử lý "
+    "(keyword/reduce = giảm cấp, reject = trả 503)", ("resource", "action"),
+)
+
+REGISTRY.callback("search_cache_hits_total", "Số lần trúng cache kết quả", lambda: RESULT_CACHE.hits, type="counter")
+REGISTRY.callback("search_cache_misses_total", "Số lần trượt cache kết quả", lambda: RESULT_CACHE.misses, type="counter")
+REGISTRY.callback("search_cache_bytes", "Dung lượng ước lượng của cache kết quả", lambda: RESULT_CACHE.bytes_used)
+REGISTRY.callback("search_executor_queued", "Số request đang chờ thread pool", lambda: SEARCH_POOL.queued)
+REGISTRY.callback("search_executor_running", "Số request đang chạy trên thread pool", lambda: SEARCH_POOL.running)
+REGISTRY.callback(
+    "search_resource_in_use", "Số request đang dùng từng tài nguyên (encode/ann/bm25)",
+    lambda: {(name,): limiter.in_use for name, limiter in LIMITERS.items()}, ("resource",),
+)
+REGISTRY.callback("index_documents", "Số bài trong metadata", lambda: len(search_app.hnsw_mgr.articles))
+REGISTRY.callback("index_vectors", "Số vector trong vector index", lambda: search_app.hnsw_mgr.index.count())
+REGISTRY.callback("keyword_index_postings", "Số postings của keyword index", lambda: len(KW_INDEX.doc_ids))
+REGISTRY.callback(
+    "index_generation", "Thế hệ index đang phục vụ (đổi sau mỗi lần build/merge)",
+    lambda: search_app.hnsw_mgr.generation if isinstance(search_app.hnsw_mgr.generation, int) else 0,
+)
+
+
+def record_search(mode: str, status: str, seconds: float, timings: Dict[str, float]) -> None:
+    mode = mode if mode in SEARCH_MODES else "other"
+    SEARCH_REQUESTS.inc((mode, status))
+    SEARCH_SECONDS.observe(seconds, (mode,))
+    if timings:
+        SEARCH_STAGE_SECONDS.observe_many(((mode, stage), value) for stage, value in timings.items())
+
+
+def search_status(response: Dict[str, Any]) -> str:
+    if "error" in response:
+        return "error"
+    if "degraded" in response:
+        return "degraded"
+    return "ok" if response.get("results") else "empty"
 
 
 # -----------------------
@@ -75,199 +229,314 @@ def safe_url(u: Any) -> str:
 
 
 # -----------------------
-# Date parsing
+# Date display
 # -----------------------
-_DATE_KEYS = (
-    "published",
-    "pubDate",
-    "date",
-    "datetime",
-    "time",
-    "timestamp",
-    "created_at",
-    "updated_at",
-    "createdAt",
-    "updatedAt",
-)
+def format_date_vi(dt: Optional[datetime]) -> str:
+    if not dt:
+        return ""
+    return dt.strftime("%d/%m/%Y %H:%M")
 
 
-def _try_parse_datetime(val: str) -> Optional[datetime]:
-    v = (val or "").strip()
-    if not v:
-        return None
+# -----------------------
+# Keyword index (BM25-lite)
+# -----------------------
+# Global keyword structures (CSR BM25, xem keyword_index.py)
+KW_INDEX = KeywordIndex()
+
+# Top-k keyword bằng MaxScore (bỏ qua postings của âm tiết phổ biến không thể vào top-k); 0 = chấm điểm toàn bộ.
+# Chỉ dùng khi k <= SEARCH_KEYWORD_PRUNING_MAX_K: k sâu (top 2000 của mode keyword) phải đọc gần hết postings
+# và MaxScore chậm hơn chấm điểm toàn bộ (xem benchmark_keyword.py).
+KEYWORD_PRUNING = os.environ.get("SEARCH_KEYWORD_PRUNING", "1") != "0"
+KEYWORD_PRUNING_MAX_K = int(os.environ.get("SEARCH_KEYWORD_PRUNING_MAX_K", "200"))
+
+# Điểm cộng cho doc có hai âm tiết liền nhau của query đứng liền nhau ("đà nẵng"), theo idf của hai âm tiết; 0 = tắt.
+# Cụm trong ngoặc kép ("trí tuệ nhân tạo", "..."~N cho phép chèn N âm tiết) là điều kiện bắt buộc ở mọi mode.
+PAIR_BONUS = float(os.environ.get("SEARCH_PAIR_BONUS", "0.5"))
+# Tham số BM25, cố định lúc build (trọng số tính sẵn trong index, các request dùng chung)
+BM25_K1, BM25_B = 1.2, 0.75
+
+
+def build_keyword_index(articles: List[Dict[str, Any]]) -> KeywordIndex:
+    """Build keyword index CSR (term id -> doc_ids/weights)."""
+    docs_tokens: List[List[str]] = []
+    for a in articles:
+        title = safe_text(a.get("title", ""))
+        summary = safe_text(a.get("summary", ""))
+        docs_tokens.append(tokenize(f"{title} {summary}"))
 
-    # numeric epoch seconds/ms
-    try:
-        if re.fullmatch(r"\d{10,13}", v):
-            n = int(v)
-            if len(v) == 13:
-                n = n // 1000
-            return datetime.fromtimestamp(n)
-    except Exception:
-        pass
-
-    # common formats
-    fmts = [
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%d",
-        "%d/%m/%Y %H:%M:%S",
-        "%d/%m/%Y %H:%M",
-        "%d/%m/%Y",
-        "%a, %d %b %Y %H:%M:%S %z",  # RSS
-        "%a, %d %b %Y %H:%M:%S %Z",
-        "%Y-%m-%dT%H:%M:%S%z",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S.%f%z",
-        "%Y-%m-%dT%H:%M:%S.%f",
-    ]
-    for f in fmts:
-        try:
-            dt = datetime.strptime(v, f)
-            # convert aware -> naive local
-            if dt.tzinfo is not None:
-                dt = dt.astimezone().replace(tzinfo=None)
-            return dt
-        except Exception:
-            pass
+    index = KeywordIndex(k1=BM25_K1, b=BM25_B)
+    index.build(docs_tokens)
+    return index
 
-    return None
 
+# Điểm của tập ứng viên: (doc_ids int64, scores), hai mảng cùng độ dài, doc_id không trùng
+Scores = Tuple[np.ndarray, np.ndarray]
+NO_SCORES: Scores = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
 
-def extract_article_datetime(article: Dict[str, Any]) -> Optional[datetime]:
-    for k in _DATE_KEYS:
-        if k in article and article[k]:
-            dt = _try_parse_datetime(str(article[k]))
-            if dt:
-                return dt
-    return None
 
+# Autocomplete (/suggest): vocab keyword index + cụm âm tiết trong tiêu đề, cộng độ phổ biến của query đã search
+SUGGEST = SuggestIndex()
 
-def format_date_vi(dt: Optional[datetime]) -> str:
-    if not dt:
-        return ""
-    return dt.strftime("%d/%m/%Y %H:%M")
+
+def build_suggest_index(articles: List[Dict[str, Any]], kw_index: KeywordIndex) -> SuggestIndex:
+    titles = (safe_text(a.get("title", "")) for a in articles)
+    suggest = SuggestIndex()
+    suggest.build(titles, kw_index.vocab, kw_index.df)
+    suggest.copy_popularity(SUGGEST)  # nạp lại index: giữ độ phổ biến query đã ghi nhận
+    return suggest
 
 
 # -----------------------
-# Keyword index (BM25-lite)
+# Bộ lọc (sources, categories, languages, date_from/date_to)
 # -----------------------
-_TOKEN_RE = re.compile(r"[\w]+", flags=re.UNICODE)
+# doc_id sắp theo ngày đăng, build lúc load (lọc khoảng ngày = 2 lần searchsorted)
+DATE_INDEX = DateIndex(np.zeros(0, dtype=np.int64))
 
 
-def tokenize(text: str) -> List[str]:
-    toks = [t.lower() for t in _TOKEN_RE.findall(text or "")]
-    return [t for t in toks if len(t) >= 2]
+def filter_mask(req: SearchRequest) -> Optional[np.ndarray]:
+    """
+    Allow-list của request: mask bool theo doc_id (None = không lọc). Bitset tính sẵn của từng giá trị
+    source/category/language (FacetIndex) AND khoảng ngày (DATE_INDEX). BM25 chỉ cộng điểm doc được phép,
+    ANN chỉ trả doc được phép - bộ lọc được áp trước khi xếp hạng, không cắt bớt top-k sau đó.
+    """
+    mask: Optional[np.ndarray] = None
+    facets = search_app.hnsw_mgr.facets
+    if facets is not None:
+        mask = facets.filter_mask(source=req.sources or None, category=req.categories or None, language=req.languages or None)
+    if req.date_from is not None or req.date_to is not None:
+        start = day_start_ts(req.date_from) if req.date_from else None
+        end = day_start_ts(req.date_to + timedelta(days=1)) if req.date_to else None
+        dates = DATE_INDEX.range_mask(start, end)
+        mask = dates if mask is None else mask & dates
+    return mask
+
+
+def bm25_lite_scores(query: str, *, max_docs: int = 2000, allowed: Optional[np.ndarray] = None) -> Scores:
+    """Compute BM25-ish scores for docs matching query tokens (allowed: allow-list của bộ lọc)."""
+    if KW_INDEX.n_docs == 0:
+        return NO_SCORES
+
+    q_toks = query_tokens(query)
+    if not q_toks:
+        return NO_SCORES
 
+    prune = KEYWORD_PRUNING and max_docs <= KEYWORD_PRUNING_MAX_K
+    return KW_INDEX.search(q_toks, parse_phrases(query), k=max_docs, prune=prune, pair_weight=PAIR_BONUS,
+                           allowed=allowed)
 
-# Global keyword structures
-KW_POSTINGS: Dict[str, List[Tuple[int, int]]] = {}
-KW_DF: Dict[str, int] = {}
-DOC_LEN: List[int] = []
-AVG_DL: float = 0.0
-N_DOCS: int = 0
 
-# Date cache
-DOC_DATE: List[Optional[datetime]] = []
+def bm25_candidate_scores(query: str, sem_ids: np.ndarray, top: Scores, allowed: Optional[np.ndarray] = None) -> Scores:
+    """
+    Điểm keyword cho hybrid: top BM25 (`top`) + điểm BM25 tra riêng cho các ứng viên ANN chưa có trong đó
+    (chỉ giữ ứng viên có khớp ít nhất một token).
+    """
+    top_ids, top_values = top
+    extra = sem_ids[~np.isin(sem_ids, top_ids)]
+    q_toks = query_tokens(query)
+    if not len(extra) or not q_toks or KW_INDEX.n_docs == 0:
+        return top
+    extra_scores = KW_INDEX.score_candidates(q_toks, extra, parse_phrases(query), PAIR_BONUS, allowed)
+    hit = extra_scores > 0
+    return np.concatenate([top_ids, extra[hit]]), np.concatenate([top_values, extra_scores[hit]])
+
+
+def phrase_filter(query: str, scores: Scores) -> Scores:
+    """Query có cụm trong ngoặc kép: chỉ giữ ứng viên chứa đủ các cụm."""
+    phrases = parse_phrases(query)
+    doc_ids, values = scores
+    if not phrases or not len(doc_ids) or KW_INDEX.n_docs == 0:
+        return scores
+    keep = np.isin(doc_ids, KW_INDEX.match_phrases(phrases, np.unique(doc_ids)))
+    return doc_ids[keep], values[keep]
+
+
+def top_scores(scores: Scores, n: int) -> Scores:
+    doc_ids, values = scores
+    if len(doc_ids) <= n:
+        return scores
+    top = np.argpartition(-values, n - 1)[:n]
+    return doc_ids[top], values[top]
 
 
-def build_keyword_index(articles: List[Dict[str, Any]]) -> None:
-    """Build a simple postings index: token -> list[(doc_id, tf)]."""
-    global KW_POSTINGS, KW_DF, DOC_LEN, AVG_DL, N_DOCS, DOC_DATE
+# -----------------------
+# Display payload store
+# -----------------------
+# Trường hiển thị đã làm sạch (safe_text/safe_url/format_date_vi) của từng doc, tính lần đầu doc được trả về
+# rồi dùng lại: kết quả chỉ còn là tra cứu + gắn score. None = chưa tính.
+DOC_PAYLOAD: List[Optional[Dict[str, Any]]] = []
+
+
+def get_article_datetime(doc_id: int) -> Optional[datetime]:
+    return to_datetime(search_app.hnsw_mgr.timestamps[doc_id])
+
+
+def doc_payload(doc_id: int) -> Dict[str, Any]:
+    payload = DOC_PAYLOAD[doc_id] if doc_id < len(DOC_PAYLOAD) else None
+    if payload is None:
+        a = search_app.hnsw_mgr.articles[doc_id]
+        payload = {
+            "doc_id": int(doc_id),
+            "title": safe_text(a.get("title", "")),
+            "source": safe_text(a.get("source", "")),
+            "category": safe_text(a.get("category", "")),
+            "summary": safe_text(a.get("summary", ""), max_len=240),
+            "link": safe_url(a.get("link", "")),
+            "published": format_date_vi(get_article_datetime(doc_id)),
+        }
+        if doc_id < len(DOC_PAYLOAD):
+            DOC_PAYLOAD[doc_id] = payload
+    return payload
 
-    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
-    df: Dict[str, int] = defaultdict(int)
-    doc_len: List[int] = []
-    doc_date: List[Optional[datetime]] = []
 
-    for i, a in enumerate(articles):
-        title = safe_text(a.get("title", ""))
-        summary = safe_text(a.get("summary", ""))
-        toks = tokenize(f"{title} {summary}")
-        doc_len.append(len(toks))
+def format_result(doc_id: int, score: float) -> Dict[str, Any]:
+    """Một kết quả trả về cho UI (dùng chung cho /search và /related)."""
+    result = dict(doc_payload(doc_id))
+    result["score"] = round(float(score), 4)
+    return result
 
-        doc_date.append(extract_article_datetime(a))
 
-        if not toks:
-            continue
+# -----------------------
+# Load hệ thống
+# -----------------------
+# Trạng thái khởi động, trả về ở /healthz và /readyz
+LOAD_STATE: Dict[str, Any] = {"status": "loading", "error": None, "load_s": None, "prefault": None}
+INDEX_DIR = "article_index"  # thư mục index ArticleSearchApp đọc (tương đối với thư mục chạy server)
 
-        tf = Counter(toks)
-        for tok, cnt in tf.items():
-            postings[tok].append((i, cnt))
-            df[tok] += 1
 
-    KW_POSTINGS = dict(postings)
-    KW_DF = dict(df)
-    DOC_LEN = doc_len
-    DOC_DATE = doc_date
-    N_DOCS = len(articles)
-    AVG_DL = (sum(doc_len) / max(1, len(doc_len))) if doc_len else 0.0
+def index_signature(index_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """(tên, mtime_ns, kích thước) của các file trong thư mục index; đổi khi build/merge ghi lại index."""
+    try:
+        entries = [e for e in os.scandir(index_dir) if e.is_file()]
+    except OSError:
+        return ()
+    return tuple(sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in entries))
 
 
-def bm25_lite_scores(
-    query: str, *, k1: float = 1.2, b: float = 0.75, max_docs: int = 2000
-) -> Dict[int, float]:
-    """Compute BM25-ish scores for docs matching query tokens."""
-    if N_DOCS == 0:
-        return {}
+def prefault(arr: Optional[np.ndarray]) -> int:
+    """Đọc một phần tử mỗi trang 4 KB để nạp trước các trang của mảng (nhất là memmap) vào RAM; trả về số byte."""
+    if arr is None or arr.size == 0:
+        return 0
+    flat = np.ravel(arr)
+    step = max(1, 4096 // arr.itemsize)
+    float(flat[::step].sum())
+    return int(arr.nbytes)
 
-    q_toks = tokenize(query)
-    if not q_toks:
-        return {}
 
-    q_tf = Counter(q_toks)
-    scores: Dict[int, float] = defaultdict(float)
+def prefault_index(mgr) -> Dict[str, Any]:
+    t = time.perf_counter()
+    arrays = [mgr.all_embeddings, getattr(mgr, "related_labels", None), getattr(mgr, "related_sims", None), mgr.timestamps]
+    n_bytes = sum(prefault(a) for a in arrays)
+    return {"bytes": n_bytes, "seconds": round(time.perf_counter() - t, 3)}
 
-    for tok, qcnt in q_tf.items():
-        postings = KW_POSTINGS.get(tok)
-        if not postings:
-            continue
 
-        df = KW_DF.get(tok, 0)
-        idf = np.log((N_DOCS - df + 0.5) / (df + 0.5) + 1.0)
+def open_search_app() -> ArticleSearchApp:
+    loaded = ArticleSearchApp()
+    metadata_path = os.path.join(loaded.hnsw_mgr.index_dir, "metadata.json")
+    if not os.path.exists(metadata_path):
+        # load_system() sẽ hỏi có build index không (input) - server không hỏi, báo lỗi luôn
+        raise RuntimeError(f"Chưa có index ({metadata_path}), cần chạy: python hnsw_manager.py")
+    if not loaded.load_system() or loaded.hnsw_mgr.articles is None:
+        raise RuntimeError("load_system() thất bại, xem log phía trên")
+    return loaded
 
-        for doc_id, tf in postings:
-            dl = DOC_LEN[doc_id] if doc_id < len(DOC_LEN) else 0
-            denom = tf + k1 * (1 - b + b * (dl / (AVG_DL + 1e-9)))
-            score = float(idf) * (tf * (k1 + 1) / (denom + 1e-9))
-            scores[doc_id] += score * (1.0 + 0.1 * (qcnt - 1))
 
-    if len(scores) > max_docs:
-        top_items = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:max_docs]
-        scores = defaultdict(float, top_items)
+def install_search_app(loaded: ArticleSearchApp) -> None:
+    """
+    Build keyword index / suggest / date index cho `loaded` rồi thay toàn bộ trạng thái đang phục vụ. Việc thay diễn ra
+    khi SEARCH_POOL không chạy tác vụ nào (exclusive), nên một request không bao giờ dùng lẫn index cũ và mới.
+    """
+    global search_app, KW_INDEX, SUGGEST, DATE_INDEX, DOC_PAYLOAD
+
+    articles = loaded.hnsw_mgr.articles
+    kw_index = build_keyword_index(articles)
+    print(
+        f"Keyword index built: {kw_index.n_docs} docs, {kw_index.vocab_size()} terms, "
+        f"{len(kw_index.doc_ids)} postings ({kw_index.memory_bytes() / 2 ** 20:.1f} MB)"
+    )
+    suggest = build_suggest_index(articles, kw_index)
+    print(f"Suggest index built: {len(suggest)} cụm ({suggest.memory_bytes() / 2 ** 20:.1f} MB)")
+    date_index = DateIndex(loaded.hnsw_mgr.timestamps)
+    LOAD_STATE["prefault"] = prefault_index(loaded.hnsw_mgr)
+
+    with SEARCH_POOL.exclusive():
+        KW_INDEX, SUGGEST, DATE_INDEX = kw_index, suggest, date_index
+        DOC_PAYLOAD = [None] * len(articles)
+        search_app = loaded
+
+
+def load_search_app() -> Optional[ArticleSearchApp]:
+    """Load index + keyword index + suggest; lỗi được ghi vào LOAD_STATE (server vẫn chạy nhưng /healthz báo lỗi)."""
+    t0 = time.perf_counter()
+    try:
+        loaded = open_search_app()
+        print("Hệ thống tìm kiếm đã được load thành công!")
+        install_search_app(loaded)
+    except Exception as e:
+        traceback.print_exc()
+        print(f"Lỗi khi load hệ thống: {e}")
+        LOAD_STATE.update(status="failed", error=f"{type(e).__name__}: {e}", load_s=round(time.perf_counter() - t0, 3))
+        return None
 
-    return dict(scores)
+    LOAD_STATE.update(status="loaded", load_s=round(time.perf_counter() - t0, 3))
+    return loaded
 
 
-def normalize_scores(d: Dict[int, float]) -> Dict[int, float]:
-    if not d:
-        return {}
-    vals = list(d.values())
-    mn, mx = min(vals), max(vals)
-    if mx - mn < 1e-9:
-        return {k: 0.0 for k in d}
-    return {k: (v - mn) / (mx - mn) for k, v in d.items()}
+search_app: Optional[ArticleSearchApp] = None
+INDEX_SIGNATURE = index_signature(INDEX_DIR)  # trước khi load: file bị ghi trong lúc load vẫn được phát hiện
+load_search_app()
 
 
 # -----------------------
-# Load hệ thống
+# Nạp lại index khi build/merge ở process khác ghi đè article_index
 # -----------------------
-try:
-    search_app = ArticleSearchApp()
-    search_app.load_system()
-    print("Hệ thống tìm kiếm đã được load thành công!")
-
-    if (
-        getattr(search_app, "hnsw_mgr", None) is not None
-        and getattr(search_app.hnsw_mgr, "articles", None) is not None
-    ):
-        build_keyword_index(search_app.hnsw_mgr.articles)
-        print(f"Keyword index built: {N_DOCS} docs, {len(KW_POSTINGS)} terms")
-    else:
-        print("Không build keyword index vì thiếu articles")
-except Exception as e:
-    print(f"Lỗi khi load hệ thống: {e}")
-    search_app = None
+# Cứ SEARCH_RELOAD_INTERVAL giây (0 = tắt) so mtime/kích thước các file trong thư mục index; file đã đổi và không đổi
+# thêm trong một chu kỳ (đã ghi xong) thì load bản mới ở thread nền rồi thay bản đang phục vụ. generation của bản mới
+# khác nên cache kết quả và session phân trang cũ tự hết hiệu lực. Load lỗi: giữ bản đang phục vụ, báo ở /healthz.
+RELOAD_INTERVAL = float(os.environ.get("SEARCH_RELOAD_INTERVAL", "30"))
+RELOAD_STATE: Dict[str, Any] = {"reloads": 0, "last_reload": None, "error": None}
+
+
+def reload_search_app(signature: Optional[Tuple[Tuple[str, int, int], ...]] = None) -> bool:
+    """Nạp lại index và thay bản đang phục vụ; thành công thì ghi nhận `signature` (chữ ký thư mục index đã nạp)."""
+    global INDEX_SIGNATURE
+    t0 = time.perf_counter()
+    print(f"Index trong {INDEX_DIR} đã thay đổi, đang nạp lại...")
+    try:
+        loaded = open_search_app()
+        install_search_app(loaded)
+    except Exception as e:
+        traceback.print_exc()
+        RELOAD_STATE.update(error=f"{type(e).__name__}: {e}")
+        return False
+    if signature is not None:
+        INDEX_SIGNATURE = signature
+    seconds = round(time.perf_counter() - t0, 3)
+    LOAD_STATE.update(status="loaded", error=None, load_s=seconds)
+    RELOAD_STATE.update(reloads=RELOAD_STATE["reloads"] + 1, last_reload=time.strftime("%Y-%m-%d %H:%M:%S"), error=None)
+    print(f"Đã nạp lại index sau {seconds}s, generation={loaded.hnsw_mgr.generation}")
+    return True
+
+
+def poll_index(pending):
+    """
+    Một lượt kiểm tra thư mục index: (chữ ký cần nạp hoặc None, pending cho lượt sau). Chữ ký chỉ được trả khi
+    đã đổi và giữ nguyên từ lượt trước; nạp lỗi (INDEX_SIGNATURE không đổi) thì lượt sau thử lại.
+    """
+    signature = index_signature(INDEX_DIR)
+    if signature == INDEX_SIGNATURE:
+        return None, None
+    if signature != pending:
+        return None, signature  # còn đang ghi (metadata trước, embeddings/index sau): chờ thêm một chu kỳ
+    return signature, signature
+
+
+def watch_index(stop: threading.Event) -> None:
+    """Thread nạp lại index của server một process (serve_prefork.py tắt thread này, nạp lại ở process chính)."""
+    pending = None
+    while not stop.wait(RELOAD_INTERVAL):
+        signature, pending = poll_index(pending)
+        if signature is not None:
+            reload_search_app(signature)
 
 
 # -----------------------
@@ -298,8 +567,15 @@ async def home(request: Request):
     .search-row { display:flex; gap: 12px; align-items:center; }
     .search-box {
       flex: 1; background:white; border-radius: 999px; padding: 10px 14px; display:flex; align-items:center; gap: 10px;
-      box-shadow: 0 2px 10px rgba(0,0,0,0.10);
+      box-shadow: 0 2px 10px rgba(0,0,0,0.10); position: relative;
     }
+    .suggest-box {
+      position:absolute; top: calc(100% + 6px); left: 14px; right: 14px; z-index: 10;
+      background:white; border-radius: 12px; box-shadow: 0 4px 14px rgba(0,0,0,0.15);
+      overflow:hidden; display:none;
+    }
+    .suggest-item { padding: 9px 14px; cursor:pointer; color:#3c4043; }
+    .suggest-item:hover, .suggest-item.active { background:#e8f0fe; color:#1a73e8; }
     .search-icon { color:#5f6368; }
     #query { flex:1; border:none; outline:none; font-size: 1.08rem; padding: 6px 0; color:#333; }
     .search-btn {
@@ -361,6 +637,12 @@ async def home(request: Request):
     .badge { display:inline-block; background:#e8f0fe; color:#1a73e8; padding: 5px 10px; border-radius: 999px; font-size: 0.85rem; font-weight: 700; margin-top: 12px; }
 
     .empty-state { text-align:center; padding: 38px 18px; color:#5f6368; }
+    .more-btn {
+      display:block; margin: 14px auto 0; padding: 10px 22px;
+      border: 1px solid #dadce0; border-radius: 999px; background:#fff;
+      color:#1a73e8; font-weight: 700; cursor: pointer;
+    }
+    .more-btn:hover { background:#f1f6fe; }
     .empty-state i { font-size: 3rem; margin-bottom: 12px; color:#dadce0; }
     .error-state { text-align:center; padding: 18px; background:#ffeaa7; border-radius: 10px; margin-bottom: 16px; color:#e17055; }
 
@@ -391,6 +673,7 @@ async def home(request: Request):
         <div class="search-box">
           <i class="fas fa-search search-icon"></i>
           <input id="query" type="text" placeholder="Nhập từ khoá tìm kiếm..." autocomplete="off">
+          <div class="suggest-box" id="suggestBox"></div>
         </div>
         <button class="search-btn" onclick="doSearch()">Tìm kiếm</button>
       </div>
@@ -425,6 +708,16 @@ async def home(request: Request):
             <option value="50">50</option>
           </select>
         </div>
+
+        <div class="control" title="Đa dạng hoá kết quả (MMR): bớt các bản tin gần giống nhau">
+          <i class="fas fa-shuffle"></i>
+          <span>Đa dạng</span>
+          <select id="diversify">
+            <option value="off" selected>Tắt</option>
+            <option value="0.7">Vừa</option>
+            <option value="0.5">Cao</option>
+          </select>
+        </div>
       </div>
 
       <div class="history" id="history">
@@ -522,12 +815,157 @@ async def home(request: Request):
 
     // ---------- search ----------
     let currentAbort = null;
+    // Request của lần search gần nhất + cursor trang kế tiếp (nút "Xem thêm")
+    let lastSearch = null;
+
+    function renderCard(r, scoreLabel) {
+      const title = escapeHtml(r.title);
+      const source = escapeHtml(r.source);
+      const category = escapeHtml(r.category);
+      const summary = escapeHtml(r.summary);
+      const dateText = escapeHtml(r.published || "");
+      const linkRaw = r.link || "";
+      const link = isHttpUrl(linkRaw) ? linkRaw : "";
+
+      return `
+        <div class="card">
+          <h2>${title}</h2>
+          <div class="meta-info">
+            <span><i class="fas fa-newspaper"></i> ${source || "(không rõ nguồn)"}</span>
+            <span><i class="fas fa-tag"></i> ${category || "(không rõ)"}</span>
+            ${dateText ? `<span><i class="fas fa-calendar"></i> ${dateText}</span>` : ""}
+            ${link ? `<span><i class="fas fa-link"></i> <a href="${escapeHtml(link)}" target="_blank" rel="noopener noreferrer">Mở bài gốc</a></span>` : ""}
+            <span><i class="fas fa-layer-group"></i> <a href="#" onclick="showRelated(${Number(r.doc_id)}); return false;">Bài liên quan</a></span>
+          </div>
+          <p>${summary}</p>
+          <span class="badge">${scoreLabel}: ${Number(r.score).toFixed(4)}</span>
+        </div>
+      `;
+    }
+
+    async function showRelated(docId) {
+      if (currentAbort) currentAbort.abort();
+      currentAbort = new AbortController();
+      lastSearch = null;
+
+      try {
+        const response = await fetch(`/related/${docId}?k=10`, { signal: currentAbort.signal });
+        const data = await response.json();
+        if (data.error) throw new Error(`${data.error} ${data.details || ""}`);
+
+        const count = (data.results || []).length;
+        document.getElementById("resultsSub").textContent =
+          `Bài liên quan • ${count} kết quả • Thời gian: ${data.took_ms} ms`;
+        document.getElementById("results").innerHTML = count
+          ? data.results.map(r => renderCard(r, "Độ tương đồng")).join("")
+          : `<div class="empty-state"><i class="fas fa-search"></i><p>Không có bài liên quan</p></div>`;
+        window.scrollTo({ top: 0, behavior: "smooth" });
+      } catch (error) {
+        if (error.name === "AbortError") return;
+        document.getElementById("results").innerHTML = `
+          <div class="error-state">
+            <i class="fas fa-exclamation-triangle"></i>
+            <p><strong>Lỗi:</strong> ${escapeHtml(error.message)}</p>
+          </div>
+        `;
+      }
+    }
+
+    function renderFrame(data, q, mode, sort, topk) {
+      const count = (data.results && Array.isArray(data.results)) ? data.results.length : 0;
+      const serverMs = (data.took_ms !== undefined && data.took_ms !== null) ? Number(data.took_ms) : null;
+      const pending = data.final === false;
+
+      // Hiển thị thời gian xử lý search ở backend
+      document.getElementById("resultsSub").textContent =
+        `Mode: ${mode} • Sort: ${sort} • TopK: ${topk} • ${count} kết quả` +
+        (serverMs !== null ? ` • Thời gian: ${serverMs} ms` : "") +
+        (pending ? " • đang bổ sung kết quả ngữ nghĩa..." : "") +
+        (data.degraded ? " • hệ thống đang tải cao, kết quả rút gọn" : "");
+
+      let html = "";
+      if (data.error) {
+        html = `
+          <div class="error-state">
+            <i class="fas fa-exclamation-triangle"></i>
+            <p><strong>Lỗi:</strong> ${escapeHtml(data.error)}</p>
+            <p>${escapeHtml(data.details || "")}</p>
+          </div>
+        `;
+      } else if (data.results && data.results.length > 0) {
+        const scoreLabel = (mode === "keyword" || data.phase === "keyword") ? "Điểm" : "Độ tương đồng";
+        data.results.forEach(r => { html += renderCard(r, scoreLabel); });
+      } else if (pending) {
+        html = `
+          <div class="empty-state">
+            <i class="fas fa-spinner fa-spin"></i>
+            <p>Đang tìm kiếm...</p>
+          </div>
+        `;
+      } else {
+        html = `
+          <div class="empty-state">
+            <i class="fas fa-search"></i>
+            <p>Không tìm thấy kết quả nào cho "${escapeHtml(q)}"</p>
+            <p>Hãy thử từ khoá khác hoặc đổi mode (Hybrid/Semantic/Keyword)</p>
+          </div>
+        `;
+      }
+
+      document.getElementById("results").innerHTML = html;
+      if (!pending && lastSearch) {
+        lastSearch.cursor = data.next_cursor || null;
+        lastSearch.shown = count;
+        renderMoreButton();
+      }
+    }
+
+    function renderMoreButton() {
+      const old = document.getElementById("moreBtn");
+      if (old) old.remove();
+      if (!lastSearch || !lastSearch.cursor) return;
+      document.getElementById("results").insertAdjacentHTML("beforeend",
+        `<button class="more-btn" id="moreBtn" onclick="loadMore()">Xem thêm</button>`);
+    }
+
+    async function loadMore() {
+      if (!lastSearch || !lastSearch.cursor) return;
+      const btn = document.getElementById("moreBtn");
+      if (btn) { btn.disabled = true; btn.textContent = "Đang tải..."; }
+      try {
+        const response = await fetch("/search", {
+          method: "POST",
+          headers: {"Content-Type": "application/json"},
+          body: JSON.stringify({ ...lastSearch.body, cursor: lastSearch.cursor })
+        });
+        const data = await response.json();
+        if (data.error) throw new Error(data.error);
+
+        const scoreLabel = lastSearch.body.mode === "keyword" ? "Điểm" : "Độ tương đồng";
+        let html = "";
+        (data.results || []).forEach(r => { html += renderCard(r, scoreLabel); });
+        if (btn) btn.remove();
+        document.getElementById("results").insertAdjacentHTML("beforeend", html);
+
+        lastSearch.cursor = data.next_cursor || null;
+        lastSearch.shown += (data.results || []).length;
+        const b = lastSearch.body;
+        document.getElementById("resultsSub").textContent =
+          `Mode: ${b.mode} • Sort: ${b.sort} • TopK: ${b.topk} • ${lastSearch.shown} kết quả` +
+          (data.took_ms !== undefined ? ` • Thời gian: ${Number(data.took_ms)} ms` : "");
+        renderMoreButton();
+      } catch (error) {
+        if (btn) { btn.disabled = false; btn.textContent = "Xem thêm"; }
+        console.error("Load more error:", error);
+      }
+    }
 
     async function doSearch() {
       const q = document.getElementById("query").value.trim();
       const mode = document.getElementById("mode").value;
       const sort = document.getElementById("sort").value;
       const topk = Number(document.getElementById("topk").value || 10);
+      const diversify = document.getElementById("diversify").value;
 
       if (!q) {
         alert("Vui lòng nhập từ khoá tìm kiếm!");
@@ -535,6 +973,9 @@ async def home(request: Request):
       }
 
       addToHistory(q);
+      clearTimeout(suggestTimer);
+      suggestSeq++;
+      hideSuggest();
 
       // Abort previous request
       if (currentAbort) currentAbort.abort();
@@ -550,11 +991,18 @@ async def home(request: Request):
         </div>
       `;
 
+      const body = {
+        query: q, topk: topk, mode: mode, sort: sort,
+        diversify: diversify !== "off",
+        mmr_lambda: diversify !== "off" ? Number(diversify) : 0.7
+      };
+      lastSearch = { body: body, cursor: null, shown: 0 };
+
       try {
-        const response = await fetch("/search", {
+        const response = await fetch("/search/stream", {
           method: "POST",
           headers: {"Content-Type": "application/json"},
-          body: JSON.stringify({ query: q, topk: topk, mode: mode, sort: sort }),
+          body: JSON.stringify(body),
           signal: currentAbort.signal
         });
 
@@ -563,62 +1011,22 @@ async def home(request: Request):
           throw new Error(`HTTP error! status: ${response.status}, details: ${errorText}`);
         }
 
-        const data = await response.json();
-
-        const count = (data.results && Array.isArray(data.results)) ? data.results.length : 0;
-        const serverMs = (data.took_ms !== undefined && data.took_ms !== null) ? Number(data.took_ms) : null;
-
-        // Hiển thị thời gian xử lý search ở backend
-        document.getElementById("resultsSub").textContent =
-          `Mode: ${mode} • Sort: ${sort} • TopK: ${topk} • ${count} kết quả` +
-          (serverMs !== null ? ` • Thời gian: ${serverMs} ms` : "");
-
-        let html = "";
-        if (data.error) {
-          html = `
-            <div class="error-state">
-              <i class="fas fa-exclamation-triangle"></i>
-              <p><strong>Lỗi:</strong> ${escapeHtml(data.error)}</p>
-              <p>${escapeHtml(data.details || "")}</p>
-            </div>
-          `;
-        } else if (data.results && data.results.length > 0) {
-          data.results.forEach(r => {
-            const title = escapeHtml(r.title);
-            const source = escapeHtml(r.source);
-            const category = escapeHtml(r.category);
-            const summary = escapeHtml(r.summary);
-            const dateText = escapeHtml(r.published || "");
-            const linkRaw = r.link || "";
-            const link = isHttpUrl(linkRaw) ? linkRaw : "";
-            const scoreLabel = (mode === "keyword") ? "Điểm" : "Độ tương đồng";
-
-            html += `
-              <div class="card">
-                <h2>${title}</h2>
-                <div class="meta-info">
-                  <span><i class="fas fa-newspaper"></i> ${source || "(không rõ nguồn)"}</span>
-                  <span><i class="fas fa-tag"></i> ${category || "(không rõ)"}</span>
-                  ${dateText ? `<span><i class="fas fa-calendar"></i> ${dateText}</span>` : ""}
-                  ${link ? `<span><i class="fas fa-link"></i> <a href="${escapeHtml(link)}" target="_blank" rel="noopener noreferrer">Mở bài gốc</a></span>` : ""}
-                </div>
-                <p>${summary}</p>
-                <span class="badge">${scoreLabel}: ${Number(r.score).toFixed(4)}</span>
-              </div>
-            `;
-          });
-        } else {
-          html = `
-            <div class="empty-state">
-              <i class="fas fa-search"></i>
-              <p>Không tìm thấy kết quả nào cho "${escapeHtml(q)}"</p>
-              <p>Hãy thử từ khoá khác hoặc đổi mode (Hybrid/Semantic/Keyword)</p>
-            </div>
-          `;
+        // NDJSON: mỗi dòng một frame; hybrid có frame "keyword" trước rồi frame "fused" cuối cùng
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+          const { value, done } = await reader.read();
+          if (value) buffer += decoder.decode(value, { stream: true });
+          let nl;
+          while ((nl = buffer.indexOf("\n")) >= 0) {
+            const line = buffer.slice(0, nl).trim();
+            buffer = buffer.slice(nl + 1);
+            if (line) renderFrame(JSON.parse(line), q, mode, sort, topk);
+          }
+          if (done) break;
         }
 
-        document.getElementById("results").innerHTML = html;
-
       } catch (error) {
         if (error.name === "AbortError") return;
 
@@ -636,8 +1044,67 @@ async def home(request: Request):
       }
     }
 
+    // Gợi ý khi gõ (/suggest), chọn bằng chuột hoặc mũi tên lên/xuống
+    let suggestTimer = null;
+    let suggestSeq = 0;
+    let suggestActive = -1;
+
+    function hideSuggest() {
+      const box = document.getElementById("suggestBox");
+      box.style.display = "none";
+      box.innerHTML = "";
+      suggestActive = -1;
+    }
+
+    async function loadSuggest() {
+      const q = document.getElementById("query").value.trim();
+      const seq = ++suggestSeq;
+      if (!q) { hideSuggest(); return; }
+      try {
+        const response = await fetch(`/suggest?q=${encodeURIComponent(q)}&k=8`);
+        const data = await response.json();
+        if (seq !== suggestSeq) return;  // đã có lần gõ mới hơn
+        const items = data.suggestions || [];
+        if (!items.length) { hideSuggest(); return; }
+        const box = document.getElementById("suggestBox");
+        box.innerHTML = items.map(s =>
+          `<div class="suggest-item" onmousedown="useSuggest(${escapeHtml(JSON.stringify(s.text))})">${escapeHtml(s.text)}</div>`
+        ).join("");
+        box.style.display = "block";
+        suggestActive = -1;
+      } catch (error) {
+        hideSuggest();
+      }
+    }
+
+    function useSuggest(text) {
+      document.getElementById("query").value = text;
+      hideSuggest();
+      doSearch();
+    }
+
+    function moveSuggest(step) {
+      const items = document.querySelectorAll("#suggestBox .suggest-item");
+      if (!items.length) return;
+      suggestActive = (suggestActive + step + items.length) % items.length;
+      items.forEach((el, i) => el.classList.toggle("active", i === suggestActive));
+      document.getElementById("query").value = items[suggestActive].textContent;
+    }
+
+    const queryInput = document.getElementById("query");
+    queryInput.addEventListener("input", function() {
+      clearTimeout(suggestTimer);
+      suggestTimer = setTimeout(loadSuggest, 60);
+    });
+    queryInput.addEventListener("keydown", function(event) {
+      if (event.key === "ArrowDown") { event.preventDefault(); moveSuggest(1); }
+      else if (event.key === "ArrowUp") { event.preventDefault(); moveSuggest(-1); }
+      else if (event.key === "Escape") hideSuggest();
+    });
+    queryInput.addEventListener("blur", hideSuggest);
+
     // Enter để search
-    document.getElementById("query").addEventListener("keypress", function(event) {
+    queryInput.addEventListener("keypress", function(event) {
       if (event.key === "Enter") doSearch();
     });
 
@@ -651,27 +1118,420 @@ async def home(request: Request):
 
 
 # -----------------------
-# Numpy conversion
+# Search endpoint
 # -----------------------
-def convert_numpy_types(obj: Any) -> Any:
-    if isinstance(obj, (np.float32, np.float64)):
-        return float(obj)
-    if isinstance(obj, (np.int32, np.int64)):
-        return int(obj)
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    if isinstance(obj, dict):
-        return {k: convert_numpy_types(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [convert_numpy_types(x) for x in obj]
-    return obj
+def search_cache_key(req: SearchRequest, with_cursor: bool = True) -> str:
+    params = req.model_dump(mode="json", exclude=None if with_cursor else {"cursor"})
+    params["query"] = normalize_query(req.query)
+    params["mode"] = (req.mode or "hybrid").lower()
+    params["sort"] = (req.sort or "relevance").lower()
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Response với body JSON encode sẵn (fast_json), bỏ qua jsonable_encoder của FastAPI."""
+    return Response(content=fast_json.dumps(content), status_code=status_code, headers=headers, media_type="application/json")
+
+
+def queue_full() -> bool:
+    """Hàng đợi thread pool đã dài quá SEARCH_MAX_QUEUE: từ chối ngay thay vì để request chờ tới timeout."""
+    if MAX_QUEUE > 0 and SEARCH_POOL.queued >= MAX_QUEUE:
+        ADMISSION_EVENTS.inc(("queue", "reject"))
+        return True
+    return False
+
+
+def overloaded_content(e: Overloaded, t0: float) -> Dict[str, Any]:
+    took_ms = int((time.perf_counter() - t0) * 1000)
+    return {"error": "Hệ thống đang quá tải, vui lòng thử lại", "details": str(e), "resource": e.resource,
+            "retry_after": e.retry_after, "took_ms": took_ms}
+
+
+def overloaded_response(e: Overloaded, t0: float) -> Response:
+    return json_response(overloaded_content(e, t0), 503, {"Retry-After": str(e.retry_after)})
 
 
-# -----------------------
-# Search endpoint
-# -----------------------
 @app.post("/search")
 async def search(req: SearchRequest):
+    t0 = time.perf_counter()
+    mode = (req.mode or "hybrid").lower()
+    generation = search_app.hnsw_mgr.generation if search_app is not None else None
+    key = search_cache_key(req)
+    cached = RESULT_CACHE.get(key, generation)
+    if cached is not None:
+        record_search(mode, "cached", time.perf_counter() - t0, {})
+        remember_query(req, cached)
+        return json_response({**cached, "took_ms": int((time.perf_counter() - t0) * 1000), "cached": True})
+
+    timings: Dict[str, float] = {}
+    try:
+        if queue_full():
+            raise Overloaded("queue", RETRY_AFTER_S)
+        response = await SEARCH_POOL.run(run_search, req, timings)
+    except Overloaded as e:
+        record_search(mode, "shed", time.perf_counter() - t0, timings)
+        return overloaded_response(e, t0)
+    # Kết quả giảm cấp không vào cache: hết quá tải thì request sau được kết quả đầy đủ
+    if "error" not in response and "degraded" not in response:
+        RESULT_CACHE.put(key, response, generation)
+    record_search(mode, search_status(response), time.perf_counter() - t0, timings)
+    remember_query(req, response)
+    return json_response(response)
+
+
+def remember_query(req: SearchRequest, response: Dict[str, Any]) -> None:
+    """Query có kết quả (trang đầu) được tính vào độ phổ biến của /suggest."""
+    if not req.cursor and response.get("results"):
+        SUGGEST.record(req.query)
+
+
+def ndjson_frame(response: Dict[str, Any], phase: str, final: bool, phase_ms: float) -> bytes:
+    frame = {**response, "phase": phase, "final": final, "phase_ms": round(phase_ms, 3)}
+    return fast_json.dumps(frame) + b"\n"
+
+
+def keyword_phase(
+    req: SearchRequest, query: str, t0: float, timings: Dict[str, float]
+) -> Tuple[Scores, Dict[str, Any]]:
+    keyword_scores = keyword_scores_for(query, timings, allowed=filter_mask(req))
+    return keyword_scores, rank_results(req, combine_scores(req, "keyword", NO_SCORES, keyword_scores), t0, paginate=False)
+
+
+def fused_phase(
+    req: SearchRequest, query: str, keyword_scores: Scores, t0: float, timings: Dict[str, float]
+) -> Dict[str, Any]:
+    degraded: Dict[str, str] = {}
+    allowed = filter_mask(req)
+    semantic_scores, rerank_info = semantic_scores_for(req, query, timings, degraded, allowed)
+    if "keyword" in degraded.values():
+        response = rank_results(req, combine_scores(req, "keyword", NO_SCORES, keyword_scores), t0, timings, deep=True)
+        response["degraded"] = degraded
+        return response
+    # Top BM25 đã có từ frame keyword: chỉ cần tra thêm điểm của ứng viên ANN
+    t = time.perf_counter()
+    keyword_scores = bm25_candidate_scores(
+        query, semantic_scores[0], top_scores(keyword_scores, HYBRID_KEYWORD_CANDIDATES), allowed
+    )
+    timings["bm25"] = timings.get("bm25", 0.0) + time.perf_counter() - t
+    combined, fusion_info = fuse(req, "hybrid", semantic_scores, keyword_scores, timings)
+    response = rank_results(req, combined, t0, timings)
+    if rerank_info is not None and len(combined[0]):
+        response["rerank"] = rerank_info
+    if fusion_info is not None:
+        response["fusion"] = fusion_info
+    if degraded:
+        response["degraded"] = degraded
+    return response
+
+
+@app.post("/search/stream")
+async def search_stream(req: SearchRequest):
+    """
+    /search dạng NDJSON (mỗi dòng một frame JSON, có phase, final, phase_ms, took_ms).
+    Hybrid: frame "keyword" (chỉ BM25, không chờ model) gửi ngay, rồi frame "fused" khi có điểm semantic.
+    Mode khác hoặc trúng cache: một frame duy nhất.
+    """
+    t0 = time.perf_counter()
+    generation = search_app.hnsw_mgr.generation if search_app is not None else None
+    key = search_cache_key(req)
+    query = (req.query or "").strip()
+    mode = (req.mode or "hybrid").lower()
+
+    cached = RESULT_CACHE.get(key, generation)
+    if cached is None and queue_full():
+        record_search(mode, "shed", time.perf_counter() - t0, {})
+        return overloaded_response(Overloaded("queue", RETRY_AFTER_S), t0)
+
+    async def frames():
+        if cached is not None:
+            took_ms = int((time.perf_counter() - t0) * 1000)
+            record_search(mode, "cached", time.perf_counter() - t0, {})
+            remember_query(req, cached)
+            yield ndjson_frame({**cached, "took_ms": took_ms, "cached": True}, "cached", True, took_ms)
+            return
+
+        timings: Dict[str, float] = {}
+        try:
+            if search_app is None or not query or mode != "hybrid" or req.cursor:
+                response = await SEARCH_POOL.run(run_search, req, timings)
+                if "error" not in response and "degraded" not in response:
+                    RESULT_CACHE.put(key, response, generation)
+                record_search(mode, search_status(response), time.perf_counter() - t0, timings)
+                remember_query(req, response)
+                yield ndjson_frame(response, mode, True, (time.perf_counter() - t0) * 1000)
+                return
+
+            t_phase = time.perf_counter()
+            keyword_scores, first = await SEARCH_POOL.run(keyword_phase, req, query, t0, timings)
+            yield ndjson_frame(first, "keyword", False, (time.perf_counter() - t_phase) * 1000)
+
+            t_phase = time.perf_counter()
+            response = await SEARCH_POOL.run(fused_phase, req, query, keyword_scores, t0, timings)
+            if "degraded" not in response:
+                RESULT_CACHE.put(key, response, generation)
+            record_search(mode, search_status(response), time.perf_counter() - t0, timings)
+            remember_query(req, response)
+            yield ndjson_frame(response, "fused", True, (time.perf_counter() - t_phase) * 1000)
+        except Overloaded as e:
+            # Header đã gửi (200): báo quá tải trong frame cuối
+            record_search(mode, "shed", time.perf_counter() - t0, timings)
+            yield ndjson_frame(overloaded_content(e, t0), "error", True, 0.0)
+        except Exception as e:
+            traceback.print_exc()
+            record_search(mode, "error", time.perf_counter() - t0, timings)
+            took_ms = int((time.perf_counter() - t0) * 1000)
+            yield ndjson_frame({"error": "Lỗi khi tìm kiếm", "details": str(e), "took_ms": took_ms}, "error", True, 0.0)
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
+# Thread đang warm-up: luôn chờ chỗ (không giảm cấp, không Overloaded) để warm-up không thất bại vì traffic thật
+ADMISSION_EXEMPT = threading.local()
+
+
+def admit(resource: str, degraded: Optional[Dict[str, str]]) -> bool:
+    """
+    Lấy một chỗ của tài nguyên (True: gọi LIMITERS[resource].release() khi xong). Kín chỗ thì áp dụng chính sách:
+    reject -> Overloaded; keyword/reduce -> ghi vào degraded và trả False (chạy tiếp không giữ chỗ).
+    """
+    action = "wait" if getattr(ADMISSION_EXEMPT, "active", False) else ADMISSION_POLICY[resource]
+    if LIMITERS[resource].acquire(-1 if action == "wait" else None):
+        return True
+    ADMISSION_EVENTS.inc((resource, action))
+    if action == "reject":
+        raise Overloaded(resource, RETRY_AFTER_S)
+    if degraded is not None:
+        degraded[resource] = action
+    return False
+
+
+def semantic_scores_for(
+    req: SearchRequest, query: str, timings: Optional[Dict[str, float]] = None,
+    degraded: Optional[Dict[str, str]] = None, allowed: Optional[np.ndarray] = None, depth: int = 0,
+) -> Tuple[Scores, Optional[Dict[str, Any]]]:
+    """
+    Embed query + k-NN: (doc_ids, 1 / (1 + distance)) và thông tin rerank (nếu bật); allowed: allow-list của bộ lọc.
+    depth: lấy sâu cho phân trang (page_depth) - ít nhất chừng đó ứng viên ANN; 0 = như request thường.
+    Model / ANN kín chỗ với chính sách keyword: trả NO_SCORES (degraded có "keyword"), caller chỉ dùng BM25.
+    """
+    topk = int(req.topk or 10)
+    k_sem = max(topk * 6, 60, depth)
+    use_rerank = RERANK_CANDIDATES > 0 if req.rerank is None else req.rerank
+    n_rerank = max(RERANK_CANDIDATES, 2 * k_sem) if use_rerank else 0
+    t = time.perf_counter()
+    if not admit("encode", degraded):
+        return NO_SCORES, None
+    try:
+        query_vector = search_app.hnsw_mgr.embedder.embed_query(query)
+    finally:
+        LIMITERS["encode"].release()
+    t_embed = time.perf_counter()
+    slot = admit("ann", degraded)
+    if not slot:
+        if ADMISSION_POLICY["ann"] == "keyword":
+            return NO_SCORES, None
+        # reduce: ef là tham số chung của cả index (hnswlib set_ef) nên không hạ riêng cho request này được;
+        # thay vào đó chờ chỗ rồi lấy ít ứng viên hơn và bỏ rerank - search rẻ hơn nhưng vẫn trong giới hạn ANN
+        k_sem, n_rerank = topk, 0
+        LIMITERS["ann"].acquire(-1)
+    try:
+        labels, distances, rerank_info = search_app.hnsw_mgr.search_vectors(
+            query_vector, k=k_sem, rerank=n_rerank, allowed=allowed
+        )
+    finally:
+        LIMITERS["ann"].release()
+    if timings is not None:
+        timings["embed"] = t_embed - t
+        timings["ann"] = time.perf_counter() - t_embed
+
+    doc_ids = np.asarray(labels, dtype=np.int64).ravel()
+    sims = 1.0 / (1.0 + np.asarray(distances, dtype=np.float64).ravel())
+    return phrase_filter(query, (doc_ids, sims)), rerank_info
+
+
+def fusion_method(req: SearchRequest) -> str:
+    return "rrf" if (req.fusion or FUSION).lower() == "rrf" else "linear"
+
+
+def combine_scores(req: SearchRequest, mode: str, semantic_scores: Scores, keyword_scores: Scores) -> Scores:
+    if mode == "semantic":
+        doc_ids, scores = semantic_scores
+    elif mode == "keyword":
+        return keyword_scores
+    elif fusion_method(req) == "rrf":
+        # Điểm RRF chỉ phản ánh thứ hạng, không lọc theo MIN_SIM
+        return fuse_rrf(*semantic_scores, *keyword_scores, k=RRF_K)
+    else:
+        # Điểm keyword chuẩn hoá theo điểm thấp nhất trong mọi doc khớp, không phụ thuộc số ứng viên BM25 được lấy
+        kw_floor = KW_INDEX.score_floor(query_tokens(req.query)) if len(keyword_scores[0]) else None
+        doc_ids, scores = fuse_linear(*semantic_scores, *keyword_scores, w_sem=0.55, w_kw=0.45, kw_floor=kw_floor)
+
+    MIN_SIM = 0.35
+    keep = scores >= MIN_SIM
+    return doc_ids[keep], scores[keep]
+
+
+def page_depth(req: SearchRequest, offset: int = 0) -> int:
+    """Số kết quả xếp hạng sẵn khi phân trang (ít nhất tới hết trang đang lấy)."""
+    return max(PAGE_DEPTH, offset + int(req.topk or 10))
+
+
+def page_from_session(session_id: str, items: List[Item], offset: int, topk: int, t0: float) -> Dict[str, Any]:
+    """Trang [offset, offset + topk) cắt từ danh sách đã xếp hạng trong session (không tính lại gì)."""
+    page, next_cursor = PAGE_SESSIONS.page(session_id, items, offset, topk)
+    response = {"results": [format_result(doc_id, score) for doc_id, score in page],
+                "took_ms": int((time.perf_counter() - t0) * 1000)}
+    if next_cursor is not None:
+        response["next_cursor"] = next_cursor
+    return response
+
+
+def rank_results(
+    req: SearchRequest, combined: Scores, t0: float, timings: Optional[Dict[str, float]] = None,
+    offset: int = 0, paginate: bool = True, deep: bool = False, served: Optional[Tuple[str, List[Item]]] = None,
+) -> Dict[str, Any]:
+    """
+    Facet, sắp xếp, gộp bài trùng, MMR và định dạng kết quả từ điểm đã kết hợp.
+    paginate: xếp hạng tới page_depth, trả trang [offset, offset + topk) và lưu danh sách vào session (response có
+    next_cursor) nếu còn trang sau. deep: ứng viên đã lấy sâu (hết danh sách là hết kết quả).
+    served: (session_id, các bài đã trả) khi lấy sâu cho session nông - giữ nguyên phần đó, lưu đè cùng session.
+    """
+    doc_ids, scores = combined
+    if not len(doc_ids):
+        return {"results": [], "took_ms": int((time.perf_counter() - t0) * 1000)}
+
+    t_rank = time.perf_counter()
+
+    sort = (req.sort or "relevance").lower()
+    topk = int(req.topk or 10)
+    articles = search_app.hnsw_mgr.articles
+    timestamps = search_app.hnsw_mgr.timestamps
+
+    # Bộ lọc (nguồn, chuyên mục, ngày...) đã áp lúc lấy ứng viên (filter_mask)
+    keep = (doc_ids >= 0) & (doc_ids < len(articles))
+    doc_ids, scores = doc_ids[keep], scores[keep]
+
+    facet_counts: Optional[Dict[str, Any]] = None
+    if req.facets and search_app.hnsw_mgr.facets is not None:
+        facet_counts = search_app.hnsw_mgr.facets.facets(doc_ids, limit=20)
+
+    if sort == "newest" and not req.diversify:
+        order = newest_first(doc_ids, scores, timestamps)
+    else:
+        order = np.argsort(-scores, kind="stable")
+    items: List[Tuple[int, float]] = list(zip(doc_ids[order].tolist(), scores[order].tolist()))
+    depth = page_depth(req, offset) if paginate else topk
+    # MMR: tập ứng viên giữ nguyên như khi không phân trang; các trang sau đi tiếp thứ tự chọn của MMR trên tập đó
+    limit = max(offset + topk, MMR_MAX_CANDIDATES) if req.diversify else depth
+
+    # Bài đăng lại ở nhiều báo (cùng canonical_id, xem near_duplicates.py): chỉ giữ bản xếp hạng cao nhất
+    if SEARCH_DEDUP if req.dedup is None else req.dedup:
+        seen_canonical = set()
+        deduped: List[Tuple[int, float]] = []
+        for item in items:
+            canonical_id = articles[item[0]].get("canonical_id", item[0])
+            if canonical_id in seen_canonical:
+                continue
+            seen_canonical.add(canonical_id)
+            deduped.append(item)
+            if len(deduped) >= limit:
+                break
+        items = deduped
+    else:
+        items = items[:limit]
+
+    # MMR trên tập ứng viên (đã giới hạn), dùng embeddings đã lưu - không gọi model
+    mmr_info: Optional[Dict[str, Any]] = None
+    if req.diversify and len(items) > 1:
+        t_mmr = time.perf_counter()
+        ids = np.fromiter((doc_id for doc_id, _ in items), dtype=np.int64, count=len(items))
+        relevance = np.fromiter((score for _, score in items), dtype=np.float32, count=len(items))
+        picked = mmr_select(relevance, search_app.hnsw_mgr.all_embeddings[ids], depth, lam=req.mmr_lambda)
+        if sort == "newest":
+            # Chọn đa dạng xong mới sắp theo ngày, trong phạm vi từng trang
+            picked = np.concatenate([
+                chunk[newest_first(ids[chunk], relevance[chunk], timestamps)]
+                for chunk in np.array_split(picked, range(topk, len(picked), topk))
+            ])
+        items = [items[i] for i in picked]
+        mmr_info = {
+            "candidates": len(ids),
+            "lambda": req.mmr_lambda,
+            "mmr_ms": round((time.perf_counter() - t_mmr) * 1000, 3),
+        }
+
+    session_id = None
+    if served is not None:
+        session_id, served_items = served
+        items = extend_served(served_items, items, depth)
+    next_cursor = None
+    if paginate and len(items) > offset + topk:
+        key = search_cache_key(req, with_cursor=False)
+        session_id = PAGE_SESSIONS.save(key, items, deep, search_app.hnsw_mgr.generation, session_id)
+        next_cursor = encode_cursor(session_id, offset + topk)
+
+    t_format = time.perf_counter()
+    results = [format_result(doc_id, score) for doc_id, score in items[offset:offset + topk]]
+    if timings is not None:
+        timings["rank"] = t_format - t_rank
+        timings["format"] = time.perf_counter() - t_format
+
+    took_ms = int((time.perf_counter() - t0) * 1000)
+    response = {"results": results, "took_ms": took_ms}
+    if next_cursor is not None:
+        response["next_cursor"] = next_cursor
+    if mmr_info is not None:
+        response["mmr"] = mmr_info
+    if facet_counts is not None:
+        response["facets"] = facet_counts
+    return response
+
+
+def keyword_scores_for(query: str, timings: Optional[Dict[str, float]] = None,
+                       semantic_ids: Optional[np.ndarray] = None, allowed: Optional[np.ndarray] = None) -> Scores:
+    """
+    Keyword mode: top 2000 BM25. Hybrid (có semantic_ids): top HYBRID_KEYWORD_CANDIDATES BM25 + điểm của ứng viên ANN
+    - doc ngoài hai tập này không thể vượt ngưỡng MIN_SIM của linear fusion trừ khi nằm trong top BM25.
+    """
+    t = time.perf_counter()
+    admit("bm25", None)
+    try:
+        if semantic_ids is None:
+            keyword_scores = bm25_lite_scores(query, allowed=allowed)
+        else:
+            top = bm25_lite_scores(query, max_docs=HYBRID_KEYWORD_CANDIDATES, allowed=allowed)
+            keyword_scores = bm25_candidate_scores(query, semantic_ids, top, allowed)
+    finally:
+        LIMITERS["bm25"].release()
+    if timings is not None:
+        timings["bm25"] = time.perf_counter() - t
+    return keyword_scores
+
+
+def fuse(req: SearchRequest, mode: str, semantic_scores: Scores, keyword_scores: Scores,
+         timings: Optional[Dict[str, float]] = None) -> Tuple[Scores, Optional[Dict[str, Any]]]:
+    """Điểm kết hợp và (với hybrid) thông tin fusion trả kèm response: cách gộp, số ứng viên, thời gian."""
+    t = time.perf_counter()
+    combined = combine_scores(req, mode, semantic_scores, keyword_scores)
+    fusion_s = time.perf_counter() - t
+    if timings is not None:
+        timings["fusion"] = fusion_s
+    n_sem, n_kw = len(semantic_scores[0]), len(keyword_scores[0])
+    CANDIDATES_SCORED.inc(("semantic",), n_sem)
+    CANDIDATES_SCORED.inc(("keyword",), n_kw)
+    if mode != "hybrid":
+        return combined, None
+    return combined, {
+        "method": fusion_method(req),
+        "semantic_candidates": n_sem,
+        "keyword_candidates": n_kw,
+        "fused_candidates": len(combined[0]),
+        "fusion_ms": round(fusion_s * 1000, 3),
+    }
+
+
+def run_search(req: SearchRequest, timings: Optional[Dict[str, float]] = None, paginate: bool = True) -> Dict[str, Any]:
+    """paginate=False: chỉ xếp hạng top-k, không có next_cursor và không tạo session phân trang."""
     t0 = time.perf_counter()
     try:
         if search_app is None:
@@ -688,96 +1548,229 @@ async def search(req: SearchRequest):
             return {"results": [], "took_ms": took_ms}
 
         mode = (req.mode or "hybrid").lower()
-        sort = (req.sort or "relevance").lower()
-        topk = int(req.topk or 10)
 
-        # Semantic candidates
-        semantic_scores: Dict[int, float] = {}
+        # Trang sau: cắt lát danh sách đã xếp hạng trong session. Session nông đã hết -> lấy sâu một lần, giữ các
+        # bài đã trả; session không còn -> tính lại từ đầu (lấy sâu) với offset trong cursor
+        offset = 0
+        depth = 0
+        served: Optional[Tuple[str, List[Item]]] = None
+        if req.cursor:
+            try:
+                session_id, offset = decode_cursor(req.cursor)
+            except ValueError as e:
+                took_ms = int((time.perf_counter() - t0) * 1000)
+                return {"error": "Cursor không hợp lệ", "details": str(e), "took_ms": took_ms}
+            topk = int(req.topk or 10)
+            session = PAGE_SESSIONS.get(session_id, search_cache_key(req, with_cursor=False), search_app.hnsw_mgr.generation)
+            if session is not None and PAGE_SESSIONS.can_serve(session, offset, topk):
+                return page_from_session(session_id, session["items"], offset, topk, t0)
+            if session is not None:
+                served = (session_id, session["items"][:offset])
+            depth = page_depth(req, offset)
+
+        # Semantic candidates (model / ANN quá tải có thể hạ xuống keyword-only, xem admit)
+        semantic_scores = NO_SCORES
+        rerank_info: Optional[Dict[str, Any]] = None
+        degraded: Dict[str, str] = {}
+        allowed = filter_mask(req)
         if mode in ("semantic", "hybrid"):
-            k_sem = max(topk * 6, 60)
-            query_vector = search_app.hnsw_mgr.embedder.embed_query(query)
-            labels, distances = search_app.hnsw_mgr.index.knn_query(query_vector, k=k_sem)
-
-            for label, dist in zip(labels[0], distances[0]):
-                doc_id = int(label)
-                sim = 1.0 / (1.0 + float(dist))
-                semantic_scores[doc_id] = float(sim)
+            semantic_scores, rerank_info = semantic_scores_for(req, query, timings, degraded, allowed, depth)
+            if "keyword" in degraded.values():
+                mode = "keyword"
 
-        # Keyword candidates
-        keyword_scores: Dict[int, float] = {}
+        # Keyword candidates (hybrid: giới hạn trong top BM25 + ứng viên ANN)
+        keyword_scores = NO_SCORES
         if mode in ("keyword", "hybrid"):
-            keyword_scores = bm25_lite_scores(query)
-
-        # Combine
-        combined: Dict[int, float] = {}
-        if mode == "semantic":
-            combined = semantic_scores
-        elif mode == "keyword":
-            combined = keyword_scores
-        else:
-            sem_n = normalize_scores(semantic_scores)
-            kw_n = normalize_scores(keyword_scores)
-            w_sem, w_kw = 0.55, 0.45
-            all_ids = set(sem_n.keys()) | set(kw_n.keys())
-            for doc_id in all_ids:
-                combined[doc_id] = w_sem * sem_n.get(doc_id, 0.0) + w_kw * kw_n.get(doc_id, 0.0)
-
-        if not combined:
-            took_ms = int((time.perf_counter() - t0) * 1000)
-            return {"results": [], "took_ms": took_ms}
+            keyword_scores = keyword_scores_for(query, timings, semantic_scores[0] if mode == "hybrid" else None, allowed)
+
+        combined, fusion_info = fuse(req, mode, semantic_scores, keyword_scores, timings)
+        # ANN nông (trang đầu, hoặc giảm cấp reduce): hết danh sách chưa chắc đã hết kết quả; keyword lấy top 2000
+        deep = mode == "keyword" or (depth > 0 and degraded.get("ann") != "reduce")
+        response = rank_results(req, combined, t0, timings, offset=offset, paginate=paginate, deep=deep, served=served)
+        if rerank_info is not None and len(combined[0]):
+            response["rerank"] = rerank_info
+        if fusion_info is not None:
+            response["fusion"] = fusion_info
+        if degraded:
+            response["degraded"] = degraded
+        return response
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        took_ms = int((time.perf_counter() - t0) * 1000)
+        return {"error": "Lỗi khi tìm kiếm", "details": str(e), "took_ms": took_ms}
 
-        if mode in ("semantic", "hybrid"):
-            MIN_SIM = 0.35
-            combined = {k: v for k, v in combined.items() if v >= MIN_SIM}
-            if not combined:
-                took_ms = int((time.perf_counter() - t0) * 1000)
-                return {"results": [], "took_ms": took_ms}
 
-        articles = search_app.hnsw_mgr.articles
 
-        def get_dt(doc_id: int) -> Optional[datetime]:
-            if 0 <= doc_id < len(DOC_DATE):
-                return DOC_DATE[doc_id]
-            try:
-                return extract_article_datetime(articles[doc_id])
-            except Exception:
-                return None
+# -----------------------
+# Related articles ("More like this")
+# -----------------------
+@app.get("/related/{doc_id}")
+async def related(doc_id: int, k: int = Query(default=10, ge=1, le=50)):
+    return json_response(await SEARCH_POOL.run(run_related, doc_id, k))
 
-        items: List[Tuple[int, float, Optional[datetime]]] = []
-        for doc_id, score in combined.items():
-            if 0 <= doc_id < len(articles):
-                items.append((doc_id, float(score), get_dt(doc_id)))
 
-        if sort == "newest":
-            items.sort(key=lambda x: (x[2] is not None, x[2] or datetime.min, x[1]), reverse=True)
-        else:
-            items.sort(key=lambda x: x[1], reverse=True)
-
-        items = items[:topk]
-
-        results = []
-        for doc_id, score, dt in items:
-            a = articles[doc_id]
-            results.append(
-                {
-                    "title": safe_text(a.get("title", "")),
-                    "source": safe_text(a.get("source", "")),
-                    "category": safe_text(a.get("category", "")),
-                    "summary": safe_text(a.get("summary", ""), max_len=240),
-                    "link": safe_url(a.get("link", "")),
-                    "published": format_date_vi(dt),
-                    "score": float(round(score, 4)),
-                }
-            )
+def run_related(doc_id: int, k: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    if search_app is None:
+        return {"error": "Hệ thống tìm kiếm chưa được khởi tạo", "details": "Vui lòng kiểm tra lại", "took_ms": 0}
+    if not 0 <= doc_id < len(search_app.hnsw_mgr.articles):
+        return {"error": "Không tìm thấy bài báo", "details": f"doc_id={doc_id}", "took_ms": 0}
 
+    try:
+        labels, sims = search_app.hnsw_mgr.related(doc_id, k=k)
+        results = [format_result(int(label), float(sim)) for label, sim in zip(labels, sims)]
         took_ms = int((time.perf_counter() - t0) * 1000)
-        return {"results": convert_numpy_types(results), "took_ms": took_ms}
-
+        return {"doc_id": doc_id, "results": results, "took_ms": took_ms}
     except Exception as e:
-        import traceback
         traceback.print_exc()
         took_ms = int((time.perf_counter() - t0) * 1000)
-        return {"error": "Lỗi khi tìm kiếm", "details": str(e), "took_ms": took_ms}
+        return {"error": "Lỗi khi tìm bài liên quan", "details": str(e), "took_ms": took_ms}
+
+
+
+# -----------------------
+# Facets
+# -----------------------
+@app.get("/facets")
+async def facets(
+    source: Optional[str] = None,
+    category: Optional[str] = None,
+    language: Optional[str] = None,
+    topic: Optional[int] = None,
+    limit: int = Query(default=20, ge=1, le=200),
+):
+    """Phân bố source/category/language/topic của toàn bộ bài hoặc của tập bài thoả bộ lọc."""
+    t0 = time.perf_counter()
+    if search_app is None or search_app.hnsw_mgr.facets is None:
+        return {"error": "Hệ thống tìm kiếm chưa được khởi tạo", "details": "Vui lòng kiểm tra lại", "took_ms": 0}
+
+    index = search_app.hnsw_mgr.facets
+    filters = {"source": source, "category": category, "language": language, "topic": topic}
+    doc_ids = index.filter_ids(**filters) if any(v is not None for v in filters.values()) else None
+    total = index.n_docs if doc_ids is None else len(doc_ids)
+    result = index.facets(doc_ids, limit=limit)
+    took_ms = int((time.perf_counter() - t0) * 1000)
+    return {"total": total, "facets": result, "took_ms": took_ms}
+
+
+# -----------------------
+# Suggest (autocomplete)
+# -----------------------
+@app.get("/suggest")
+async def suggest(q: str = "", k: int = Query(default=8, ge=1, le=20)):
+    """Gợi ý hoàn thành query theo prefix (không dấu cũng được), chạy thẳng trên event loop (< 1ms)."""
+    t0 = time.perf_counter()
+    suggestions = SUGGEST.suggest(q, k)
+    took_ms = int((time.perf_counter() - t0) * 1000)
+    return {"query": q, "suggestions": suggestions, "took_ms": took_ms}
+
+
+# -----------------------
+# Stats
+# -----------------------
+@app.get("/stats")
+async def stats():
+    admission = {"policy": ADMISSION_POLICY, "max_queue": MAX_QUEUE,
+                 **{name: limiter.stats() for name, limiter in LIMITERS.items()}}
+    return {"executor": SEARCH_POOL.stats(), "cache": RESULT_CACHE.stats(), "suggest": SUGGEST.stats(),
+            "admission": admission}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# -----------------------
+# Warm-up + health
+# -----------------------
+WARMUP_STATE: Dict[str, Any] = {"status": "pending"}
+
+# Các biến thể request warm-up: đi qua embed, k-NN, BM25, fusion, MMR, sắp theo ngày
+WARMUP_VARIANTS = {
+    "semantic": {"mode": "semantic"},
+    "keyword": {"mode": "keyword"},
+    "hybrid": {"mode": "hybrid"},
+    "hybrid_mmr_newest": {"mode": "hybrid", "diversify": True, "sort": "newest"},
+}
+
+
+def warm_up() -> None:
+    """
+    Chạy WARMUP_ROUNDS lượt query mẫu qua mọi biến thể (gọi thẳng run_search: không vào cache, metrics hay /suggest;
+    admission control luôn chờ chỗ thay vì giảm cấp / trả Overloaded).
+    Lần đầu chậm vì khởi tạo kernel torch, duyệt đồ thị ANN lần đầu, compile regex...; ghi lại thời gian lần đầu
+    và trung bình lượt cuối của từng biến thể.
+    """
+    if search_app is None:
+        WARMUP_STATE.update(status="skipped", reason="hệ thống chưa load")
+        return
+    if WARMUP_ROUNDS <= 0 or not WARMUP_QUERIES:
+        WARMUP_STATE.update(status="skipped", reason="SEARCH_WARMUP_ROUNDS=0")
+        return
+
+    WARMUP_STATE.update(status="running", rounds=WARMUP_ROUNDS, queries=len(WARMUP_QUERIES))
+    ADMISSION_EXEMPT.active = True
+    t0 = time.perf_counter()
+    timings: Dict[str, List[List[float]]] = {name: [] for name in WARMUP_VARIANTS}
+    try:
+        for _ in range(WARMUP_ROUNDS):
+            for name, params in WARMUP_VARIANTS.items():
+                round_ms = []
+                for query in WARMUP_QUERIES:
+                    t = time.perf_counter()
+                    response = run_search(SearchRequest(query=query, **params), paginate=False)
+                    round_ms.append((time.perf_counter() - t) * 1000)
+                    if "error" in response:
+                        raise RuntimeError(f"{name}: {response['error']} {response.get('details', '')}".strip())
+                timings[name].append(round_ms)
+    except Exception as e:
+        traceback.print_exc()
+        WARMUP_STATE.update(status="failed", error=str(e), seconds=round(time.perf_counter() - t0, 3))
+        return
+
+    WARMUP_STATE.update(
+        status="done",
+        seconds=round(time.perf_counter() - t0, 3),
+        variants={
+            name: {"first_ms": round(rounds[0][0], 2), "warm_ms": round(float(np.mean(rounds[-1])), 2)}
+            for name, rounds in timings.items()
+        },
+    )
+    print(f"Warm-up xong sau {WARMUP_STATE['seconds']}s: {WARMUP_STATE['variants']}")
+
+
+def is_ready() -> bool:
+    return LOAD_STATE["status"] == "loaded" and WARMUP_STATE["status"] in ("done", "skipped")
+
+
+REGISTRY.callback("search_ready", "1 nếu replica đã load xong và warm-up xong (/readyz)", lambda: int(is_ready()))
+
+
+def start_warm_up() -> None:
+    # Chạy nền để server nhận kết nối ngay (/healthz trả lời được), /readyz báo sẵn sàng khi xong
+    threading.Thread(target=warm_up, name="search-warmup", daemon=True).start()
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: process còn sống; 503 nếu load hệ thống thất bại (index thiếu/hỏng)."""
+    status = "failed" if LOAD_STATE["status"] == "failed" else "ok"
+    body = {"status": status, "load": LOAD_STATE, "warmup": WARMUP_STATE, "reload": RELOAD_STATE}
+    return json_response(body, status_code=503 if status == "failed" else 200)
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness cho load balancer: 200 chỉ khi đã load và warm-up xong."""
+    ready = is_ready()
+    body = {"ready": ready, "load": LOAD_STATE, "warmup": WARMUP_STATE}
+    if ready:
+        return json_response(body)
+    return json_response(body, status_code=503, headers={"Retry-After": "5"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+suggest.py
+
+Gợi ý hoàn thành query (autocomplete) cho ô tìm kiếm - GET /suggest?q=gia v
+
+- Từ điển gợi ý: term trong vocab của keyword index (trọng số = df) + cụm 2-3 âm tiết liên tiếp trong tiêu đề
+  (trọng số = số tiêu đề chứa cụm; bỏ cụm chỉ gặp ở một tiêu đề). Build một lần lúc load index.
+- Lưu gọn: list khoá đã sắp (cụm viết thường, bỏ dấu - gõ "gia vang" vẫn ra "giá vàng") song song với list chuỗi
+  hiển thị và mảng NumPy trọng số. Tra một prefix = 2 lần bisect ra đoạn [lo, hi), lấy top-k trong đoạn bằng
+  argpartition, không duyệt cả từ điển.
+- Độ phổ biến gần đây: mỗi query /search có kết quả được ghi nhận, số đếm giảm dần theo half-life; query phổ biến
+  được gợi ý cả khi không có trong từ điển. Prefix quá ngắn (khớp quá nhiều query đã ghi nhận) chỉ xét danh sách
+  "hot" gồm các query phổ biến nhất, cập nhật sau mỗi vài chục lần ghi nhận.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from keyword_index import tokenize
+from result_cache import normalize_query
+
+
+def fold(text: str) -> str:
+    """Viết thường, bỏ dấu tiếng Việt (đ -> d)."""
+    text = unicodedata.normalize("NFD", text.lower()).replace("đ", "d")
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+class SuggestIndex:
+    def __init__(self, max_ngram: int = 3, min_title_count: int = 2, half_life: float = 6 * 3600.0,
+                 popularity_weight: float = 1.5, max_popular: int = 5000, hot_size: int = 256):
+        self.max_ngram = max_ngram
+        self.min_title_count = min_title_count
+        self.half_life = half_life
+        self.popularity_weight = popularity_weight
+        self.max_popular = max_popular
+        self.hot_size = hot_size
+
+        self.keys: List[str] = []  # khoá bỏ dấu, đã sắp
+        self.texts: List[str] = []  # chuỗi hiển thị của keys[i]
+        self.weights = np.zeros(0, dtype=np.float32)  # log1p(df hoặc số tiêu đề)
+
+        # Query đã search: text -> [số đếm đã giảm dần, thời điểm cập nhật]; _popular_keys sắp theo (khoá, text)
+        self._popular: Dict[str, List[float]] = {}
+        self._popular_keys: List[Tuple[str, str]] = []
+        self._hot: List[Tuple[str, str]] = []  # hot_size query phổ biến nhất, dạng (khoá, text)
+        self._records_since_hot = 0
+        self._lock = threading.Lock()
+
+    # -----------------------
+    # Build
+    # -----------------------
+    def build(self, titles: Iterable[str], vocab: Dict[str, int], df: Sequence[int]) -> None:
+        counts: Counter = Counter()
+        for title in titles:
+            toks = tokenize(title)
+            grams = set()
+            for n in range(2, self.max_ngram + 1):
+                for i in range(len(toks) - n + 1):
+                    grams.add(" ".join(toks[i:i + n]))
+            counts.update(grams)
+
+        entries: Dict[str, float] = {tok: float(df[t]) for tok, t in vocab.items()}
+        for gram, c in counts.items():
+            if c >= self.min_title_count:
+                entries[gram] = float(c)
+
+        rows = sorted((fold(text), text, w) for text, w in entries.items())
+        self.keys = [key for key, _, _ in rows]
+        self.texts = [text for _, text, _ in rows]
+        self.weights = np.log1p(np.array([w for _, _, w in rows], dtype=np.float32))
+
+    def copy_popularity(self, other: "SuggestIndex") -> None:
+        """Lấy độ phổ biến query đã ghi nhận của `other` (từ điển build lại khi nạp index mới)."""
+        with other._lock:
+            popular = {text: list(item) for text, item in other._popular.items()}
+        with self._lock:
+            self._popular = popular
+            self._popular_keys = sorted((fold(text), text) for text in popular)
+            self._refresh_hot(time.time())
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def memory_bytes(self) -> int:
+        strings = sum(len(k) + len(t) for k, t in zip(self.keys, self.texts))
+        return int(strings + self.weights.nbytes)
+
+    # -----------------------
+    # Độ phổ biến
+    # -----------------------
+    def _decayed(self, count: float, updated: float, now: float) -> float:
+        return count * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, query: str) -> None:
+        text = normalize_query(query)
+        if len(text) < 2 or len(text) > 100:
+            return
+        now = time.time()
+        with self._lock:
+            item = self._popular.get(text)
+            if item is None:
+                self._popular[text] = [1.0, now]
+                insort(self._popular_keys, (fold(text), text))
+                if len(self._popular) > self.max_popular:
+                    self._evict_popular(now)
+            else:
+                item[0] = self._decayed(item[0], item[1], now) + 1.0
+                item[1] = now
+            self._records_since_hot += 1
+            if self._records_since_hot >= 64 or len(self._hot) < min(self.hot_size, len(self._popular)):
+                self._refresh_hot(now)
+
+    def _ranked_popular(self, now: float) -> List[Tuple[str, List[float]]]:
+        return sorted(self._popular.items(), key=lambda kv: -self._decayed(kv[1][0], kv[1][1], now))
+
+    def _refresh_hot(self, now: float) -> None:
+        self._hot = [(fold(text), text) for text, _ in self._ranked_popular(now)[: self.hot_size]]
+        self._records_since_hot = 0
+
+    def _evict_popular(self, now: float) -> None:
+        """Giữ một nửa số query có số đếm (đã giảm dần) cao nhất."""
+        self._popular = dict(self._ranked_popular(now)[: self.max_popular // 2])
+        self._popular_keys = sorted((fold(text), text) for text in self._popular)
+        self._refresh_hot(now)
+
+    # -----------------------
+    # Query
+    # -----------------------
+    def suggest(self, prefix: str, k: int = 8) -> List[Dict[str, Any]]:
+        """k gợi ý cho prefix, điểm = log1p(trọng số) + popularity_weight * log1p(số lần được search gần đây)."""
+        raw = normalize_query(prefix)
+        key = fold(raw)
+        if not key or k <= 0:
+            return []
+
+        scores: Dict[str, float] = {}
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + "\uffff", lo)
+        if hi > lo:
+            w = self.weights[lo:hi]
+            n = min(3 * k, hi - lo)
+            top = np.argpartition(-w, n - 1)[:n] if hi - lo > n else np.arange(hi - lo)
+            for i in top.tolist():
+                scores[self.texts[lo + i]] = float(w[i])
+
+        now = time.time()
+        with self._lock:
+            p_lo = bisect_left(self._popular_keys, (key,))
+            p_hi = bisect_left(self._popular_keys, (key + "\uffff",), p_lo)
+            if p_hi - p_lo <= self.hot_size:
+                matches = self._popular_keys[p_lo:p_hi]
+            else:
+                matches = [item for item in self._hot if item[0].startswith(key)]
+            for _, text in matches:
+                count, updated = self._popular[text]
+                scores[text] = scores.get(text, 0.0) + self.popularity_weight * math.log1p(
+                    self._decayed(count, updated, now)
+                )
+
+        # Gõ có dấu: ưu tiên gợi ý khớp đúng dấu
+        if raw != key:
+            for text in scores:
+                if text.startswith(raw):
+                    scores[text] += 1.0
+
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+        return [{"text": text, "score": round(score, 4)} for text, score in best]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            popular = len(self._popular)
+        return {"entries": len(self.keys), "popular_queries": popular, "memory_mb": round(self.memory_bytes() / 2 ** 20, 2)}
@@ -24,9 +24,10 @@ from __future__ import annotations
 import argparse
 import json
 import os
-from collections import Counter
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List
+
+from facets import FacetIndex
 
 
 def load_articles_any_json(path: str) -> List[Dict[str, Any]]:
@@ -50,34 +51,16 @@ def load_articles_any_json(path: str) -> List[Dict[str, Any]]:
     return out
 
 
-def _safe_str(v: Any, default: str = "Unknown") -> str:
-    if v is None:
-        return default
-    s = str(v).strip()
-    return s if s else default
-
-
 def _fmt_line(name: str, count: int, total: int, name_width: int = 25) -> str:
     pct = (count / total * 100.0) if total else 0.0
     return f"{name:<{name_width}}{count:>5} bài ({pct:5.1f}%)"
 
 
-def _sorted(counter: Counter) -> List[Tuple[str, int]]:
-    return sorted(counter.items(), key=lambda x: (-x[1], str(x[0])))
-
-
 def build_report_text(articles: List[Dict[str, Any]]) -> str:
     total = len(articles)
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    cat = Counter()
-    lang = Counter()
-    src = Counter()
-
-    for a in articles:
-        cat[_safe_str(a.get("category"))] += 1
-        lang[_safe_str(a.get("language"))] += 1
-        src[_safe_str(a.get("source"))] += 1
+    facets = FacetIndex.from_articles(articles)
 
     lines: List[str] = []
     lines.append("THỐNG KÊ BÀI BÁO - PHÂN LOẠI THEO CHỦ ĐỀ VÀ NGÔN NGỮ")
@@ -88,17 +71,17 @@ def build_report_text(articles: List[Dict[str, Any]]) -> str:
     lines.append("")
     lines.append("PHÂN BỐ THEO CHỦ ĐỀ:")
     lines.append("-" * 40)
-    for name, cnt in _sorted(cat):
+    for name, cnt in facets.top("category"):
         lines.append(_fmt_line(str(name), int(cnt), total))
     lines.append("")
     lines.append("PHÂN BỐ THEO NGÔN NGỮ:")
     lines.append("-" * 40)
-    for name, cnt in _sorted(lang):
+    for name, cnt in facets.top("language"):
         lines.append(_fmt_line(str(name), int(cnt), total))
     lines.append("")
     lines.append("PHÂN BỐ THEO NGUỒN BÁO:")
     lines.append("-" * 40)
-    for name, cnt in _sorted(src):
+    for name, cnt in facets.top("source"):
         lines.append(_fmt_line(str(name), int(cnt), total))
     lines.append("")
 
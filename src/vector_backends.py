@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+vector_backends.py
+
+Giao diện chung cho các engine tìm kiếm vector, để ArticleHNSWManager / server.py / ArticleSearchApp /
+merge_article_index.py không gọi trực tiếp hnswlib nữa.
+
+Mọi backend đều làm việc với vector đã chuẩn hoá (normalize_embeddings=True) và trả về
+cosine distance = 1 - cosine similarity (giống space='cosine' của hnswlib).
+
+  build(vectors, ids)          -> xây index mới
+  add(vectors, ids)            -> thêm vector (tự mở rộng sức chứa nếu cần)
+  delete(ids)                  -> xoá / đánh dấu xoá
+  search(query, k, allowed)    -> (labels[k], distances[k])      - 1 query; allowed: mask bool theo label (allow-list)
+  batch_search(queries, k)     -> (labels[n, k], distances[n, k])
+  save(path) / load(path)
+  stats()                      -> dict thông tin (số vector, bộ nhớ, tham số)
+
+Backend có sẵn:
+- 'hnsw'  : hnswlib (mặc định)
+- 'exact' : brute force NumPy, nhân ma trận theo block (chính xác 100%, làm baseline)
+- 'ivfpq' : IVF + Product Quantization (thử nghiệm, tiết kiệm bộ nhớ) - xem ivfpq_index.py
+
+Chọn backend bằng tên: create_backend('exact', dim=768, block_size=32768)
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from hnsw_inspect import read_deleted_labels
+from ivfpq_index import IVFPQIndex
+
+
+class VectorBackend:
+    """Lớp cơ sở: các backend cụ thể override những method dưới đây."""
+
+    name = "base"
+    file_name = "article_index.bin"
+    # True: embeddings.npy của hệ thống chỉ cần memory-map (backend không đọc chúng thường xuyên)
+    mmap_embeddings = False
+
+    def __init__(self, dim: int, **params: Any):
+        self.dim = dim
+        self.params = dict(params)
+
+    def build(self, vectors: np.ndarray, ids: Optional[np.ndarray] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids) -> int:
+        raise NotImplementedError
+
+    def batch_search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """allowed: mask bool theo label (allow-list), chỉ trả các label có allowed[label] = True."""
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        if allowed is not None:
+            return self.filtered_search(query, k, allowed)
+        labels, distances = self.batch_search(query, k)
+        return labels[0], distances[0]
+
+    def filtered_search(self, query: np.ndarray, k: int, allowed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Mặc định: lấy thêm ứng viên (x4 mỗi lượt) rồi lọc, tới khi đủ k label được phép hoặc hết index."""
+        n = self.count()
+        fetch = min(4 * k, n)
+        while True:
+            labels, distances = self.batch_search(query, fetch)
+            labels = np.asarray(labels[0], dtype=np.int64)
+            ok = allowed[np.minimum(labels, len(allowed) - 1)] & (labels < len(allowed))
+            if int(ok.sum()) >= k or fetch >= n:
+                return labels[ok][:k], distances[0][ok][:k]
+            fetch = min(4 * fetch, n)
+
+    def save(self, path: str) -> None:
+        raise NotImplementedError
+
+    def load(self, path: str) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def set_search_params(self, **params: Any) -> None:
+        """Tham số lúc search (ef cho hnsw, nprobe/rerank_k cho ivfpq). Backend không dùng thì bỏ qua."""
+        self.params.update(params)
+
+    def attach_vectors(self, vectors: Optional[np.ndarray]) -> None:
+        """Ma trận embeddings đầy đủ của hệ thống (backend cần thì dùng, không thì bỏ qua)."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "dim": self.dim, "count": self.count(), "params": self.params}
+
+
+# -----------------------
+# hnswlib
+# -----------------------
+class HNSWBackend(VectorBackend):
+    name = "hnsw"
+    file_name = "article_index.bin"
+
+    def __init__(self, dim, M=16, ef_construction=200, ef=100, max_elements=10000, **params):
+        super().__init__(dim, M=M, ef_construction=ef_construction, ef=ef, max_elements=max_elements, **params)
+        import hnswlib
+
+        self._hnswlib = hnswlib
+        self.index = None
+        self.deleted = set()  # label đã mark_deleted: get_current_count() vẫn tính các phần tử này
+
+    def _new_index(self):
+        return self._hnswlib.Index(space="cosine", dim=self.dim)
+
+    def build(self, vectors, ids=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.arange(len(vectors)) if ids is None else np.asarray(ids)
+        self.index = self._new_index()
+        self.index.init_index(
+            max_elements=max(self.params["max_elements"], len(vectors)),
+            ef_construction=self.params["ef_construction"],
+            M=self.params["M"],
+        )
+        self.index.add_items(vectors, ids)
+        self.index.set_ef(self.params["ef"])
+        self.deleted = set()
+
+    def add(self, vectors, ids):
+        needed = self.index.get_current_count() + len(vectors)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(needed + 256)  # buffer
+        self.index.add_items(np.asarray(vectors, dtype=np.float32), np.asarray(ids))
+        if self.deleted:
+            self.deleted.difference_update(int(label) for label in ids)  # thêm lại nhãn đã xoá thì hnswlib bỏ dấu xoá
+
+    def delete(self, ids):
+        n = 0
+        for label in ids:
+            try:
+                self.index.mark_deleted(int(label))
+                self.deleted.add(int(label))
+                n += 1
+            except RuntimeError:
+                pass
+        return n
+
+    def batch_search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32)
+        k = min(k, self.count())
+        while True:
+            try:
+                return self.index.knn_query(queries, k=k)
+            except RuntimeError:
+                # Không tìm đủ k phần tử còn sống cho mọi query (đồ thị sau nhiều lần xoá): lấy ít hơn
+                if k <= 1:
+                    raise
+                k //= 2
+
+    def filtered_search(self, query, k, allowed):
+        # hnswlib bỏ qua node không thoả filter ngay trong lúc duyệt đồ thị (vẫn đi qua chúng để tìm đường),
+        # không phải lấy dư rồi lọc. Không đủ k node thoả (filter quá hẹp so với ef) -> cách mặc định.
+        k = min(k, int(allowed.sum()), self.count())
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        try:
+            labels, distances = self.index.knn_query(
+                query, k=k, num_threads=1, filter=lambda label: label < len(allowed) and bool(allowed[label])
+            )
+        except RuntimeError:
+            return super().filtered_search(query, k, allowed)
+        return np.asarray(labels[0], dtype=np.int64), distances[0]
+
+    def set_search_params(self, **params):
+        super().set_search_params(**params)
+        if "ef" in params and self.index is not None:
+            self.index.set_ef(int(params["ef"]))
+
+    def save(self, path):
+        self.index.save_index(path)
+
+    def load(self, path):
+        self.index = self._new_index()
+        self.index.load_index(path)
+        self.index.set_ef(self.params["ef"])
+        # hnswlib không có hàm đếm phần tử đã xoá: đọc cờ xoá trong file (hnsw_inspect), không chạm vector
+        self.deleted = set(read_deleted_labels(path).tolist())
+
+    def count(self):
+        """Số phần tử còn sống (không tính phần tử đã mark_deleted)."""
+        return 0 if self.index is None else self.index.get_current_count() - len(self.deleted)
+
+    def stats(self):
+        out = super().stats()
+        if self.index is not None:
+            out["max_elements"] = self.index.get_max_elements()
+            out["M"] = self.index.M
+            out["ef"] = self.index.ef
+        return out
+
+
+# -----------------------
+# Brute force NumPy
+# -----------------------
+class ExactBackend(VectorBackend):
+    name = "exact"
+    file_name = "article_index_exact.npz"
+
+    def __init__(self, dim, block_size=32768, **params):
+        super().__init__(dim, block_size=block_size, **params)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+
+    def build(self, vectors, ids=None):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+
+    def add(self, vectors, ids):
+        self.vectors = np.vstack([self.vectors, np.asarray(vectors, dtype=np.float32)])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+
+    def delete(self, ids):
+        hit = np.isin(self.ids, np.asarray(ids, dtype=np.int64)) & self.alive
+        self.alive[hit] = False
+        return int(hit.sum())
+
+    def batch_search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        k = min(k, self.count())
+        block = int(self.params["block_size"])
+        nq = len(queries)
+
+        best_sims = np.full((nq, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((nq, 0), dtype=np.int64)
+        for start in range(0, len(self.vectors), block):
+            sims = queries @ self.vectors[start:start + block].T
+            sims[:, ~self.alive[start:start + block]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, start + sims.shape[1]), sims.shape)
+            sims = np.hstack([best_sims, sims])
+            rows = np.hstack([best_rows, rows])
+            kk = min(k, sims.shape[1])
+            top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+            best_sims = np.take_along_axis(sims, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+
+        order = np.argsort(-best_sims, axis=1)
+        best_sims = np.take_along_axis(best_sims, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return self.ids[best_rows], (1.0 - best_sims).astype(np.float32)
+
+    def filtered_search(self, query, k, allowed):
+        rows = np.flatnonzero(self.alive & (self.ids < len(allowed)) & allowed[np.minimum(self.ids, len(allowed) - 1)])
+        k = min(k, len(rows))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        sims = self.vectors[rows] @ query[0]
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return self.ids[rows[top]], (1.0 - sims[top]).astype(np.float32)
+
+    def attach_vectors(self, vectors):
+        # Dùng chung ma trận embeddings của hệ thống (dòng i <-> ids[i]), không giữ bản sao thứ hai.
+        # Index chỉ chứa một phần bài (vd. chỉ bài đại diện sau lọc gần trùng) -> lấy đúng các dòng đó.
+        if vectors is None:
+            return
+        if np.array_equal(self.ids, np.arange(len(vectors))):
+            self.vectors = vectors
+        else:
+            self.vectors = np.ascontiguousarray(vectors[self.ids], dtype=np.float32)
+
+    def save(self, path):
+        # Vector đã nằm trong embeddings.npy, chỉ cần lưu ids + cờ xoá
+        with open(path, "wb") as f:
+            np.savez(f, ids=self.ids, alive=self.alive)
+
+    def load(self, path):
+        with np.load(path) as data:
+            self.ids = data["ids"]
+            self.alive = data["alive"]
+
+    def count(self):
+        return int(self.alive.sum())
+
+    def stats(self):
+        out = super().stats()
+        out["memory_bytes"] = int(self.ids.nbytes + self.alive.nbytes)  # vectors dùng chung với hệ thống
+        return out
+
+
+# -----------------------
+# IVF-PQ (thử nghiệm)
+# -----------------------
+class IVFPQBackend(VectorBackend):
+    name = "ivfpq"
+    file_name = "article_index_ivfpq.npz"
+    # embeddings.npy chỉ dùng để rerank vài trăm ứng viên -> memory-map, không load vào RAM
+    mmap_embeddings = True
+
+    def __init__(self, dim, **params):
+        super().__init__(dim, **params)
+        self.index = IVFPQIndex(dim=dim, **params)
+
+    def build(self, vectors, ids=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.index.train(vectors)
+        self.index.add_items(vectors, np.arange(len(vectors)) if ids is None else ids)
+
+    def add(self, vectors, ids):
+        self.index.add_items(vectors, ids)
+
+    def delete(self, ids):
+        return self.index.remove_ids(ids)
+
+    def batch_search(self, queries, k):
+        return self.index.knn_query(queries, k=min(k, self.count()))
+
+    def set_search_params(self, **params):
+        super().set_search_params(**params)
+        if "nprobe" in params:
+            self.index.set_nprobe(params["nprobe"])
+        if "rerank_k" in params:
+            self.index.rerank_k = int(params["rerank_k"])
+
+    def attach_vectors(self, vectors):
+        self.index.attach_vectors(vectors)
+
+    def save(self, path):
+        self.index.save_index(path)
+
+    def load(self, path):
+        self.index.load_index(path)
+
+    def count(self):
+        return self.index.get_current_count()
+
+    def stats(self):
+        out = super().stats()
+        out.update({
+            "memory_bytes": self.index.memory_bytes(),
+            "nlist": self.index.nlist,
+            "m": self.index.m,
+            "nprobe": self.index.nprobe,
+            "rerank_k": self.index.rerank_k,
+        })
+        return out
+
+
+BACKENDS = {
+    HNSWBackend.name: HNSWBackend,
+    ExactBackend.name: ExactBackend,
+    IVFPQBackend.name: IVFPQBackend,
+}
+
+
+def create_backend(name: str, dim: int, **params: Any) -> VectorBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Backend không hỗ trợ: {name} (chọn một trong {sorted(BACKENDS)})")
+    return BACKENDS[name](dim, **params)
+
+
+def backend_file(name: str, index_dir: str) -> str:
+    if name not in BACKENDS:
+        raise ValueError(f"Backend không hỗ trợ: {name} (chọn một trong {sorted(BACKENDS)})")
+    return os.path.join(index_dir, BACKENDS[name].file_name)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+worker_pool.py
+
+Chạy các bước tính toán nặng (embed query bằng PyTorch, k-NN, BM25) ngoài event loop asyncio.
+
+- BoundedExecutor: ThreadPoolExecutor với số worker cố định (giới hạn số tác vụ CPU chạy đồng thời).
+  PyTorch, hnswlib và các phép NumPy lớn đều nhả GIL khi tính, nên thread là đủ; process pool sẽ phải
+  nạp lại model + index ở mỗi process.
+- Theo dõi hàng đợi: số tác vụ đang chờ / đang chạy, độ sâu hàng đợi lớn nhất, thời gian chờ trung bình/lớn nhất.
+  Tác vụ bị huỷ khi còn trong hàng đợi (client ngắt kết nối) không bao giờ chạy: được trừ khỏi `queued` lúc huỷ.
+- exclusive(): chặn tác vụ mới bắt đầu và chờ tác vụ đang chạy xong, dùng khi thay index đang phục vụ.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, name: str = "search"):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)  # báo khi running về 0 / hết exclusive()
+        self._paused = False
+        self.queued = 0  # đã gửi, chưa có worker nhận
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0  # huỷ khi còn trong hàng đợi
+        self.max_queue_depth = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.run_ms_total = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Chạy fn(*args) trên một worker và chờ kết quả mà không chặn event loop."""
+        submitted = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        def task() -> Any:
+            with self._lock:
+                while self._paused:
+                    self._idle.wait()
+                started = time.perf_counter()
+                wait_ms = (started - submitted) * 1000
+                self.queued -= 1
+                self.running += 1
+                self.wait_ms_total += wait_ms
+                self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            ok = False
+            try:
+                result = fn(*args)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.failed += 0 if ok else 1
+                    self.run_ms_total += (time.perf_counter() - started) * 1000
+                    if not self.running:
+                        self._idle.notify_all()
+
+        def on_done(future: Future) -> None:
+            # Huỷ thành công chỉ khi task chưa chạy: task() không trừ queued thì trừ ở đây
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+                    self.cancelled += 1
+
+        future = self._pool.submit(task)
+        future.add_done_callback(on_done)
+        # Huỷ coroutine (vd. client ngắt kết nối) -> huỷ luôn future của pool nếu task chưa chạy
+        return await asyncio.wrap_future(future)
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Trong khối with: không tác vụ nào đang chạy, tác vụ mới chờ tới khi ra khỏi khối. Không gọi từ worker."""
+        with self._lock:
+            self._paused = True
+            while self.running:
+                self._idle.wait()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._paused = False
+                self._idle.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = max(1, self.completed + self.running)
+            done = max(1, self.completed)
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "max_queue_depth": self.max_queue_depth,
+                "wait_ms_avg": round(self.wait_ms_total / started, 3),
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "run_ms_avg": round(self.run_ms_total / done, 3),
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module nằm phẳng trong src/ (chạy bằng `cd src && python server.py`), không phải package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,33 @@
+import time
+from datetime import date
+
+import pytest
+
+from article_dates import article_timestamp, day_start_ts, parse_datetime, to_datetime
+
+
+@pytest.fixture(params=["UTC", "Asia/Ho_Chi_Minh", "America/New_York"])
+def host_tz(request, monkeypatch):
+    """Chạy test dưới múi giờ máy khác nhau: kết quả không được phụ thuộc TZ."""
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_naive_dates_use_site_timezone(host_tz):
+    # 08:00 giờ Việt Nam = 01:00 UTC
+    assert article_timestamp({"published": "2024-03-01 08:00:00"}) == 1709254800
+    assert article_timestamp({"pubDate": "01/03/2024 08:00"}) == 1709254800
+    assert article_timestamp({"pubDate": "Fri, 01 Mar 2024 01:00:00 GMT"}) == 1709254800
+    assert article_timestamp({"date": "2024-03-01T08:00:00+07:00"}) == 1709254800
+    assert article_timestamp({"timestamp": "1709254800"}) == 1709254800
+    assert to_datetime(1709254800).strftime("%d/%m/%Y %H:%M") == "01/03/2024 08:00"
+    assert parse_datetime("2024-03-01").utcoffset().total_seconds() == 7 * 3600
+
+
+def test_day_bounds_use_site_timezone(host_tz):
+    start = day_start_ts(date(2024, 3, 1))
+    assert start == 1709226000  # 2024-03-01 00:00 giờ Việt Nam
+    assert start <= article_timestamp({"published": "2024-03-01 00:30"}) < day_start_ts(date(2024, 3, 2))
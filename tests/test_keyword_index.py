@@ -0,0 +1,19 @@
+from keyword_index import KeywordIndex, parse_phrases, query_tokens, tokenize
+
+
+def test_phrase_slop_is_not_a_query_term():
+    query = '"giá vàng"~10 hôm nay'
+    assert query_tokens(query) == ["giá", "vàng", "hôm", "nay"]
+    assert parse_phrases(query) == [(["giá", "vàng"], 10)]
+    assert query_tokens('"trí tuệ nhân tạo" 2024') == ["trí", "tuệ", "nhân", "tạo", "2024"]
+
+
+def test_slop_digits_do_not_change_scores():
+    docs = ["giá vàng hôm nay tăng", "giá vàng tăng 10 phiên liền", "10 điều cần biết về vàng"]
+    index = KeywordIndex()
+    index.build([tokenize(d) for d in docs])
+    query = '"giá vàng"~10'
+    ids, scores = index.search(query_tokens(query), parse_phrases(query), k=10)
+    plain_ids, plain_scores = index.search(tokenize("giá vàng"), parse_phrases(query), k=10)
+    assert sorted(ids.tolist()) == [0, 1]
+    assert dict(zip(ids.tolist(), scores.tolist())) == dict(zip(plain_ids.tolist(), plain_scores.tolist()))
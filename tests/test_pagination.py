@@ -0,0 +1,53 @@
+import pytest
+
+from pagination import PageSessions, decode_cursor, encode_cursor, extend_served
+from result_cache import ResultCache
+
+
+def ranked(ids):
+    return [(doc_id, 1.0 / (i + 1)) for i, doc_id in enumerate(ids)]
+
+
+def test_cursor_round_trip_and_invalid_cursors():
+    assert decode_cursor(encode_cursor("abc_-1", 30)) == ("abc_-1", 30)
+    for bad in ["", "!!!", encode_cursor("abc", -1), encode_cursor("", 10), encode_cursor("abc", 0)[:-2] + "zz"]:
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_two_pages_are_served_from_the_saved_session():
+    sessions = PageSessions(ResultCache(max_entries=10, ttl=60))
+    items = ranked(range(25))
+    session_id = sessions.save("q", items, deep=True, generation=1)
+
+    page1, cursor = sessions.page(session_id, items, 0, 10)
+    assert [d for d, _ in page1] == list(range(10))
+    sid, offset = decode_cursor(cursor)
+    session = sessions.get(sid, "q", 1)
+    assert session is not None and sessions.can_serve(session, offset, 10)
+    page2, cursor = sessions.page(sid, session["items"], offset, 10)
+    page3, last = sessions.page(sid, session["items"], *decode_cursor(cursor)[1:], 10)
+    assert [d for d, _ in page2] == list(range(10, 20))
+    assert [d for d, _ in page3] == list(range(20, 25)) and last is None
+
+    assert sessions.get(sid, "another query", 1) is None  # cursor dùng với request khác
+    assert sessions.get(sid, "q", 2) is None  # index đổi thế hệ
+
+
+def test_shallow_session_is_extended_without_repeating_served_items():
+    sessions = PageSessions(ResultCache(max_entries=10, ttl=60))
+    shallow = ranked([1, 2, 3, 4, 5, 6])
+    session_id = sessions.save("q", shallow, deep=False, generation=1)
+    session = sessions.get(session_id, "q", 1)
+    assert sessions.can_serve(session, 0, 3)
+    assert not sessions.can_serve(session, 3, 3)  # trang cuối của danh sách nông: có thể còn kết quả
+
+    # Lấy sâu ra thứ tự khác: 3 bài đã trả giữ nguyên, phần sau bỏ các bài đó
+    deep = ranked([2, 7, 1, 3, 8, 4, 9, 5, 6])
+    items = extend_served(session["items"][:3], deep, depth=8)
+    assert [d for d, _ in items] == [1, 2, 3, 7, 8, 4, 9, 5]
+    sessions.save("q", items, deep=True, generation=1, session_id=session_id)
+    session = sessions.get(session_id, "q", 1)
+    assert session["deep"] and sessions.can_serve(session, 6, 3)
+    page, cursor = sessions.page(session_id, session["items"], 6, 3)
+    assert [d for d, _ in page] == [9, 5] and cursor is None
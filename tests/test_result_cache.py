@@ -0,0 +1,66 @@
+import result_cache
+from result_cache import ResultCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_new_generation_drops_every_entry():
+    cache = ResultCache(max_entries=10, ttl=60)
+    cache.put("a", {"results": [1]}, generation=1)
+    cache.put("b", {"results": [2]}, generation=1)
+    assert cache.get("a", 1) == {"results": [1]}
+
+    assert cache.get("b", 2) is None  # index build/merge/reload xong: thế hệ mới
+    assert cache.get("a", 2) is None
+    assert cache.stats()["entries"] == 0 and cache.bytes_used == 0
+    assert cache.invalidations == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    cache = ResultCache(max_entries=10, ttl=30)
+    cache.put("a", [1], generation=1)
+    clock.now += 29
+    assert cache.get("a", 1) == [1]
+    clock.now += 2
+    assert cache.get("a", 1) is None
+    assert cache.stats()["entries"] == 0 and cache.bytes_used == 0
+
+
+def test_byte_limit_evicts_least_recently_used():
+    value = {"results": ["x" * 80]}
+    size = len(result_cache.fast_json.dumps(value))
+    cache = ResultCache(max_entries=100, max_bytes=3 * size, ttl=60)
+    for key in "abc":
+        cache.put(key, value, generation=1)
+    assert cache.get("a", 1) is not None  # "a" vừa dùng, "b" thành cũ nhất
+
+    cache.put("d", value, generation=1)
+    assert cache.get("b", 1) is None
+    assert all(cache.get(key, 1) is not None for key in "acd")
+    assert cache.bytes_used == 3 * size and cache.evictions == 1
+
+    cache.put("huge", {"results": ["x" * (4 * size)]}, generation=1)  # lớn hơn cả cache: không lưu, không đẩy ai ra
+    assert cache.get("huge", 1) is None and cache.stats()["entries"] == 3
+
+
+def test_entry_limit_and_disabled_cache():
+    cache = ResultCache(max_entries=2, ttl=60)
+    for key in "abc":
+        cache.put(key, [key], generation=1)
+    assert cache.get("a", 1) is None and cache.get("c", 1) == ["c"]
+
+    off = ResultCache(max_entries=0)
+    off.put("a", [1], generation=1)
+    assert off.get("a", 1) is None and not off.enabled
+
+
+def test_normalize_query():
+    assert normalize_query("  Giá   VÀNG\tHôm nay ") == "giá vàng hôm nay"
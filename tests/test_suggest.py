@@ -0,0 +1,78 @@
+import suggest
+from suggest import SuggestIndex, fold
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def build(titles, vocab_df, **params):
+    index = SuggestIndex(**params)
+    vocab = {tok: i for i, tok in enumerate(vocab_df)}
+    index.build(titles, vocab, list(vocab_df.values()))
+    return index
+
+
+def texts(results):
+    return [r["text"] for r in results]
+
+
+def test_prefix_range_is_exact_on_folded_keys():
+    index = build(
+        ["Giá vàng hôm nay", "Giá vàng tăng mạnh", "Giá xăng giảm"],
+        {"giá": 30, "giang": 5, "gió": 7, "gia": 2, "vàng": 20, "gi": 1},
+    )
+    assert index.keys == sorted(index.keys)
+    assert fold("Đà Nẵng") == "da nang"
+
+    # "gia" ra mọi khoá bắt đầu bằng "gia" (kể cả "giang"), không ra "gi" / "gió" nằm ngay cạnh đoạn
+    assert set(texts(index.suggest("gia", k=20))) == {"giá", "giang", "gia", "giá vàng"}
+    assert texts(index.suggest("gia v", k=5)) == ["giá vàng"]  # cụm 2 âm tiết gặp ở >= 2 tiêu đề
+    assert "giá xăng" not in texts(index.suggest("gia", k=20))  # chỉ gặp ở một tiêu đề
+    assert index.suggest("giz") == [] and index.suggest("") == []
+
+
+def test_accented_prefix_prefers_exact_accents():
+    index = build([], {"giá": 10, "gia": 10, "giã": 10})
+    assert texts(index.suggest("giá", k=3))[0] == "giá"
+    assert set(texts(index.suggest("gia", k=3))) == {"giá", "gia", "giã"}
+
+
+def test_popularity_decays_with_half_life(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(suggest.time, "time", clock)
+    index = build([], {"giá": 1, "gió": 1}, half_life=3600.0)
+    for _ in range(3):
+        index.record("Giá vàng SJC")
+    index.record("gió mùa")
+
+    hot = texts(index.suggest("gi", k=5))
+    assert hot[0] == "giá vàng sjc"  # query search gần đây vẫn được gợi ý dù không có trong từ điển
+    first = index.suggest("gia vang s")[0]["score"]
+
+    clock.now += 3600.0  # một half-life: số đếm còn một nửa
+    later = index.suggest("gia vang s")[0]["score"]
+    assert abs(later - 1.5 * suggest.math.log1p(1.5)) < 1e-3 and later < first
+
+    index.record("giá vàng sjc")  # cộng vào số đếm đã giảm
+    assert abs(index.suggest("gia vang s")[0]["score"] - 1.5 * suggest.math.log1p(2.5)) < 1e-3
+
+
+def test_short_prefix_uses_hot_list_and_popularity_survives_rebuild():
+    index = build([], {"báo": 1}, hot_size=4)
+    # Xen kẽ, "bão số i" được search 10 * (i + 1) lần; danh sách hot cập nhật mỗi 64 lần ghi nhận
+    for r in range(100):
+        for i in range(10):
+            if r < 10 * (i + 1):
+                index.record(f"bão số {i}")
+    # Prefix khớp nhiều hơn hot_size query: chỉ xét các query phổ biến nhất
+    assert texts(index.suggest("bao so", k=3)) == ["bão số 9", "bão số 8", "bão số 7"]
+
+    rebuilt = build([], {"bão": 1})
+    rebuilt.copy_popularity(index)
+    assert texts(rebuilt.suggest("bao so", k=3)) == ["bão số 9", "bão số 8", "bão số 7"]
+    assert rebuilt.stats()["popular_queries"] == 10
@@ -0,0 +1,30 @@
+import numpy as np
+
+from hnsw_inspect import read_deleted_labels
+from vector_backends import create_backend
+
+
+def unit_vectors(n, dim=16, seed=0):
+    x = np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_hnsw_count_excludes_deleted(tmp_path):
+    x = unit_vectors(10)
+    backend = create_backend("hnsw", 16)
+    backend.build(x)
+    assert backend.delete([0, 1, 1]) == 2
+    assert backend.count() == 8
+
+    # k lớn hơn số phần tử còn sống: không lỗi, không trả phần tử đã xoá
+    labels, _ = backend.search(x[2], k=50)
+    assert len(labels) == 8 and not {0, 1} & set(labels.tolist())
+
+    path = str(tmp_path / "index.bin")
+    backend.save(path)
+    assert sorted(read_deleted_labels(path).tolist()) == [0, 1]
+    loaded = create_backend("hnsw", 16)
+    loaded.load(path)
+    assert loaded.count() == 8
+    loaded.add(x[:1], [0])
+    assert loaded.count() == 9
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+from worker_pool import BoundedExecutor
+
+
+def test_cancelled_queued_calls_leave_queue():
+    pool = BoundedExecutor(1)
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)  # worker duy nhất đang bận
+        pending = [asyncio.ensure_future(pool.run(lambda: None)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        assert pool.queued == 5
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        assert pool.queued == 0
+        assert pool.stats()["cancelled"] == 5
+
+        release.set()
+        await blocker
+        assert await pool.run(lambda: 42) == 42
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert pool.queued == 0
+    assert pool.running == 0
+
+
+def test_exclusive_waits_for_running_and_holds_new_calls():
+    pool = BoundedExecutor(2)
+    release = threading.Event()
+    events = []
+
+    def slow():
+        release.wait()
+        events.append("slow")
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(slow))
+        await asyncio.sleep(0.05)
+
+        def swap():
+            with pool.exclusive():
+                events.append("swap")
+                held = asyncio.run_coroutine_threadsafe(pool.run(events.append, "new"), loop)
+                threading.Event().wait(0.05)
+                assert "new" not in events  # tác vụ mới chờ tới khi ra khỏi exclusive()
+            return held
+
+        loop = asyncio.get_running_loop()
+        swapper = loop.run_in_executor(None, swap)
+        await asyncio.sleep(0.05)
+        assert "swap" not in events  # đang chờ tác vụ đang chạy
+        release.set()
+        await running
+        held = await swapper
+        await asyncio.wrap_future(held)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert events == ["slow", "swap", "new"]
@@ -2,6 +2,9 @@
 # BƯỚC 1: CÀI ĐẶT & IMPORT
 # ==============================================================================
 #!pip install hnswlib scikit-learn --upgrade -q
+import os
+import sys
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
 import time
@@ -10,6 +13,9 @@ import hnswlib
 from sklearn.datasets import make_blobs 
 from sklearn.decomposition import PCA
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from hnsw_inspect import inspect_index_file
+
 # ==============================================================================
 # BƯỚC 2: CÁC MODULE XỬ LÝ
 # ==============================================================================
@@ -58,8 +64,21 @@ def recall_at_k(bf_indices, hnsw_labels, k):
     return correct / total
 
 def analyze_hnsw_structure(hnsw):
-    estimated_degree = hnsw.M * 2 * 0.9
-    return {"avg_degree": estimated_degree}
+    # Lưu index ra file tạm rồi đọc lại cấu trúc đồ thị thật (level 0)
+    fd, path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        hnsw.index.save_index(path)
+        report = inspect_index_file(path)
+    finally:
+        os.remove(path)
+    level0 = report['levels'][0]
+    return {
+        "avg_degree": level0['avg_out_degree'],
+        "degree_histogram": level0['degree_histogram'],
+        "fill_ratio": level0['fill_ratio'],
+        "unreachable": report['unreachable_count'],
+    }
 
 # ==============================================================================
 # BƯỚC 3: VISUALIZATION (4 BIỂU ĐỒ)
@@ -86,14 +105,12 @@ def visualize_results_4_charts(history, final_stats, final_recall):
     speedup = times[0]/times[1] if times[1]>0 else 0
     plt.title(f"2. Speedup: {speedup:.1f}x", fontsize=12, fontweight='bold')
 
-    # 3. HISTOGRAM (ĐỘNG DỰA TRÊN M)
+    # 3. HISTOGRAM (BẬC THẬT Ở LEVEL 0, ĐỌC TỪ FILE INDEX)
     plt.subplot(1, 4, 3)
     avg_deg = final_stats['avg_degree']
-    # Mô phỏng phân bố xung quanh giá trị trung bình lý thuyết
-    degrees = np.random.normal(avg_deg, 5, 1000).astype(int)
-    degrees = degrees[degrees > 0]
-    plt.hist(degrees, bins=20, color='purple', alpha=0.7, edgecolor='black')
-    plt.title(f"3. Phân bố Bậc (Avg ~ {avg_deg:.1f})", fontsize=12, fontweight='bold')
+    hist = final_stats['degree_histogram']
+    plt.bar(np.arange(len(hist)), hist, width=1.0, color='purple', alpha=0.7, edgecolor='black')
+    plt.title(f"3. Phân bố Bậc (Avg = {avg_deg:.1f}, Fill {final_stats['fill_ratio']:.0%})", fontsize=12, fontweight='bold')
     plt.xlabel("Degree"); plt.ylabel("Frequency")
 
     # 4. NETWORK
@@ -170,7 +187,7 @@ def main():
         
         if n == MAX_N:
             final_recall = recall
-            final_stats = analyze_hnsw_structure(hnsw) # Tính toán dựa trên M
+            final_stats = analyze_hnsw_structure(hnsw) # Đọc cấu trúc đồ thị thật
             speedup = t_bf/t_hnsw if t_hnsw > 0 else 0
 
         print(f"{n:<10} | {t_bf:<10.4f} | {t_hnsw:<10.4f} | {t_bf/t_hnsw:<10.1f}x | {recall*100:.1f}%")